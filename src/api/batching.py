@@ -0,0 +1,99 @@
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+import numpy as np
+
+logger = logging.getLogger("parkinsons_api")
+
+# Config
+MICRO_BATCHING = os.getenv("MICRO_BATCHING", "false").lower() in ("1", "true", "yes")
+MICRO_BATCH_MAX_SIZE = int(os.getenv("MICRO_BATCH_MAX_SIZE", "16"))
+MICRO_BATCH_MAX_WAIT_MS = float(os.getenv("MICRO_BATCH_MAX_WAIT_MS", "5"))
+
+
+class MicroBatcher:
+    """
+    Dynamic batching of concurrent single-image predictions.
+
+    Feature vectors submitted for the same model are collected until either
+    `max_batch_size` are waiting or `max_wait_ms` has passed since the first one
+    arrived. The batch is then classified with a single stacked call on the
+    inference pool, and each waiting request gets its own label back. All methods
+    must be called from the event loop thread.
+    """
+    def __init__(self, get_pool, classify, max_batch_size=MICRO_BATCH_MAX_SIZE, max_wait_ms=MICRO_BATCH_MAX_WAIT_MS):
+        # get_pool() -> InferencePool; classify(model_key, X) -> labels is run on that pool.
+        # model_key is any hashable model identifier, e.g. a ModelSpec
+        self.get_pool = get_pool
+        self.classify = classify
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._pending = {}
+        self._timers = {}
+        # Keep references to running batch tasks so they are not garbage collected
+        self._tasks = set()
+        self._batches = 0
+        self._items = 0
+        self._batch_sizes = {}
+        self._added_latency = deque(maxlen=1000)
+
+    async def predict(self, model_key, features):
+        """Queue one feature vector for `model_key` and wait for its label."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._pending.setdefault(model_key, [])
+        pending.append((features, future, time.monotonic()))
+        if len(pending) >= self.max_batch_size:
+            self._flush(model_key)
+        elif model_key not in self._timers:
+            self._timers[model_key] = loop.call_later(self.max_wait, self._flush, model_key)
+        return await future
+
+    def _flush(self, model_key):
+        timer = self._timers.pop(model_key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(model_key, [])
+        if not batch:
+            return
+        dispatched = time.monotonic()
+        for _, _, enqueued in batch:
+            self._added_latency.append(dispatched - enqueued)
+        self._batches += 1
+        self._items += len(batch)
+        self._batch_sizes[len(batch)] = self._batch_sizes.get(len(batch), 0) + 1
+        task = asyncio.ensure_future(self._run(model_key, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, model_key, batch):
+        futures = [future for _, future, _ in batch]
+        try:
+            X = np.vstack([features for features, _, _ in batch])
+            labels = await self.get_pool().run(self.classify, model_key, X)
+        except Exception as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for future, label in zip(futures, labels):
+            if not future.done():
+                future.set_result(label)
+
+    def stats(self):
+        latencies = sorted(self._added_latency)
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self._batches,
+            "items": self._items,
+            "mean_batch_size": self._items / self._batches if self._batches else 0.0,
+            "batch_size_counts": dict(sorted(self._batch_sizes.items())),
+            "added_latency_ms": {
+                "mean": 1000 * sum(latencies) / len(latencies) if latencies else 0.0,
+                "p95": 1000 * latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))] if latencies else 0.0,
+                "max": 1000 * latencies[-1] if latencies else 0.0,
+            },
+        }
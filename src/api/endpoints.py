@@ -1,91 +1,425 @@
 import os
-import shutil
-import json
-import uuid
+import io
+import asyncio
 import logging
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from src.api.models import ModelsResponse, PredictionResponse
-from src.predictions.prediction import Predict
-from PIL import Image  # Added for image validation
+import zipfile
+from typing import List, Optional
+from contextlib import contextmanager
+from fastapi import APIRouter, UploadFile, File, Form, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from src.api.models import ModelsResponse, PredictionResponse, BatchPredictionResponse, EnsemblePredictionResponse
+from src.predictions.prediction import Predict, Ensemble, combine_predictions
+from src.predictions.model_registry import get_registry
+from src.predictions.model_backends import ModelSpec
+from src.predictions.prediction_cache import get_prediction_cache, PredictionCache
+from src.api.inference_pool import get_inference_pool, PoolSaturated
+from src.api.batching import MicroBatcher, MICRO_BATCHING
+from src.preprocessing.hog_filter import HogFilter
+from src.preprocessing.image_decoding import ImageTooLarge, check_image, MAX_IMAGE_BYTES
+from src.utils import telemetry
+from src.utils.telemetry import timed, model_context
 
 # Setup logging (if not imported from main)
 logger = logging.getLogger("parkinsons_api")
 
-# Config (should match main.py)
-BASE_DIR = os.path.dirname(os.path.dirname(__file__))
-MODELS_DIR = os.path.abspath(os.path.join(BASE_DIR, '..', 'models'))
-METRICS_PATH = os.path.join(MODELS_DIR, 'metrics.json')
-TEMP_UPLOAD_DIR = os.getenv("TEMP_UPLOAD_DIR", "temp_uploads")
-
-# Read available models from metrics.json
-try:
-    with open(METRICS_PATH, 'r') as f:
-        METRICS = json.load(f)
-    AVAILABLE_MODELS = list(METRICS.keys())
-except Exception as e:
-    logger.error(f"Failed to load metrics: {e}")
-    METRICS = {}
-    AVAILABLE_MODELS = []
+# Config
+# Required in the X-Admin-Token header of /admin/* requests; the endpoints are disabled when unset
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "64"))
+# Zip uploads to /predict/batch: largest archive accepted, and most bytes its members may decompress to in total
+MAX_ARCHIVE_BYTES = int(os.getenv("MAX_ARCHIVE_BYTES", str(64 * 1024 * 1024)))
+MAX_ARCHIVE_UNCOMPRESSED_BYTES = int(os.getenv("MAX_ARCHIVE_UNCOMPRESSED_BYTES", str(256 * 1024 * 1024)))
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
 
 router = APIRouter()
 
+# Filled in by the application lifespan once models are loaded and warmed
+_readiness = {"ready": False, "startup_seconds": {}}
+
+class InvalidImageError(ValueError):
+    """Raised when uploaded bytes are not a decodable image."""
+
+class BatchTooLarge(ValueError):
+    """Raised when a batch exceeds MAX_BATCH_SIZE images (counting zip members) or one of the archive size limits."""
+
+def _model_spec(metrics, model_name):
+    """ModelSpec for a display name in a metrics.json snapshot, or None if it cannot be served."""
+    if model_name not in metrics:
+        return None
+    try:
+        return ModelSpec.from_entry(model_name, metrics[model_name])
+    except ValueError:
+        return None
+
+def _checked_image(contents):
+    """
+    Validate an upload with one header parse and return it as a CheckedImage, which is then
+    decoded without parsing the header again. Raises ImageTooLarge for oversized images and
+    decompression bombs, InvalidImageError for anything that is not a valid image.
+    """
+    with timed("validation"):
+        checked = check_image(contents)
+    if checked is None:
+        raise InvalidImageError("Uploaded file is not a valid image.")
+    return checked
+
+@contextmanager
+def _track_request(endpoint, model):
+    """Count the request, its errors and keep the in-flight gauge up to date."""
+    telemetry.REQUESTS.inc(endpoint=endpoint, model=model)
+    telemetry.IN_FLIGHT.inc(endpoint=endpoint)
+    try:
+        yield
+    except HTTPException as e:
+        telemetry.REQUEST_ERRORS.inc(endpoint=endpoint, model=model, status=e.status_code)
+        raise
+    except Exception:
+        telemetry.REQUEST_ERRORS.inc(endpoint=endpoint, model=model, status=500)
+        raise
+    finally:
+        telemetry.IN_FLIGHT.dec(endpoint=endpoint)
+
+def _predict_image(spec, contents):
+    """Validate and classify one image. Runs on the inference pool."""
+    with model_context(spec.key):
+        contents = _checked_image(contents)
+    predictor = Predict(model_name=spec)
+    return predictor.predict_from_image(contents)[0]
+
+def _cached_prediction(cache, spec, contents):
+    """(cache key, cached label or None) for an upload; the key is None if the model file is missing."""
+    try:
+        identity = get_registry().model_identity(spec.pickle_file)
+    except OSError:
+        return None, None
+    cache_key = PredictionCache.make_key(contents, identity, spec.feature_key())
+    return cache_key, cache.get(cache_key, spec.pickle_file, identity)
+
+def _featurize_image(spec, contents):
+    """Validate one image and return its features for `spec`. Runs on the inference pool."""
+    with model_context(spec.key):
+        features = spec.hog_filter().quantify_image(_checked_image(contents))
+    if features is None:
+        raise ValueError("Could not extract features from image: <in-memory image>")
+    return features
+
+def _classify(spec, X):
+    """Classify a stacked feature matrix. Runs on the inference pool."""
+    return Predict(model_name=spec).predict(X)
+
+def _predict_ensemble(specs, contents):
+    """
+    Validate one image and classify it with every model in `specs`, in one pool job so that
+    an ensemble request takes a single admission slot. Features are extracted once and the
+    models classify them concurrently. Runs on the inference pool.
+    """
+    with model_context("ensemble"):
+        image = _checked_image(contents)
+    return Ensemble(model_names=specs).classify_image(image)
+
+_micro_batcher = None
+
+def get_micro_batcher():
+    global _micro_batcher
+    if _micro_batcher is None:
+        _micro_batcher = MicroBatcher(get_inference_pool, _classify)
+    return _micro_batcher
+
+def _predict_batch(spec, items):
+    """Validate and classify (filename, bytes) items with one classifier call. Runs on the inference pool."""
+    # Invalid items get a per-item error instead of failing the batch
+    results = [{"filename": filename, "prediction": None, "error": None} for filename, _ in items]
+    images = []
+    image_indices = []
+    for i, (filename, contents) in enumerate(items):
+        if contents is None:
+            results[i]["error"] = "Uploaded archive is not a valid zip file."
+        elif isinstance(contents, ImageTooLarge):
+            results[i]["error"] = str(contents)
+        elif not filename.lower().endswith(IMAGE_EXTENSIONS):
+            results[i]["error"] = "Only PNG and JPG images are supported."
+        else:
+            try:
+                with model_context(spec.key):
+                    images.append(_checked_image(contents))
+                image_indices.append(i)
+            except (ImageTooLarge, InvalidImageError) as e:
+                results[i]["error"] = str(e)
+    if images:
+        predictor = Predict(model_name=spec)
+        for i, result in zip(image_indices, predictor.predict_from_images(images)):
+            if result["prediction"] is not None:
+                results[i]["prediction"] = result["prediction"].capitalize()
+            else:
+                results[i]["error"] = result["error"]
+    return results
+
+def _check_batch_size(n_items):
+    if n_items > MAX_BATCH_SIZE:
+        raise BatchTooLarge(f"Too many images in batch ({n_items}). Maximum is {MAX_BATCH_SIZE}.")
+
+def _unpack_uploads(uploads):
+    """
+    Return (filename, bytes) for each uploaded image, unpacking any .zip archives in memory.
+
+    Archives are checked against the limits from their directory before anything is
+    decompressed: BatchTooLarge is raised once the images would exceed MAX_BATCH_SIZE or the
+    members to read would decompress to more than MAX_ARCHIVE_UNCOMPRESSED_BYTES in total, and
+    members larger than MAX_IMAGE_BYTES are returned as an ImageTooLarge instead of their bytes.
+    A zip that cannot be opened is returned as None.
+    """
+    items = []
+    uncompressed = 0
+    for filename, contents in uploads:
+        if filename.lower().endswith(".zip"):
+            try:
+                with zipfile.ZipFile(io.BytesIO(contents)) as archive:
+                    members = [member for member in archive.infolist()
+                               if not member.is_dir() and not os.path.basename(member.filename).startswith(".")]
+                    _check_batch_size(len(items) + len(members))
+                    uncompressed += sum(member.file_size for member in members if member.file_size <= MAX_IMAGE_BYTES)
+                    if uncompressed > MAX_ARCHIVE_UNCOMPRESSED_BYTES:
+                        raise BatchTooLarge(f"Zip archives would decompress to {uncompressed} bytes; "
+                                            f"the limit is {MAX_ARCHIVE_UNCOMPRESSED_BYTES}.")
+                    for member in members:
+                        # Reading stops at the declared size, so this bounds what is decompressed
+                        if member.file_size > MAX_IMAGE_BYTES:
+                            items.append((member.filename, ImageTooLarge(
+                                f"Image is {member.file_size} bytes; the limit is {MAX_IMAGE_BYTES}.")))
+                        else:
+                            items.append((member.filename, archive.read(member)))
+            except zipfile.BadZipFile:
+                items.append((filename, None))
+        else:
+            items.append((filename, contents))
+        _check_batch_size(len(items))
+    return items
+
+async def _read_uploads(files):
+    """Read the uploads and unpack any .zip archives; parsing and decompression run off the event loop."""
+    uploads = []
+    for upload in files:
+        if upload.filename.lower().endswith(".zip"):
+            # Read at most one byte past the limit, so an oversized archive is never loaded whole
+            contents = await upload.read(MAX_ARCHIVE_BYTES + 1)
+            if len(contents) > MAX_ARCHIVE_BYTES:
+                raise BatchTooLarge(f"Zip archive {upload.filename} is larger than the limit of {MAX_ARCHIVE_BYTES} bytes.")
+        else:
+            contents = await upload.read()
+        uploads.append((upload.filename, contents))
+    return await asyncio.to_thread(_unpack_uploads, uploads)
+
+def warm_up():
+    """Load and warm every listed model and run the validation and featurization path once."""
+    get_registry().preload()
+    # Import Pillow (used for validation) now rather than on the first request, without recording a timing
+    from PIL import Image  # noqa: F401
+    HogFilter().warm_up()
+
+def mark_ready(startup_seconds):
+    _readiness["startup_seconds"] = startup_seconds
+    _readiness["ready"] = True
+
+def _busy_error(err):
+    logger.warning(f"Rejecting request: {err}")
+    return HTTPException(status_code=503, detail="Server is busy, please retry shortly.", headers={"Retry-After": "1"})
+
 @router.get("/models", tags=["Models"])
 def get_models():
     """List available models and their metrics."""
-    if not METRICS:
+    metrics = get_registry().metrics
+    if not metrics:
         logger.error("No metrics found.")
         raise HTTPException(status_code=500, detail="Model metrics not available.")
-    return {"models": METRICS}
+    return {"models": metrics}
+
+@router.post("/admin/reload", tags=["Models"])
+def reload_models(x_admin_token: str = Header(None)):
+    """
+    Reload metrics.json and any changed model pickles without restarting the API.
+    A plain (sync) endpoint, so the loading runs in the threadpool, not on the event loop.
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled; set ADMIN_TOKEN to enable them.")
+    if x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token.")
+    registry = get_registry()
+    reloaded = registry.reload()
+    return {"reloaded": reloaded, "models": list(registry.metrics.keys())}
+
+@router.get("/health", tags=["Monitoring"])
+def health():
+    """Liveness: the process is up and serving HTTP."""
+    return {"status": "ok"}
+
+@router.get("/ready", tags=["Monitoring"])
+def ready():
+    """Readiness: models are loaded and warmed, so requests will not hit a cold start."""
+    if not _readiness["ready"]:
+        raise HTTPException(status_code=503, detail="Warming up.", headers={"Retry-After": "1"})
+    return {"status": "ready", "startup_seconds": _readiness["startup_seconds"]}
+
+@router.get("/stats", tags=["Monitoring"])
+def get_stats():
+    """Model cache, inference pool and micro-batching statistics, and this worker's memory."""
+    stats = {"model_cache": get_registry().stats(), "inference_pool": get_inference_pool().stats(),
+             "prediction_cache": get_prediction_cache().stats(),
+             # Per worker process; memory-mapped compact models count as shared
+             "process": {"pid": os.getpid(), "memory_mb": telemetry.process_memory()}}
+    if MICRO_BATCHING:
+        stats["micro_batching"] = get_micro_batcher().stats()
+    return stats
+
+@router.get("/metrics", tags=["Monitoring"], response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus metrics: per-stage latency histograms, request/error counts and in-flight gauges."""
+    if not telemetry.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled.")
+    # Refresh component gauges from their current stats
+    components = {"model_cache": get_registry().stats(), "inference_pool": get_inference_pool().stats(),
+                  "prediction_cache": get_prediction_cache().stats()}
+    if MICRO_BATCHING:
+        components["micro_batching"] = get_micro_batcher().stats()
+    for component, stats in components.items():
+        for stat, value in stats.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                telemetry.COMPONENT_STATS.set(value, component=component, stat=stat)
+            elif isinstance(value, dict):
+                for sub, sub_value in value.items():
+                    if isinstance(sub_value, (int, float)) and not isinstance(sub_value, bool):
+                        telemetry.COMPONENT_STATS.set(sub_value, component=component, stat=f"{stat}_{sub}")
+    return PlainTextResponse(telemetry.render(), media_type="text/plain; version=0.0.4")
 
 @router.post("/predict", response_model=PredictionResponse, tags=["Prediction"])
-def predict(
+async def predict(
     file: UploadFile = File(..., description="Image file (PNG/JPG)"),
     model_name: str = Form(..., description="Model display name, e.g. Linear SVM")
 ):
     """Predict Parkinson's from an uploaded image using the selected model."""
-    logger.info(f"Received prediction request: file={file.filename}, model_name={model_name}")
-    # Validate model name
-    if model_name not in METRICS:
-        logger.warning(f"Invalid model requested: {model_name}")
-        raise HTTPException(status_code=400, detail=f"Invalid model_name. Choose from: {list(METRICS.keys())}")
-    pickle_file = METRICS[model_name]["pickle_file"]
-    # Validate file type (case-insensitive)
-    if not file.filename.lower().endswith((".png", ".jpg", ".jpeg")):
-        logger.warning(f"Invalid file type: {file.filename}")
-        raise HTTPException(status_code=400, detail="Only PNG and JPG images are supported.")
-    # Save uploaded file securely
-    os.makedirs(TEMP_UPLOAD_DIR, exist_ok=True)
-    temp_filename = f"{uuid.uuid4().hex}_{file.filename}"
-    temp_path = os.path.join(TEMP_UPLOAD_DIR, temp_filename)
-    try:
-        logger.info(f"Saving uploaded file to {temp_path}")
-        with open(temp_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        file_size = os.path.getsize(temp_path)
-        logger.info(f"Saved file size: {file_size} bytes")
-        # Validate image with PIL
+    # One snapshot of metrics.json per request, so a concurrent reload cannot change it mid-request
+    metrics = get_registry().metrics
+    spec = _model_spec(metrics, model_name)
+    # Unknown model names are not used as labels, to keep label cardinality bounded
+    with _track_request("predict", spec.key if spec else "unknown"):
+        logger.info(f"Received prediction request: file={file.filename}, model_name={model_name}")
+        # Validate model name
+        if spec is None:
+            logger.warning(f"Invalid model requested: {model_name}")
+            raise HTTPException(status_code=400, detail=f"Invalid model_name. Choose from: {list(metrics.keys())}")
+        pickle_file = spec.pickle_file
+        # Validate file type (case-insensitive)
+        if not file.filename.lower().endswith(IMAGE_EXTENSIONS):
+            logger.warning(f"Invalid file type: {file.filename}")
+            raise HTTPException(status_code=400, detail="Only PNG and JPG images are supported.")
+        # Read the upload into memory without blocking the event loop; nothing is written to disk
+        with timed("upload_read", model=spec.key):
+            contents = await file.read()
+        logger.info(f"Read uploaded file size: {len(contents)} bytes")
+        # Identical bytes for the same model version and feature parameters always give the same label
+        cache = get_prediction_cache()
+        # The lookup stats the model file and may query the shared SQLite cache, so it runs off the event loop
+        cache_key, cached = await asyncio.to_thread(_cached_prediction, cache, spec, contents)
+        if cached is not None:
+            logger.info(f"Prediction served from cache for {file.filename} with model {pickle_file}: {cached.capitalize()}")
+            return {"prediction": cached.capitalize()}
         try:
-            with Image.open(temp_path) as img:
-                img.verify()
-            logger.info(f"PIL successfully verified image: {temp_path}")
-        except Exception as pil_err:
-            logger.error(f"Uploaded file is not a valid image: {pil_err}")
-            raise HTTPException(status_code=400, detail="Uploaded file is not a valid image.")
-        # Run prediction
-        logger.info(f"Running prediction using model: {pickle_file}")
-        predictor = Predict(model_name=pickle_file.replace("model_", "").replace(".pkl", ""))
-        result = predictor.predict_from_image(temp_path)
-        prediction = result[0].capitalize()
-        logger.info(f"Prediction successful for {file.filename} with model {pickle_file}: {prediction}")
-        return {"prediction": prediction}
-    except Exception as e:
-        logger.error(f"Prediction failed: {e}")
-        raise HTTPException(status_code=400, detail=f"Prediction failed: {e}")
-    finally:
-        # Clean up temp file
+            # Validation, featurization and inference run on the dedicated inference pool
+            logger.info(f"Running prediction using model: {pickle_file}")
+            pool = get_inference_pool()
+            if MICRO_BATCHING:
+                # Featurize on the pool, then classify together with concurrent requests for this model
+                features = await pool.run(_featurize_image, spec, contents)
+                result = await get_micro_batcher().predict(spec, features)
+            else:
+                result = await pool.run(_predict_image, spec, contents)
+            if cache_key is not None:
+                await asyncio.to_thread(cache.set, cache_key, pickle_file, str(result))
+            prediction = result.capitalize()
+            logger.info(f"Prediction successful for {file.filename} with model {pickle_file}: {prediction}")
+            return {"prediction": prediction}
+        except PoolSaturated as e:
+            raise _busy_error(e)
+        except ImageTooLarge as e:
+            logger.error(f"Uploaded image is too large: {file.filename}: {e}")
+            raise HTTPException(status_code=413, detail=str(e))
+        except InvalidImageError as e:
+            logger.error(f"Uploaded file is not a valid image: {file.filename}")
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            logger.error(f"Prediction failed: {e}")
+            raise HTTPException(status_code=400, detail=f"Prediction failed: {e}")
+
+@router.post("/predict/batch", response_model=BatchPredictionResponse, tags=["Prediction"])
+async def predict_batch(
+    files: List[UploadFile] = File(..., description="Image files (PNG/JPG) and/or .zip archives of images"),
+    model_name: str = Form(..., description="Model display name, e.g. Linear SVM")
+):
+    """Predict Parkinson's for many images at once with a single classifier call."""
+    metrics = get_registry().metrics
+    spec = _model_spec(metrics, model_name)
+    with _track_request("predict_batch", spec.key if spec else "unknown"):
+        if spec is None:
+            logger.warning(f"Invalid model requested: {model_name}")
+            raise HTTPException(status_code=400, detail=f"Invalid model_name. Choose from: {list(metrics.keys())}")
+        try:
+            with timed("upload_read", model=spec.key):
+                items = await _read_uploads(files)
+        except BatchTooLarge as e:
+            logger.warning(f"Rejecting batch: {e}")
+            raise HTTPException(status_code=413, detail=str(e))
+        logger.info(f"Received batch prediction request: {len(items)} images, model_name={model_name}")
+        if not items:
+            raise HTTPException(status_code=400, detail="No images were uploaded.")
+        try:
+            results = await get_inference_pool().run(_predict_batch, spec, items)
+        except PoolSaturated as e:
+            raise _busy_error(e)
+        except Exception as e:
+            logger.error(f"Batch prediction failed: {e}")
+            raise HTTPException(status_code=400, detail=f"Prediction failed: {e}")
+        predicted = sum(1 for r in results if r["prediction"] is not None)
+        logger.info(f"Batch prediction finished: {predicted} of {len(items)} images predicted")
+        return {"results": results}
+
+@router.post("/predict/ensemble", response_model=EnsemblePredictionResponse, tags=["Prediction"])
+async def predict_ensemble(
+    file: UploadFile = File(..., description="Image file (PNG/JPG)"),
+    model_names: Optional[List[str]] = Form(None, description="Model display names to combine; all models if omitted")
+):
+    """Predict with several models at once and combine them by majority vote. Features are extracted only once."""
+    metrics = get_registry().metrics
+    with _track_request("predict_ensemble", "ensemble"):
+        model_names = model_names or list(metrics.keys())
+        specs = [_model_spec(metrics, name) for name in model_names]
+        if not specs or None in specs:
+            invalid = [name for name, spec in zip(model_names, specs) if spec is None]
+            logger.warning(f"Invalid models requested for ensemble: {invalid}")
+            raise HTTPException(status_code=400, detail=f"Invalid model_names {invalid}. Choose from: {list(metrics.keys())}")
+        if not file.filename.lower().endswith(IMAGE_EXTENSIONS):
+            raise HTTPException(status_code=400, detail="Only PNG and JPG images are supported.")
+        with timed("upload_read", model="ensemble"):
+            contents = await file.read()
+        logger.info(f"Received ensemble prediction request: file={file.filename}, models={model_names}")
         try:
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-                logger.info(f"Cleaned up temp file: {temp_path}")
-        except Exception as cleanup_err:
-            logger.warning(f"Failed to clean up temp file: {cleanup_err}")
+            results = await get_inference_pool().run(_predict_ensemble, specs, contents)
+        except PoolSaturated as e:
+            raise _busy_error(e)
+        except ImageTooLarge as e:
+            logger.error(f"Uploaded image is too large: {file.filename}: {e}")
+            raise HTTPException(status_code=413, detail=str(e))
+        except InvalidImageError as e:
+            logger.error(f"Uploaded file is not a valid image: {file.filename}")
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            logger.error(f"Ensemble prediction failed: {e}")
+            raise HTTPException(status_code=400, detail=f"Prediction failed: {e}")
+        per_model = {}
+        for name, result in results.items():
+            probabilities = result["probabilities"]
+            per_model[name] = {
+                "prediction": result["prediction"].capitalize(),
+                "probabilities": {label.capitalize(): p for label, p in probabilities.items()} if probabilities else None,
+            }
+        combined = combine_predictions(per_model)
+        logger.info(f"Ensemble prediction for {file.filename}: {combined['prediction']} (votes {combined['votes']})")
+        return combined
@@ -0,0 +1,129 @@
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from src.predictions.model_registry import start_model_watcher
+
+logger = logging.getLogger("parkinsons_api")
+
+# Config
+INFERENCE_POOL_KIND = os.getenv("INFERENCE_POOL_KIND", "thread")  # "thread" or "process"
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", str(os.cpu_count() or 1)))
+# Requests allowed to wait for a worker; beyond workers + queue, new requests are rejected
+INFERENCE_QUEUE_SIZE = int(os.getenv("INFERENCE_QUEUE_SIZE", "32"))
+
+
+class PoolSaturated(Exception):
+    """Raised when the inference pool is at its admission limit."""
+
+
+def _call_timed(fn, args):
+    # Runs in the worker; time.monotonic is system-wide, so it is comparable across processes
+    started = time.monotonic()
+    return started, fn(*args)
+
+
+class InferencePool:
+    """
+    Dedicated, bounded pool for CPU-bound featurization and inference.
+
+    Keeps that work off the event loop and out of the default anyio threadpool.
+    At most `max_workers + max_queue` jobs are admitted at once; beyond that `run`
+    raises PoolSaturated immediately so the API can shed load instead of queueing
+    without bound. `run` must be awaited from the event loop thread.
+    """
+    def __init__(self, max_workers=INFERENCE_WORKERS, max_queue=INFERENCE_QUEUE_SIZE, kind=INFERENCE_POOL_KIND):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown inference pool kind '{kind}'. Choose from: ['thread', 'process']")
+        self.kind = kind
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        if kind == "process":
+            # Each worker process has its own model registry, so each runs its own watcher
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=start_model_watcher)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+        self._in_flight = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._wait_times = deque(maxlen=1000)
+        self._run_times = deque(maxlen=1000)
+
+    @property
+    def capacity(self):
+        return self.max_workers + self.max_queue
+
+    @property
+    def queue_depth(self):
+        return max(0, self._in_flight - self.max_workers)
+
+    async def run(self, fn, *args):
+        """Run fn(*args) on the pool, or raise PoolSaturated if the admission limit is reached."""
+        if self._in_flight >= self.capacity:
+            self._rejected += 1
+            raise PoolSaturated(f"Inference pool saturated ({self._in_flight} requests in flight)")
+        self._in_flight += 1
+        submitted = time.monotonic()
+        try:
+            loop = asyncio.get_running_loop()
+            started, result = await loop.run_in_executor(self._executor, _call_timed, fn, args)
+            finished = time.monotonic()
+            self._wait_times.append(started - submitted)
+            self._run_times.append(finished - started)
+            self._completed += 1
+            return result
+        except Exception:
+            self._failed += 1
+            raise
+        finally:
+            self._in_flight -= 1
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+    def stats(self):
+        waits = sorted(self._wait_times)
+        runs = sorted(self._run_times)
+        def percentile(values, q):
+            return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "queue_depth": self.queue_depth,
+            "completed": self._completed,
+            "failed": self._failed,
+            "rejected": self._rejected,
+            "wait_time_ms": {
+                "mean": 1000 * sum(waits) / len(waits) if waits else 0.0,
+                "p95": 1000 * percentile(waits, 0.95),
+                "max": 1000 * waits[-1] if waits else 0.0,
+            },
+            "run_time_ms": {
+                "mean": 1000 * sum(runs) / len(runs) if runs else 0.0,
+                "p95": 1000 * percentile(runs, 0.95),
+            },
+        }
+
+
+_pool = None
+
+
+def get_inference_pool():
+    """Return the process-wide InferencePool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        _pool = InferencePool()
+        logger.info(f"Started {_pool.kind} inference pool with {_pool.max_workers} workers, queue size {_pool.max_queue}")
+    return _pool
+
+
+def shutdown_inference_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 class ModelMetrics(BaseModel):
     """Metrics for a trained model."""
@@ -16,3 +16,24 @@ class ModelsResponse(BaseModel):
 class PredictionResponse(BaseModel):
     """Response model for a prediction result."""
     prediction: str
+
+class BatchPredictionItem(BaseModel):
+    """Prediction result (or error) for one image in a batch."""
+    filename: str
+    prediction: Optional[str] = None
+    error: Optional[str] = None
+
+class BatchPredictionResponse(BaseModel):
+    """Response model for a batch prediction, one item per image in upload order."""
+    results: List[BatchPredictionItem]
+
+class ModelPrediction(BaseModel):
+    """One model's label, with class probabilities if the model provides them."""
+    prediction: str
+    probabilities: Optional[Dict[str, float]] = None
+
+class EnsemblePredictionResponse(BaseModel):
+    """Combined vote of several models on one image, with each model's own result."""
+    prediction: str
+    votes: Dict[str, int]
+    models: Dict[str, ModelPrediction]
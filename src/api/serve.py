@@ -0,0 +1,90 @@
+"""
+Production entry point: several uvicorn worker processes behind one listening socket.
+
+    API_WORKERS=4 python -m src.api.serve --host 0.0.0.0 --port 8000
+
+Before any worker starts, every model in metrics.json is given an up-to-date
+compact export (see compact_models). Workers then memory-map the same read-only
+.npy files instead of each unpickling a private copy, so the model arrays are
+held once in the page cache and shared by all of them; only interpreter state
+and per-request buffers are per worker.
+
+Each worker loads and warms its models in the application lifespan before it
+starts accepting connections, so no request reaches a cold worker. The uvicorn
+supervisor replaces workers that die; SIGHUP restarts them one at a time, so
+the other workers keep serving while each one is replaced. Whether the old
+worker is retired before or after its replacement is ready is up to the
+installed uvicorn version, so a restarted worker's slot may be briefly empty.
+SIGTERM stops the workers gracefully, letting in-flight requests finish within
+GRACEFUL_SHUTDOWN_SECONDS.
+"""
+import os
+import sys
+import socket
+import logging
+import argparse
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("parkinsons_api")
+
+# Config
+API_HOST = os.getenv("API_HOST", "127.0.0.1")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+API_WORKERS = int(os.getenv("API_WORKERS", "1"))
+GRACEFUL_SHUTDOWN_SECONDS = int(os.getenv("GRACEFUL_SHUTDOWN_SECONDS", "30"))
+
+
+def prepare_exports(registry=None):
+    """
+    Export every scikit-learn model in metrics.json whose compact artifact is missing or stale.
+
+    Returns the pickle files that were exported. Models without a compact format
+    are left to be unpickled by each worker.
+    """
+    from src.predictions.model_registry import ModelRegistry
+    from src.predictions.model_backends import DEFAULT_BACKEND
+    from src.predictions.compact_models import load_exported, export_model
+    registry = registry or ModelRegistry()
+    exported = []
+    for spec in registry.specs(registry.load_metrics()):
+        model_path = os.path.join(registry.models_dir, spec.pickle_file)
+        if spec.backend != DEFAULT_BACKEND or not os.path.exists(model_path) or load_exported(model_path) is not None:
+            continue
+        # Only reached for models that were never exported; imports scikit-learn once, in the supervisor
+        import joblib
+        if export_model(joblib.load(model_path), model_path) is not None:
+            exported.append(spec.pickle_file)
+    return exported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the API with several worker processes sharing model memory.")
+    parser.add_argument("--host", default=API_HOST, help="Interface to bind.")
+    parser.add_argument("--port", type=int, default=API_PORT, help="Port to bind.")
+    parser.add_argument("--workers", type=int, default=API_WORKERS, help="Worker processes (env API_WORKERS).")
+    args = parser.parse_args()
+    workers = max(1, args.workers)
+
+    exported = prepare_exports()
+    if exported:
+        logger.info(f"Exported compact models for shared memory-mapped serving: {exported}")
+    # Split the cores between the workers' inference pools unless configured explicitly
+    os.environ.setdefault("INFERENCE_WORKERS", str(max(1, (os.cpu_count() or 1) // workers)))
+
+    import uvicorn
+    from uvicorn.supervisors import Multiprocess
+    config = uvicorn.Config("src.api.main:app", host=args.host, port=args.port, workers=workers,
+                            timeout_graceful_shutdown=GRACEFUL_SHUTDOWN_SECONDS)
+    logger.info(f"Starting {workers} API worker(s) on {args.host}:{args.port}")
+    if workers == 1:
+        uvicorn.Server(config).run()
+        return
+    # Workers serve connections accepted on this socket, which inherit TCP_NODELAY from it; uvicorn
+    # does not set it there, and without it every keep-alive response stalls ~40 ms on delayed ACKs
+    sock = config.bind_socket()
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    Multiprocess(config, sockets=[sock]).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,455 @@
+"""
+Compact, scikit-learn-free inference engine and model artifacts for serving.
+
+The fitted parameters of a trained bundle are reduced to plain NumPy arrays:
+the weights and bias of a linear model, the flattened node arrays of every tree
+in a random forest, or the training matrix of a k-nearest-neighbors model.
+Prediction is then a dot product, a vectorized traversal of all trees at once,
+or a BLAS nearest-neighbor search, without scikit-learn's per-call input
+validation. The compact predictors have the same predict/inverse_transform
+interface as the pickled bundle and give identical predictions.
+
+`compile_bundle` builds them from an unpickled bundle. `export_model` writes
+them as raw arrays next to the pickle (model_X.pkl -> model_X.compact/), and
+`load_exported` memory-maps them back, so the API never has to import
+scikit-learn or unpickle estimator objects at startup.
+
+A bundle may also hold a "reducer" (a ProjectionReducer or SelectionReducer)
+that maps HOG vectors to the fewer float32 dimensions the classifier was
+trained on; it is plain NumPy too and is exported alongside the classifier.
+
+An export records the size and mtime of the pickle it was made from and is
+ignored once the pickle changes, so a retrained model is never served from a
+stale export.
+"""
+import os
+import sys
+import json
+import uuid
+import contextlib
+import argparse
+import numpy as np
+
+EXPORT_SUFFIX = ".compact"
+EXPORT_FORMAT_VERSION = 5
+# Extra candidates re-ranked in float64 after the float32 neighbor search
+KNN_CANDIDATE_MARGIN = 16
+
+
+class CompactLabelEncoder:
+    """Maps encoded class indices back to label names, like a fitted LabelEncoder."""
+    def __init__(self, classes):
+        self.classes_ = np.asarray(classes)
+
+    def inverse_transform(self, y):
+        return self.classes_[np.asarray(y, dtype=np.intp)]
+
+
+class LinearModel:
+    """Binary linear classifier: `classes_[decision > 0]` with `decision = X @ coef + intercept`."""
+    kind = "linear"
+
+    def __init__(self, coef, intercept, classes):
+        self.coef = coef
+        self.intercept = intercept
+        self.classes_ = np.asarray(classes)
+        self.n_features_in_ = coef.shape[0]
+
+    @classmethod
+    def from_estimator(cls, estimator):
+        coef = np.asarray(estimator.coef_, dtype=np.float64)
+        if coef.shape[0] != 1 or len(estimator.classes_) != 2:
+            raise ValueError("Only binary linear models can be exported")
+        return cls(np.ascontiguousarray(coef[0]), np.asarray(estimator.intercept_, dtype=np.float64),
+                   estimator.classes_)
+
+    def decision_function(self, X):
+        return np.asarray(X, dtype=np.float64) @ self.coef + self.intercept[0]
+
+    def predict(self, X):
+        return self.classes_[(self.decision_function(X) > 0).astype(np.intp)]
+
+    def arrays(self):
+        return {"coef": self.coef, "intercept": self.intercept, "classes": self.classes_}
+
+    @classmethod
+    def from_arrays(cls, arrays, meta):
+        return cls(arrays["coef"], arrays["intercept"], arrays["classes"])
+
+    def meta(self):
+        return {}
+
+
+class ForestModel:
+    """
+    Random forest stored as flat float32/int32 node arrays shared by all trees.
+
+    Node `i` sends a sample to `left[i]` when x[feature[i]] <= threshold[i] and to
+    `right[i]` otherwise. Leaves point to themselves (threshold +inf), so every
+    tree can be walked `depth` steps in lockstep without masking finished trees.
+    `value[i]` holds the class probabilities of leaf `i`; `roots[t]` is the
+    first node of tree `t`.
+    """
+    kind = "forest"
+
+    def __init__(self, feature, threshold, left, right, value, roots, classes, n_features, depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.classes_ = np.asarray(classes)
+        self.n_features_in_ = int(n_features)
+        self.depth = int(depth)
+
+    @classmethod
+    def from_estimator(cls, estimator):
+        if getattr(estimator, "n_outputs_", 1) != 1:
+            raise ValueError("Only single-output forests can be exported")
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        for tree in (e.tree_ for e in estimator.estimators_):
+            is_leaf = tree.children_left == -1
+            own = np.arange(offset, offset + tree.node_count)
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+            thresholds.append(np.where(is_leaf, np.float32(np.inf), _round_down_float32(tree.threshold)))
+            lefts.append(np.where(is_leaf, own, tree.children_left + offset).astype(np.int32))
+            rights.append(np.where(is_leaf, own, tree.children_right + offset).astype(np.int32))
+            # Leaf class counts (or fractions) normalized to probabilities, as DecisionTreeClassifier.predict_proba
+            # does. Kept in float64 so summing them reproduces RandomForestClassifier's argmax ties exactly.
+            value = tree.value[:, 0, :].astype(np.float64)
+            normalizer = value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            values.append(value / normalizer)
+            roots.append(offset)
+            offset += tree.node_count
+        depth = max(e.tree_.max_depth for e in estimator.estimators_)
+        return cls(np.concatenate(features), np.concatenate(thresholds).astype(np.float32), np.concatenate(lefts),
+                   np.concatenate(rights), np.concatenate(values), np.asarray(roots, dtype=np.int32),
+                   estimator.classes_, estimator.n_features_in_, depth)
+
+    def apply(self, X):
+        """Leaf node reached in every tree, shape (n_samples, n_trees)."""
+        # Trees compare float32 features, as scikit-learn does
+        X = np.atleast_2d(np.asarray(X, dtype=np.float32))
+        rows = np.arange(X.shape[0])[:, None]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], len(self.roots)))
+        for _ in range(self.depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def predict_proba(self, X):
+        leaves = self.apply(X)
+        proba = np.zeros((leaves.shape[0], self.value.shape[1]))
+        # Summed tree by tree in estimator order, matching RandomForestClassifier.predict_proba
+        for t in range(leaves.shape[1]):
+            proba += self.value[leaves[:, t]]
+        return proba / leaves.shape[1]
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def predict_with_proba(self, X):
+        """Labels and probabilities from a single traversal."""
+        proba = self.predict_proba(X)
+        return self.classes_[np.argmax(proba, axis=1)], proba
+
+    def arrays(self):
+        return {"feature": self.feature, "threshold": self.threshold, "left": self.left, "right": self.right,
+                "value": self.value, "roots": self.roots, "classes": self.classes_}
+
+    @classmethod
+    def from_arrays(cls, arrays, meta):
+        return cls(arrays["feature"], arrays["threshold"], arrays["left"], arrays["right"], arrays["value"],
+                   arrays["roots"], arrays["classes"], meta["n_features"], meta["depth"])
+
+    def meta(self):
+        return {"depth": self.depth}
+
+
+class KNeighborsModel:
+    """
+    Uniform-weight Euclidean k-nearest-neighbors classifier.
+
+    A float32 copy of the training matrix and its squared row norms are
+    precomputed, so the candidate search is one matrix product (||t||^2 - 2 t.x
+    ranks neighbors like the distance) plus a partial sort. The best
+    `n_neighbors + KNN_CANDIDATE_MARGIN` candidates are then re-ranked with
+    float64 distances to the unrounded training rows, so near ties among them
+    are decided as in scikit-learn.
+    """
+    kind = "knn"
+
+    def __init__(self, train, train32, sq_norms, labels, classes, n_neighbors):
+        self.train = train
+        self.train32 = train32
+        self.sq_norms = sq_norms
+        self.labels = labels
+        self.classes_ = np.asarray(classes)
+        self.n_neighbors = int(n_neighbors)
+        self.n_features_in_ = train.shape[1]
+
+    @classmethod
+    def from_estimator(cls, estimator):
+        metric = estimator.effective_metric_
+        p = (estimator.effective_metric_params_ or {}).get("p", 2)
+        if not (metric == "euclidean" or (metric == "minkowski" and p == 2)):
+            raise ValueError(f"Only Euclidean neighbors can be exported, not '{metric}'")
+        if estimator.weights != "uniform" or getattr(estimator, "outputs_2d_", False):
+            raise ValueError("Only uniform-weight, single-output neighbors can be exported")
+        train = np.ascontiguousarray(estimator._fit_X, dtype=np.float64)
+        train32 = train.astype(np.float32)
+        return cls(train, train32, np.einsum("ij,ij->i", train32, train32), np.asarray(estimator._y, dtype=np.int32),
+                   estimator.classes_, estimator.n_neighbors)
+
+    def kneighbors(self, X):
+        """Indices of the nearest training rows, closest first, shape (n_samples, n_neighbors)."""
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        scores = self.sq_norms - 2 * (X.astype(np.float32) @ self.train32.T)
+        n_candidates = min(len(self.train), self.n_neighbors + KNN_CANDIDATE_MARGIN)
+        if n_candidates < len(self.train):
+            candidates = np.argpartition(scores, n_candidates - 1, axis=1)[:, :n_candidates]
+        else:
+            candidates = np.broadcast_to(np.arange(len(self.train)), scores.shape)
+        neighbors = np.empty((X.shape[0], self.n_neighbors), dtype=np.intp)
+        for i, (x, rows) in enumerate(zip(X, candidates)):
+            diff = self.train[rows] - x
+            distances = np.einsum("ij,ij->i", diff, diff)
+            # Ties go to the lower training index
+            neighbors[i] = rows[np.lexsort((rows, distances))[:self.n_neighbors]]
+        return neighbors
+
+    def _vote_counts(self, X):
+        votes = self.labels[self.kneighbors(X)]
+        return np.apply_along_axis(np.bincount, 1, votes, minlength=len(self.classes_))
+
+    def predict_proba(self, X):
+        return self._vote_counts(X) / self.n_neighbors
+
+    def predict(self, X):
+        # Majority vote; ties go to the first class, as in KNeighborsClassifier
+        return self.classes_[np.argmax(self._vote_counts(X), axis=1)]
+
+    def predict_with_proba(self, X):
+        """Labels and probabilities from a single neighbor search."""
+        counts = self._vote_counts(X)
+        return self.classes_[np.argmax(counts, axis=1)], counts / self.n_neighbors
+
+    def arrays(self):
+        return {"train": self.train, "train32": self.train32, "sq_norms": self.sq_norms, "labels": self.labels, "classes": self.classes_}
+
+    @classmethod
+    def from_arrays(cls, arrays, meta):
+        return cls(arrays["train"], arrays["train32"], arrays["sq_norms"], arrays["labels"], arrays["classes"],
+                   meta["n_neighbors"])
+
+    def meta(self):
+        return {"n_neighbors": self.n_neighbors}
+
+
+class ProjectionReducer:
+    """Linear projection to fewer dimensions, `(X - mean) @ components.T` in float32, as fitted by PCA or truncated SVD."""
+    kind = "projection"
+
+    def __init__(self, mean, components):
+        self.mean = mean
+        self.components = components
+        self.n_features_in_ = components.shape[1]
+        self.n_components_ = components.shape[0]
+
+    @classmethod
+    def from_estimator(cls, estimator):
+        components = np.ascontiguousarray(estimator.components_, dtype=np.float32)
+        # TruncatedSVD does not center the data
+        mean = getattr(estimator, "mean_", None)
+        mean = np.zeros(components.shape[1], dtype=np.float32) if mean is None else np.asarray(mean, dtype=np.float32)
+        return cls(mean, components)
+
+    def transform(self, X):
+        return (np.asarray(X, dtype=np.float32) - self.mean) @ self.components.T
+
+    def arrays(self):
+        return {"mean": self.mean, "components": self.components}
+
+    @classmethod
+    def from_arrays(cls, arrays, meta):
+        return cls(arrays["mean"], arrays["components"])
+
+    def meta(self):
+        return {}
+
+
+class SelectionReducer:
+    """Keeps the feature columns chosen by a feature selector, as float32."""
+    kind = "selection"
+
+    def __init__(self, indices, n_features):
+        self.indices = indices
+        self.n_features_in_ = n_features
+        self.n_components_ = len(indices)
+
+    @classmethod
+    def from_estimator(cls, estimator):
+        return cls(np.asarray(estimator.get_support(indices=True), dtype=np.intp), estimator.n_features_in_)
+
+    def transform(self, X):
+        return np.asarray(X, dtype=np.float32)[:, self.indices]
+
+    def arrays(self):
+        return {"indices": self.indices}
+
+    @classmethod
+    def from_arrays(cls, arrays, meta):
+        return cls(arrays["indices"], meta["n_features"])
+
+    def meta(self):
+        return {"n_features": self.n_features_in_}
+
+
+REDUCER_KINDS = {reducer.kind: reducer for reducer in (ProjectionReducer, SelectionReducer)}
+
+
+def compact_reducer(estimator):
+    """ProjectionReducer or SelectionReducer equivalent of a fitted scikit-learn PCA, TruncatedSVD or selector."""
+    if hasattr(estimator, "components_"):
+        return ProjectionReducer.from_estimator(estimator)
+    if hasattr(estimator, "get_support"):
+        return SelectionReducer.from_estimator(estimator)
+    raise ValueError(f"No compact format for {type(estimator).__name__}")
+
+
+def _round_down_float32(values):
+    """
+    Largest float32 not above each float64 value. For float32 inputs x,
+    `x <= t` and `x <= _round_down_float32(t)` always agree.
+    """
+    rounded = values.astype(np.float32)
+    above = rounded.astype(np.float64) > values
+    rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+    return rounded
+
+
+MODEL_KINDS = {model.kind: model for model in (LinearModel, ForestModel, KNeighborsModel)}
+
+
+def _compact_classifier(classifier):
+    if hasattr(classifier, "estimators_") and hasattr(classifier.estimators_[0], "tree_"):
+        return ForestModel.from_estimator(classifier)
+    if hasattr(classifier, "coef_"):
+        return LinearModel.from_estimator(classifier)
+    if hasattr(classifier, "_fit_X") and hasattr(classifier, "n_neighbors"):
+        return KNeighborsModel.from_estimator(classifier)
+    raise ValueError(f"No compact format for {type(classifier).__name__}")
+
+
+def compile_bundle(bundle):
+    """
+    Compact version of an unpickled {"classifier", "label_encoder"} bundle, or the
+    bundle unchanged if its classifier has no compact form.
+    """
+    try:
+        classifier = _compact_classifier(bundle["classifier"])
+    except ValueError:
+        return bundle
+    return {**bundle, "classifier": classifier, "label_encoder": CompactLabelEncoder(bundle["label_encoder"].classes_)}
+
+
+def exported_path(model_path):
+    return os.path.splitext(model_path)[0] + EXPORT_SUFFIX
+
+
+def _source_identity(model_path):
+    stat = os.stat(model_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def export_model(bundle, model_path):
+    """
+    Write the compact artifact for the bundle saved at `model_path`.
+
+    Returns the export directory, or None if the classifier has no compact format
+    (the pickle is then served as before).
+    """
+    try:
+        compact = _compact_classifier(bundle["classifier"])
+    except ValueError as e:
+        print(f"[INFO] Not exporting {os.path.basename(model_path)}: {e}")
+        return None
+    export_dir = exported_path(model_path)
+    os.makedirs(export_dir, exist_ok=True)
+    arrays = {**compact.arrays(), "label_classes": np.asarray(bundle["label_encoder"].classes_)}
+    meta = {
+        "format_version": EXPORT_FORMAT_VERSION,
+        "kind": compact.kind,
+        "n_features": compact.n_features_in_,
+        **compact.meta(),
+        "source": _source_identity(model_path),
+    }
+    reducer = bundle.get("reducer")
+    if reducer is not None:
+        arrays.update({f"reducer_{name}": array for name, array in reducer.arrays().items()})
+        meta["reducer"] = {"kind": reducer.kind, **reducer.meta()}
+    # Arrays go to file names unique to this export and meta.json, which lists them, is switched in
+    # with one atomic rename. A reader therefore sees either the old export or the new one, never a mix,
+    # and bundles still memory-mapping the old files keep them until they are released.
+    version = uuid.uuid4().hex[:12]
+    meta["arrays"] = {name: f"{name}.{version}.npy" for name in arrays}
+    for name, array in arrays.items():
+        np.save(os.path.join(export_dir, meta["arrays"][name]), np.ascontiguousarray(array), allow_pickle=False)
+    tmp_path = os.path.join(export_dir, f"meta.json.{version}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, os.path.join(export_dir, "meta.json"))
+    # Files of earlier exports; a reader that loaded their meta.json just before the switch falls back to the pickle
+    current = set(meta["arrays"].values())
+    for name in os.listdir(export_dir):
+        if name.endswith(".npy") and name not in current:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(export_dir, name))
+    print(f"[INFO] Exported compact model to {export_dir}")
+    return export_dir
+
+
+def load_exported(model_path, mmap_mode="r"):
+    """
+    Load the compact artifact for `model_path` as a {"classifier", "label_encoder"} bundle,
+    or return None if there is no export or it was made from a different pickle.
+    """
+    export_dir = exported_path(model_path)
+    try:
+        with open(os.path.join(export_dir, "meta.json")) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get("format_version") != EXPORT_FORMAT_VERSION or meta.get("source") != _source_identity(model_path):
+        return None
+    model = MODEL_KINDS.get(meta["kind"])
+    if model is None:
+        return None
+    try:
+        arrays = {name: np.load(os.path.join(export_dir, file_name), mmap_mode=mmap_mode, allow_pickle=False)
+                  for name, file_name in meta["arrays"].items()}
+    except OSError:
+        # Superseded by a newer export after meta.json was read
+        return None
+    classifier = model.from_arrays(arrays, meta)
+    bundle = {"classifier": classifier, "label_encoder": CompactLabelEncoder(arrays["label_classes"])}
+    if "reducer" in meta:
+        reducer_arrays = {name[len("reducer_"):]: array for name, array in arrays.items() if name.startswith("reducer_")}
+        bundle["reducer"] = REDUCER_KINDS[meta["reducer"]["kind"]].from_arrays(reducer_arrays, meta["reducer"])
+    return bundle
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export trained model pickles as compact, memory-mappable artifacts.")
+    parser.add_argument("model_paths", nargs="+", help="Model pickle files, e.g. models/model_RandomForest.pkl")
+    args = parser.parse_args()
+    import joblib
+    for model_path in args.model_paths:
+        export_model(joblib.load(model_path), model_path)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""
+Pluggable model backends and per-model serving metadata.
+
+Every entry of metrics.json describes one servable model as a ModelSpec: the
+file holding it, the backend that loads it and the features it expects. A
+backend is a function registered with `register_model_backend` that turns the
+model file into a bundle exposing `classifier.predict(X)` and
+`label_encoder.inverse_transform(y)`, so new model types can be served by
+registering a loader and listing them in metrics.json, without code changes in
+Predict or the API.
+
+    "K-Nearest Neighbors": {
+        "accuracy": 0.83,
+        "pickle_file": "model_KNN.pkl",
+        "backend": "sklearn",
+        "features": {"extractor": "hog", "params": {...}, "backend": "numpy", "feature_key": "...", "n_features": 12996}
+    }
+
+"backend" defaults to "sklearn" and "features" to the current HOG_PARAMS, so
+older metrics.json files keep working.
+"""
+import os
+from src.predictions.compact_models import load_exported, compile_bundle
+from src.preprocessing.hog_filter import HogFilter
+
+# Serve models through the compact inference engine (see compact_models), from an up-to-date export when there is one
+COMPACT_MODELS = os.getenv("COMPACT_MODELS", "true").lower() in ("1", "true", "yes")
+
+DEFAULT_BACKEND = "sklearn"
+
+MODEL_BACKENDS = {}
+
+
+def register_model_backend(name):
+    """Register `loader(model_path) -> (bundle, source)` as the backend called `name`."""
+    def decorator(loader):
+        MODEL_BACKENDS[name] = loader
+        return loader
+    return decorator
+
+
+@register_model_backend("sklearn")
+def load_sklearn_bundle(model_path):
+    """A joblib {"classifier", "label_encoder"} bundle of scikit-learn estimators, as written by the trainers."""
+    bundle = load_exported(model_path) if COMPACT_MODELS else None
+    if bundle is not None:
+        return bundle, "compact export"
+    # Unpickling imports scikit-learn, which dominates cold start; only done without an export
+    import joblib
+    bundle = joblib.load(model_path)
+    if COMPACT_MODELS:
+        # Serve through the compact engine anyway; the estimator objects are dropped
+        bundle = compile_bundle(bundle)
+    return bundle, "pickle"
+
+
+class ModelSpec:
+    """
+    How to load and feed one model listed in metrics.json.
+
+    `key` is the short name used in logs and metric labels and accepted by
+    Predict; it defaults to the pickle name without its "model_" prefix and
+    extension (model_LinearSVM.pkl -> LinearSVM).
+    """
+    def __init__(self, name, pickle_file, backend=DEFAULT_BACKEND, features=None, key=None):
+        self.name = name
+        self.pickle_file = pickle_file
+        self.backend = backend
+        self.features = features or {}
+        stem = os.path.splitext(pickle_file)[0]
+        self.key = key or (stem[len("model_"):] if stem.startswith("model_") else stem)
+
+    @classmethod
+    def from_entry(cls, name, entry):
+        if not entry.get("pickle_file"):
+            raise ValueError(f"Model '{name}' has no pickle_file in metrics.json")
+        return cls(name, entry["pickle_file"], entry.get("backend", DEFAULT_BACKEND), entry.get("features"),
+                   entry.get("key"))
+
+    def hog_filter(self):
+        """HogFilter configured with the preprocessing and HOG parameters this model was trained on."""
+        return HogFilter.from_description(self.features)
+
+    def feature_key(self):
+        return self.features.get("feature_key") or self.hog_filter().feature_key()
+
+    def _identity(self):
+        return (self.name, self.pickle_file, self.backend, self.key)
+
+    def __eq__(self, other):
+        return isinstance(other, ModelSpec) and self._identity() == other._identity()
+
+    def __hash__(self):
+        return hash(self._identity())
+
+    def __repr__(self):
+        return f"ModelSpec({self.name!r}, {self.pickle_file!r}, backend={self.backend!r})"
@@ -0,0 +1,314 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+import numpy as np
+from src.predictions.compact_models import exported_path
+from src.predictions.model_backends import ModelSpec, DEFAULT_BACKEND, MODEL_BACKENDS
+from src.preprocessing.hog_filter import HogFilter
+from src.utils.telemetry import timed
+
+logger = logging.getLogger("parkinsons_api")
+
+# Config
+MODELS_DIR = os.getenv("MODELS_DIR", os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'models')))
+MODEL_CACHE_SIZE = int(os.getenv("MODEL_CACHE_SIZE", "8"))
+# Seconds between checks for changed metrics.json/pickles; 0 disables the background watcher
+MODEL_RELOAD_INTERVAL = float(os.getenv("MODEL_RELOAD_INTERVAL", "0"))
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of loaded model bundles, keyed by pickle file name.
+
+    Bundles are loaded once (eagerly via `preload` or lazily on first `get`) and
+    shared by every request. Access is thread-safe, and the least recently used
+    bundle is evicted once more than `max_size` bundles are held.
+
+    The registry also holds the current contents of metrics.json, from which
+    `spec` resolves a model name to its ModelSpec (file, backend, features). `reload` picks
+    up a changed metrics.json and changed pickles of cached models: new bundles are
+    loaded and warmed with a dummy inference in the calling thread while requests
+    keep using the old ones, then swapped in under the lock. Bundles of models that are no
+    longer listed or whose pickle was deleted are dropped.
+    """
+    def __init__(self, models_dir=MODELS_DIR, max_size=MODEL_CACHE_SIZE):
+        self.models_dir = models_dir
+        self.metrics_path = os.path.join(models_dir, "metrics.json")
+        self.max_size = max(1, max_size)
+        self.metrics = {}
+        self._bundles = OrderedDict()
+        self._identities = {}
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._reload_lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._reloads = 0
+        self._load_times = {}
+
+    def model_path(self, pickle_file):
+        return os.path.join(self.models_dir, pickle_file)
+
+    def _disk_identity(self, pickle_file):
+        stat = os.stat(self.model_path(pickle_file))
+        identity = f"{pickle_file}@{stat.st_mtime_ns}-{stat.st_size}"
+        # An export written after the pickle (as the trainers do) also triggers a reload
+        try:
+            identity += f"+{os.stat(os.path.join(exported_path(self.model_path(pickle_file)), 'meta.json')).st_mtime_ns}"
+        except OSError:
+            pass
+        return identity
+
+    def model_identity(self, pickle_file):
+        """
+        Identity (name, mtime, size) of the version of a model being served.
+        For a loaded bundle this is the file it was loaded from, even if the file
+        has since been replaced and not yet reloaded.
+        """
+        with self._lock:
+            identity = self._identities.get(pickle_file)
+        return identity if identity is not None else self._disk_identity(pickle_file)
+
+    def load_metrics(self):
+        """(Re)read metrics.json into `self.metrics`; keeps the previous contents on failure."""
+        try:
+            with open(self.metrics_path, "r") as f:
+                self.metrics = json.load(f)
+        except Exception as e:
+            logger.error(f"Failed to load metrics: {e}")
+        return self.metrics
+
+    def specs(self, metrics=None):
+        """ModelSpec of every model in metrics.json (or in the given snapshot of it)."""
+        metrics = self.metrics if metrics is None else metrics
+        return [ModelSpec.from_entry(name, entry) for name, entry in metrics.items() if entry.get("pickle_file")]
+
+    def spec(self, model_name, metrics=None):
+        """Resolve a display name, model key (e.g. LinearSVM) or pickle file name to its ModelSpec."""
+        specs = self.specs(metrics)
+        for spec in specs:
+            if model_name in (spec.name, spec.key, spec.pickle_file):
+                return spec
+        raise ValueError(f"Unknown model_name '{model_name}'. Choose from: {[spec.name for spec in specs]}")
+
+    def get(self, pickle_file, backend=DEFAULT_BACKEND, key=None):
+        """
+        Return the bundle for `pickle_file`, loading it with `backend` on first use.
+        `key` is the model key used to label the load in metrics (derived from the file name by default).
+        """
+        with self._lock:
+            bundle = self._bundles.get(pickle_file)
+            if bundle is not None:
+                self._bundles.move_to_end(pickle_file)
+                self._hits += 1
+                return bundle
+            self._misses += 1
+            load_lock = self._load_locks.setdefault(pickle_file, threading.Lock())
+        # Only one thread loads a given file; the others wait and reuse its result
+        with load_lock:
+            with self._lock:
+                bundle = self._bundles.get(pickle_file)
+                if bundle is not None:
+                    self._bundles.move_to_end(pickle_file)
+                    return bundle
+            try:
+                bundle, identity = self._load(pickle_file, backend, key)
+                self._store(pickle_file, bundle, identity)
+            finally:
+                # Threads already waiting hold a reference; later lookups find the bundle or make a new lock
+                with self._lock:
+                    if self._load_locks.get(pickle_file) is load_lock:
+                        del self._load_locks[pickle_file]
+        return bundle
+
+    def _load(self, pickle_file, backend=DEFAULT_BACKEND, key=None):
+        if backend not in MODEL_BACKENDS:
+            raise ValueError(f"Unknown model backend '{backend}'. Choose from: {list(MODEL_BACKENDS.keys())}")
+        model_path = self.model_path(pickle_file)
+        # Identity is taken before loading; if the file changes mid-load the next reload catches it
+        identity = self._disk_identity(pickle_file)
+        start = time.perf_counter()
+        # Labelled with the model key, like every other stage of the prediction path
+        with timed("model_load", model=key or ModelSpec(pickle_file, pickle_file).key):
+            bundle, source = MODEL_BACKENDS[backend](model_path)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._load_times[pickle_file] = elapsed
+        logger.info(f"Loaded model {pickle_file} from {source} in {elapsed * 1000:.1f} ms")
+        return bundle, identity
+
+    def _store(self, pickle_file, bundle, identity):
+        with self._lock:
+            self._bundles[pickle_file] = bundle
+            self._bundles.move_to_end(pickle_file)
+            self._identities[pickle_file] = identity
+            while len(self._bundles) > self.max_size:
+                evicted, _ = self._bundles.popitem(last=False)
+                self._identities.pop(evicted, None)
+                self._evictions += 1
+                logger.info(f"Evicted model from cache: {evicted}")
+
+    def warm_up(self, bundle, spec=None):
+        """
+        Run one dummy inference so the first real request does not pay for lazy initialisation.
+        With a spec, also check that the model expects as many features as its feature extractor produces.
+        """
+        classifier = bundle["classifier"]
+        reducer = bundle.get("reducer")
+        # With a reducer, it is the reducer that takes the HOG vector
+        n_features = getattr(reducer if reducer is not None else classifier, "n_features_in_", None)
+        if spec is not None:
+            expected = spec.hog_filter().feature_length()
+            if n_features is not None and n_features != expected:
+                raise ValueError(f"Model expects {n_features} features but its feature extractor produces {expected}")
+            n_features = expected
+        X = np.zeros((1, n_features or HogFilter().feature_length()))
+        classifier.predict(X if reducer is None else reducer.transform(X))
+
+    def preload(self, metrics=None):
+        """Load and warm every model listed in a metrics.json mapping, skipping unavailable ones."""
+        for spec in self.specs(metrics):
+            try:
+                self.warm_up(self.get(spec.pickle_file, spec.backend, spec.key), spec)
+            except Exception as e:
+                logger.warning(f"Could not preload model '{spec.name}' ({spec.pickle_file}): {e}")
+
+    def reload(self):
+        """
+        Pick up changes to metrics.json and the model pickles without downtime.
+
+        Returns the pickle files that were (re)loaded. Safe to call while requests
+        are being served; concurrent reloads are serialized.
+        """
+        with self._reload_lock:
+            try:
+                with open(self.metrics_path, "r") as f:
+                    metrics = json.load(f)
+            except Exception as e:
+                logger.error(f"Reload skipped, could not read {self.metrics_path}: {e}")
+                return []
+            reloaded = []
+            specs = self.specs(metrics)
+            previous = {spec.pickle_file for spec in self.specs()}
+            missing = set()
+            for spec in specs:
+                pickle_file = spec.pickle_file
+                try:
+                    with self._lock:
+                        current = self._identities.get(pickle_file)
+                        has_room = len(self._bundles) < self.max_size
+                    if current is None:
+                        # Not cached: models evicted by the LRU are left to load on demand, and newly
+                        # listed ones are only preloaded while they fit, so reloads never evict each other
+                        if pickle_file in previous or not has_room:
+                            continue
+                    elif self._disk_identity(pickle_file) == current:
+                        continue
+                    bundle, identity = self._load(pickle_file, spec.backend, spec.key)
+                    self.warm_up(bundle, spec)
+                except FileNotFoundError:
+                    # Listed but not trained yet (or deleted); requests for it fail as before
+                    missing.add(pickle_file)
+                    continue
+                except Exception as e:
+                    logger.warning(f"Could not reload model '{spec.name}' ({pickle_file}): {e}")
+                    continue
+                self._store(pickle_file, bundle, identity)
+                reloaded.append(pickle_file)
+            # Swap the catalog last, so newly listed models are already warm when they become visible
+            changed = metrics != self.metrics
+            self.metrics = metrics
+            # Bundles of models no longer listed, or whose pickle is gone, would otherwise keep taking cache slots
+            listed = {spec.pickle_file for spec in specs} - missing
+            with self._lock:
+                dropped = [pickle_file for pickle_file in self._bundles if pickle_file not in listed]
+                for pickle_file in dropped:
+                    del self._bundles[pickle_file]
+                    self._identities.pop(pickle_file, None)
+                    self._load_times.pop(pickle_file, None)
+            if dropped:
+                logger.info(f"Dropped models no longer served: {dropped}")
+            if reloaded or changed or dropped:
+                self._reloads += 1
+                logger.info(f"Reloaded models: {reloaded or 'none'}; metrics.json {'updated' if changed else 'unchanged'}")
+            return reloaded
+
+    def clear(self):
+        with self._lock:
+            self._bundles.clear()
+            self._identities.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "cached_models": list(self._bundles.keys()),
+                "max_size": self.max_size,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+                "reloads": self._reloads,
+                "load_time_seconds": dict(self._load_times),
+            }
+
+
+class ModelWatcher:
+    """Background thread that calls `registry.reload()` every `interval` seconds."""
+    def __init__(self, registry, interval=MODEL_RELOAD_INTERVAL):
+        self.registry = registry
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="model-watcher", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.registry.reload()
+            except Exception as e:
+                logger.error(f"Model reload failed: {e}")
+
+    def start(self):
+        logger.info(f"Watching {self.registry.models_dir} for model changes every {self.interval}s")
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=self.interval + 1)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+_watcher = None
+
+
+def get_registry():
+    """Return the process-wide ModelRegistry, creating it (and reading metrics.json) on first use."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                registry = ModelRegistry()
+                registry.load_metrics()
+                _registry = registry
+    return _registry
+
+
+def start_model_watcher(interval=MODEL_RELOAD_INTERVAL):
+    """Start the process-wide ModelWatcher if hot reload is enabled (interval > 0)."""
+    global _watcher
+    if interval > 0 and _watcher is None:
+        _watcher = ModelWatcher(get_registry(), interval)
+        _watcher.start()
+    return _watcher
+
+
+def stop_model_watcher():
+    global _watcher
+    if _watcher is not None:
+        _watcher.stop()
+        _watcher = None
@@ -1,29 +1,203 @@
-import joblib
 import os
-from src.preprocessing.hog_filter import HogFilter
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from src.predictions.model_registry import get_registry
+from src.predictions.model_backends import ModelSpec
+from src.preprocessing.image_decoding import largest_input_size
+from src.utils.telemetry import timed, model_context
+
+# Threads used to featurize a batch; OpenCV and NumPy release the GIL for most of the work
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", str(min(8, os.cpu_count() or 1))))
 
 class Predict:
-    def __init__(self, model_name="LinearSVM"):
-        model_files = {
-            "LinearSVM": "model_LinearSVM.pkl",
-            "RandomForest": "model_RandomForest.pkl"
-        }
-        if model_name not in model_files:
-            raise ValueError(f"Unknown model_name '{model_name}'. Choose from: {list(model_files.keys())}")
-        model_path = os.path.join("models", model_files[model_name])
-        model_bundle = joblib.load(model_path)
+    def __init__(self, model_name="LinearSVM", registry=None):
+        """
+        `model_name` is a model's display name, key (e.g. LinearSVM, KNN) or pickle
+        file as listed in metrics.json, or a ModelSpec.
+        """
+        # Bundles are shared through the process-wide registry, so constructing
+        # a Predict per request no longer unpickles the model each time.
+        registry = registry or get_registry()
+        self.spec = model_name if isinstance(model_name, ModelSpec) else registry.spec(model_name)
+        self.model_name = self.spec.key
+        model_bundle = registry.get(self.spec.pickle_file, self.spec.backend, self.spec.key)
         self.classifier = model_bundle["classifier"]
         self.le = model_bundle["label_encoder"]
-        self.hog_filter = HogFilter()
+        # Optional dimensionality reduction fitted with the classifier (see compact_models)
+        self.reducer = model_bundle.get("reducer")
+        # Features are extracted with the parameters the model was trained on
+        self.hog_filter = self.spec.hog_filter()
+
+    def _reduce(self, X):
+        return X if self.reducer is None else self.reducer.transform(X)
 
     def predict(self, X):
-        preds = self.classifier.predict(X)
+        with timed("inference", model=self.model_name):
+            preds = self.classifier.predict(self._reduce(X))
         return self.le.inverse_transform(preds)
 
-    def predict_from_image(self, image_path):
-        features = self.hog_filter.quantify_image(image_path)
+    def predict_proba(self, X):
+        """Class probabilities as one {label: probability} dict per row, or None if the model has none."""
+        if not hasattr(self.classifier, "predict_proba"):
+            return None
+        with timed("inference", model=self.model_name):
+            proba = self.classifier.predict_proba(self._reduce(X))
+        labels = self.le.inverse_transform(self.classifier.classes_)
+        return [{str(label): float(p) for label, p in zip(labels, row)} for row in proba]
+
+    def classify(self, X):
+        """One {"prediction", "probabilities"} dict per row of X; probabilities are None where unavailable."""
+        if hasattr(self.classifier, "predict_with_proba"):
+            # Compact models produce both from one pass
+            with timed("inference", model=self.model_name):
+                preds, proba = self.classifier.predict_with_proba(self._reduce(X))
+            labels = self.le.inverse_transform(preds)
+            names = self.le.inverse_transform(self.classifier.classes_)
+            probabilities = [{str(name): float(p) for name, p in zip(names, row)} for row in proba]
+        else:
+            labels = self.predict(X)
+            probabilities = self.predict_proba(X) or [None] * len(labels)
+        return [{"prediction": str(label), "probabilities": proba} for label, proba in zip(labels, probabilities)]
+
+    def predict_from_image(self, image):
+        # image may be a file path, encoded image bytes or a decoded NumPy array
+        with model_context(self.model_name):
+            features = self.hog_filter.quantify_image(image)
         if features is None:
-            raise ValueError(f"Could not extract features from image: {image_path}")
+            source = image if isinstance(image, str) else "<in-memory image>"
+            raise ValueError(f"Could not extract features from image: {source}")
         # Model expects 2D array for a single sample
-        preds = self.classifier.predict([features])
-        return self.le.inverse_transform(preds)
+        return self.predict([features])
+
+    def predict_from_images(self, images, max_workers=BATCH_WORKERS):
+        """
+        Predict a batch of images (paths, encoded bytes or arrays) with a single classifier call.
+
+        Images are featurized in parallel and the feature vectors stacked into one
+        matrix. Returns one dict per input, in order, holding either a "prediction"
+        or an "error" for images that could not be featurized.
+        """
+        images = list(images)
+        results = [{"prediction": None, "error": None} for _ in images]
+        if not images:
+            return results
+
+        def featurize(image):
+            try:
+                with model_context(self.model_name):
+                    return self.hog_filter.quantify_image(image), None
+            except Exception as e:
+                return None, str(e)
+
+        if max_workers > 1 and len(images) > 1:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(images))) as executor:
+                extracted = list(executor.map(featurize, images))
+        else:
+            extracted = [featurize(image) for image in images]
+
+        rows = []
+        valid_indices = []
+        for i, (features, error) in enumerate(extracted):
+            if features is None:
+                results[i]["error"] = error or "Could not extract features from image."
+                continue
+            rows.append(features)
+            valid_indices.append(i)
+
+        if rows:
+            labels = self.predict(np.vstack(rows))
+            for i, label in zip(valid_indices, labels):
+                results[i]["prediction"] = label
+        return results
+
+def combine_predictions(per_model):
+    """
+    Majority vote over {model name: {"prediction", "probabilities"}} results.
+
+    Ties are broken by the mean probability the models that report probabilities
+    gave each tied label, then by model order. Returns the winning "prediction",
+    the "votes" per label and the per-model results.
+    """
+    votes = {}
+    for result in per_model.values():
+        votes[result["prediction"]] = votes.get(result["prediction"], 0) + 1
+    top = max(votes.values())
+    tied = [label for label in votes if votes[label] == top]
+
+    def mean_probability(label):
+        reported = [r["probabilities"].get(label, 0.0) for r in per_model.values() if r["probabilities"]]
+        return sum(reported) / len(reported) if reported else 0.0
+
+    # max keeps the first of equal candidates, i.e. model order
+    prediction = max(tied, key=mean_probability)
+    return {"prediction": prediction, "votes": votes, "models": per_model}
+
+class Ensemble:
+    """
+    Consensus prediction from several models on the same image.
+
+    The image is decoded once and featurized once per distinct feature
+    configuration (normally one, shared by every model); the models then
+    classify the shared features concurrently.
+    """
+    def __init__(self, model_names=None, registry=None):
+        """`model_names` are display names, keys or ModelSpecs, as for Predict; all models if omitted."""
+        registry = registry or get_registry()
+        model_names = model_names or [spec.name for spec in registry.specs()]
+        if not model_names:
+            raise ValueError("No models available for the ensemble")
+        self.predictors = [Predict(model_name=name, registry=registry) for name in model_names]
+
+    def extract_features(self, image):
+        """Feature vector per feature key needed by the ensemble's models."""
+        image_size = largest_input_size(predictor.hog_filter.params["image_size"] for predictor in self.predictors)
+        features = {}
+        with model_context("ensemble"):
+            image = self.predictors[0].hog_filter.load_image(image, image_size)
+            if image is None:
+                raise ValueError("Could not decode image")
+            for predictor in self.predictors:
+                key = predictor.spec.feature_key()
+                if key not in features:
+                    features[key] = predictor.hog_filter.quantify_image(image)
+        return features
+
+    def classify_image(self, image, max_workers=BATCH_WORKERS):
+        """{model name: {"prediction", "probabilities"}} for one image, in model order."""
+        features = self.extract_features(image)
+
+        def classify(predictor):
+            return predictor.classify([features[predictor.spec.feature_key()]])[0]
+
+        if max_workers > 1 and len(self.predictors) > 1:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(self.predictors))) as executor:
+                results = list(executor.map(classify, self.predictors))
+        else:
+            results = [classify(predictor) for predictor in self.predictors]
+        return {p.spec.name: r for p, r in zip(self.predictors, results)}
+
+    def predict_from_image(self, image, max_workers=BATCH_WORKERS):
+        """Per-model labels and probabilities for one image, plus the combined vote."""
+        return combine_predictions(self.classify_image(image, max_workers))
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Predict Parkinson's from one or more drawing images.")
+    parser.add_argument('images', nargs='+', help='Image files to classify.')
+    parser.add_argument('--model', type=str, default='LinearSVM', help='Model listed in metrics.json, e.g. LinearSVM, RandomForest or KNN.')
+    parser.add_argument('--ensemble', nargs='*', default=None, metavar='MODEL',
+                        help='Combine the given models (all models if none are listed) by majority vote.')
+    args = parser.parse_args()
+    if args.ensemble is not None:
+        ensemble = Ensemble(model_names=args.ensemble)
+        for image_path in args.images:
+            result = ensemble.predict_from_image(image_path)
+            per_model = ", ".join(f"{name}: {r['prediction']}" for name, r in result["models"].items())
+            print(f"{image_path}: {result['prediction']} ({per_model})")
+        return
+    predictor = Predict(model_name=args.model)
+    for image_path, result in zip(args.images, predictor.predict_from_images(args.images)):
+        print(f"{image_path}: {result['prediction'] or 'ERROR - ' + result['error']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+import os
+import sys
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger("parkinsons_api")
+
+# Config
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "4096"))
+PREDICTION_CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", "3600"))
+# Optional SQLite file shared by every worker/process on the host; unset keeps the cache in-process only
+PREDICTION_CACHE_PATH = os.getenv("PREDICTION_CACHE_PATH")
+
+
+class SQLiteCacheBackend:
+    """Shared second-level cache stored in a local SQLite file."""
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS predictions ("
+                "key TEXT PRIMARY KEY, model TEXT NOT NULL, value TEXT NOT NULL, expires REAL NOT NULL)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS predictions_model ON predictions (model)")
+
+    def get(self, key, now):
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires FROM predictions WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] < now:
+            return None
+        return row[0]
+
+    def set(self, key, model, value, expires):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO predictions (key, model, value, expires) VALUES (?, ?, ?, ?)",
+                               (key, model, value, expires))
+
+    def invalidate_model(self, model, keep_identity=None):
+        with self._lock, self._conn:
+            if keep_identity is None:
+                self._conn.execute("DELETE FROM predictions WHERE model = ?", (model,))
+            else:
+                # Entries written by other processes for the current model version are kept
+                self._conn.execute("DELETE FROM predictions WHERE model = ? AND instr(key, ?) = 0",
+                                   (model, f":{keep_identity}:"))
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM predictions")
+
+
+class PredictionCache:
+    """
+    Content-addressed cache of prediction labels.
+
+    Keys combine the SHA-256 of the uploaded bytes, the model identity (pickle
+    file, mtime and size) and the HOG feature key, so a retrained or replaced
+    model or a feature-parameter change never serves stale labels. Entries live
+    in a bounded in-process LRU with a TTL, optionally backed by a shared SQLite
+    file. When a model's identity changes, all of its older entries are dropped.
+    """
+    def __init__(self, max_size=PREDICTION_CACHE_SIZE, ttl=PREDICTION_CACHE_TTL, backend=None):
+        self.max_size = max(0, max_size)
+        self.ttl = ttl
+        self.backend = backend
+        self._entries = OrderedDict()  # key -> (model, value, expires)
+        self._identities = {}  # model -> last seen identity
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._backend_hits = 0
+        self._misses = 0
+        self._expired = 0
+        self._invalidated = 0
+
+    @staticmethod
+    def make_key(contents, model_identity, feature_key):
+        content_hash = hashlib.sha256(contents).hexdigest()
+        return f"{content_hash}:{model_identity}:{feature_key}"
+
+    def get(self, key, model, identity):
+        """Return the cached label for `key`, or None."""
+        now = time.time()
+        with self._lock:
+            # A new identity means the model was retrained or replaced
+            previous = self._identities.get(model)
+            self._identities[model] = identity
+        if previous is not None and previous != identity:
+            self.invalidate_model(model, keep_identity=identity)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[2] >= now:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return entry[1]
+                del self._entries[key]
+                self._expired += 1
+        if self.backend is not None:
+            try:
+                value = self.backend.get(key, now)
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to read from shared prediction cache: {e}")
+                value = None
+            if value is not None:
+                with self._lock:
+                    self._backend_hits += 1
+                    self._store(key, model, value, now + self.ttl)
+                return value
+        with self._lock:
+            self._misses += 1
+        return None
+
+    def set(self, key, model, value):
+        expires = time.time() + self.ttl
+        with self._lock:
+            self._store(key, model, value, expires)
+        if self.backend is not None:
+            try:
+                self.backend.set(key, model, value, expires)
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to write prediction to shared cache: {e}")
+
+    def _store(self, key, model, value, expires):
+        if self.max_size == 0:
+            return
+        self._entries[key] = (model, value, expires)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate_model(self, model, keep_identity=None):
+        """Drop cached predictions made by `model`, except those for its `keep_identity` version."""
+        keep = f":{keep_identity}:" if keep_identity is not None else None
+        with self._lock:
+            stale = [key for key, entry in self._entries.items()
+                     if entry[0] == model and (keep is None or keep not in key)]
+            for key in stale:
+                del self._entries[key]
+            self._invalidated += len(stale)
+        if self.backend is not None:
+            try:
+                self.backend.invalidate_model(model, keep_identity)
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to invalidate shared prediction cache: {e}")
+        if stale:
+            logger.info(f"Invalidated {len(stale)} cached predictions for {model}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._backend_hits + self._misses
+            memory = sum(sys.getsizeof(key) + sys.getsizeof(entry) + sys.getsizeof(entry[1])
+                         for key, entry in self._entries.items())
+            return {
+                "entries": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "shared_backend": self.backend.path if self.backend is not None else None,
+                "hits": self._hits,
+                "shared_hits": self._backend_hits,
+                "misses": self._misses,
+                "hit_rate": (self._hits + self._backend_hits) / lookups if lookups else 0.0,
+                "expired": self._expired,
+                "invalidated": self._invalidated,
+                "approx_memory_bytes": memory,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_prediction_cache():
+    """Return the process-wide PredictionCache, creating it on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                backend = SQLiteCacheBackend(PREDICTION_CACHE_PATH) if PREDICTION_CACHE_PATH else None
+                _cache = PredictionCache(backend=backend)
+    return _cache
@@ -0,0 +1,116 @@
+import os
+import json
+import hashlib
+import numpy as np
+from src.preprocessing.hog_filter import HogFilter, FEATURE_DTYPE
+
+# Cached feature matrices live under data/features/<feature key>/
+FEATURE_CACHE_DIR = os.getenv("FEATURE_CACHE_DIR", os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'features')))
+
+def file_hash(path, chunk_size=1 << 20):
+    """SHA-1 of a file's contents."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class FeatureStore:
+    """
+    Persistent on-disk cache of HOG feature vectors, keyed by image content hash.
+
+    Each set of preprocessing/HOG parameters gets its own directory (named after
+    `HogFilter.feature_key()` and the feature dtype), so changing a parameter
+    automatically starts a new cache. A directory holds `features.npy`, one row per image, opened memory-mapped,
+    and `index.json`, mapping content hashes to row numbers.
+    """
+    def __init__(self, cache_dir=FEATURE_CACHE_DIR, hog_filter=None):
+        self.hog_filter = hog_filter or HogFilter()
+        self.directory = os.path.join(cache_dir, f"{self.hog_filter.feature_key()}_{np.dtype(FEATURE_DTYPE).name}")
+        self.features_path = os.path.join(self.directory, "features.npy")
+        self.index_path = os.path.join(self.directory, "index.json")
+        self._index = None
+        self._features = None
+
+    def _open(self):
+        if self._index is not None:
+            return
+        if os.path.exists(self.index_path) and os.path.exists(self.features_path):
+            with open(self.index_path, "r") as f:
+                self._index = json.load(f)
+            self._features = np.load(self.features_path, mmap_mode="r")
+        else:
+            self._index = {}
+            self._features = None
+
+    def __len__(self):
+        self._open()
+        return len(self._index)
+
+    def lookup(self, hashes):
+        """Return (rows, missing) where rows[i] is the cached vector for hashes[i] or None."""
+        self._open()
+        rows = []
+        missing = []
+        for i, content_hash in enumerate(hashes):
+            row = self._index.get(content_hash)
+            if row is None:
+                rows.append(None)
+                missing.append(i)
+            else:
+                rows.append(self._features[row])
+        return rows, missing
+
+    def add(self, hashes, features):
+        """Append new feature vectors to the store and persist it atomically."""
+        self._open()
+        index = dict(self._index)
+        base = 0 if self._features is None else len(self._features)
+        new_rows = []
+        for content_hash, vector in zip(hashes, features):
+            if content_hash in index:
+                continue
+            index[content_hash] = base + len(new_rows)
+            new_rows.append(vector)
+        if not new_rows:
+            return
+        new_matrix = np.vstack(new_rows).astype(FEATURE_DTYPE, copy=False)
+        if self._features is None:
+            matrix = new_matrix
+        else:
+            matrix = np.concatenate([np.asarray(self._features), new_matrix])
+        os.makedirs(self.directory, exist_ok=True)
+        # Write to temporary files and swap them in, features first, so the index
+        # never points past the end of the matrix even if we are interrupted
+        tmp_features = self.features_path + ".tmp.npy"
+        np.save(tmp_features, matrix)
+        os.replace(tmp_features, self.features_path)
+        tmp_index = self.index_path + ".tmp"
+        with open(tmp_index, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_index, self.index_path)
+        self._index = index
+        self._features = np.load(self.features_path, mmap_mode="r")
+
+    def get_or_compute(self, image_paths, extract):
+        """
+        Return the feature matrix for `image_paths`, in order.
+
+        Cached rows are read from the memory-mapped store; only images whose
+        content hash is unknown are passed to `extract(paths) -> matrix` and the
+        results are added to the store.
+        """
+        hashes = [file_hash(p) for p in image_paths]
+        rows, missing = self.lookup(hashes)
+        data = np.empty((len(image_paths), self.hog_filter.feature_length()), dtype=FEATURE_DTYPE)
+        for i, row in enumerate(rows):
+            if row is not None:
+                data[i] = row
+        if missing:
+            print(f"[INFO] feature cache: {len(image_paths) - len(missing)} hits, {len(missing)} images to featurize")
+            computed = extract([image_paths[i] for i in missing])
+            data[missing] = computed
+            self.add([hashes[i] for i in missing], computed)
+        else:
+            print(f"[INFO] feature cache: all {len(image_paths)} images cached")
+        return data
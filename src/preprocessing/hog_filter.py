@@ -1,25 +1,108 @@
-from skimage import feature
+import os
+import json
+import hashlib
+import numpy as np
 import cv2
+from src.preprocessing.hog_backends import available_backends
+from src.preprocessing.image_decoding import decode_image
+from src.utils.telemetry import timed
+
+# Default preprocessing and HOG parameters; the trained models expect these
+HOG_PARAMS = {
+    "image_size": (200, 200),
+    "orientations": 9,
+    "pixels_per_cell": (10, 10),
+    "cells_per_block": (2, 2),
+    "transform_sqrt": True,
+    "block_norm": "L1",
+}
+
+# HOG implementation: "numpy" (fast, vectorized) or "skimage" (reference)
+HOG_BACKEND = os.getenv("HOG_BACKEND", "numpy")
+
+# Feature matrices are float32: half the memory of float64, and what the tree models use internally
+FEATURE_DTYPE = np.float32
 
 class HogFilter:
-    def __init__(self):
-        pass
+    def __init__(self, backend=None, **params):
+        unknown = set(params) - set(HOG_PARAMS)
+        if unknown:
+            raise ValueError(f"Unknown HOG parameters: {sorted(unknown)}. Choose from: {list(HOG_PARAMS.keys())}")
+        self.params = {**HOG_PARAMS, **params}
+        self.backend = backend or HOG_BACKEND
+        if self.backend not in available_backends:
+            raise ValueError(f"Unknown HOG backend '{self.backend}'. Choose from: {list(available_backends.keys())}")
+        self._hog = available_backends[self.backend]
+
+    def feature_key(self):
+        """Short stable hash of the preprocessing/HOG parameters and backend, used to key cached features."""
+        encoded = json.dumps({**self.params, "backend": self.backend}, sort_keys=True).encode("utf-8")
+        return hashlib.sha1(encoded).hexdigest()[:16]
+
+    def describe(self):
+        """Feature metadata stored with a trained model, so it can be served with the same preprocessing."""
+        return {
+            "extractor": "hog",
+            "params": self.params,
+            "backend": self.backend,
+            "feature_key": self.feature_key(),
+            "n_features": self.feature_length(),
+        }
+
+    @classmethod
+    def from_description(cls, description):
+        """HogFilter for the output of `describe`; an empty description gives the defaults."""
+        if description.get("extractor", "hog") != "hog":
+            raise ValueError(f"Unsupported feature extractor '{description['extractor']}'")
+        params = {name: tuple(value) if isinstance(value, list) else value
+                  for name, value in description.get("params", {}).items()}
+        return cls(backend=description.get("backend"), **params)
+
+    def feature_length(self):
+        """Length of the HOG vector produced for the configured parameters."""
+        cells = [size // ppc for size, ppc in zip(self.params["image_size"], self.params["pixels_per_cell"])]
+        blocks = [n - cpb + 1 for n, cpb in zip(cells, self.params["cells_per_block"])]
+        cpb_rows, cpb_cols = self.params["cells_per_block"]
+        return blocks[0] * blocks[1] * cpb_rows * cpb_cols * self.params["orientations"]
+
+    def load_image(self, source, image_size=None):
+        """
+        Return a BGR image from a file path, raw encoded bytes, or an already decoded array.
+        Given the input size it will be resized to, a large image is instead decoded straight
+        to grayscale at a reduced scale (see image_decoding). Returns None if the source cannot
+        be decoded; raises ImageTooLarge for images over the size limits.
+        """
+        if isinstance(source, np.ndarray):
+            return source
+        with timed("decode"):
+            return decode_image(source if isinstance(source, (str, bytes)) else bytes(source), image_size)
 
     def preprocess_image(self, image):
-        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        image = cv2.resize(image, (200, 200))
-        # Apply Otsu's thresholding
-        image = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)[1]
+        with timed("preprocess"):
+            if image.ndim == 3:
+                image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            image = cv2.resize(image, tuple(self.params["image_size"]))
+            # Apply Otsu's thresholding
+            image = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)[1]
         return image
 
-    def quantify_image(self, image_path):
-        image = cv2.imread(image_path)
+    def quantify_image(self, image):
+        # image may be a path, encoded bytes (e.g. an upload buffer) or a decoded array
+        image = self.load_image(image, self.params["image_size"])
         if image is None:
             return None
         image = self.preprocess_image(image)
         # compute the histogram of oriented gradients feature vector for the input image
-        features, _ = feature.hog(image, orientations=9,
-            pixels_per_cell=(10, 10), cells_per_block=(2, 2),
-            transform_sqrt=True, block_norm="L1", visualize=True)
-        # return the feature vector
-        return features
+        return self.compute_hog(image)
+
+    def warm_up(self):
+        """Run decode, preprocessing and HOG once on a blank image, so the first request does not pay for it."""
+        encoded = cv2.imencode(".png", np.zeros((8, 8), dtype=np.uint8))[1]
+        self.quantify_image(encoded.tobytes())
+
+    def compute_hog(self, image):
+        """HOG feature vector of an already preprocessed (grayscale, resized, binarized) image."""
+        with timed("hog"):
+            return self._hog(image, orientations=self.params["orientations"],
+                pixels_per_cell=tuple(self.params["pixels_per_cell"]), cells_per_block=tuple(self.params["cells_per_block"]),
+                transform_sqrt=self.params["transform_sqrt"], block_norm=self.params["block_norm"])
@@ -0,0 +1,131 @@
+"""
+Decoding of input images, with a fast path for large photos.
+
+Phone photos of drawings arrive at around 12 MP, while the models look at a
+200x200 binarized image. Decoding such a JPEG to full-resolution BGR and then
+converting it to grayscale costs far more than everything after it. When an
+image is at least REDUCED_DECODE_MARGIN times the model input size at a
+reduced scale, it is decoded straight to grayscale with OpenCV's
+IMREAD_REDUCED_GRAYSCALE_{2,4,8}, which uses libjpeg's DCT scaling for JPEGs.
+Smaller images are decoded exactly as before, and so are image files, which
+come from the (trusted) dataset and are read without any extra header parsing.
+
+For encoded bytes the header is read before anything is decoded, so images
+that are too large to decode safely (including decompression bombs: small
+files that declare enormous dimensions) are rejected up front with
+ImageTooLarge. `check_image` does that and Pillow's integrity check in a single
+pass at the API boundary, and returns a CheckedImage that carries the
+dimensions, so decoding it does not parse the header again.
+"""
+import os
+import io
+import warnings
+import numpy as np
+import cv2
+
+# Config
+# Uploads above this many bytes or pixels are rejected before decoding
+MAX_IMAGE_BYTES = int(os.getenv("MAX_IMAGE_BYTES", str(32 * 1024 * 1024)))
+MAX_IMAGE_PIXELS = int(os.getenv("MAX_IMAGE_PIXELS", "50000000"))
+REDUCED_DECODE = os.getenv("REDUCED_DECODE", "true").lower() in ("1", "true", "yes")
+# A reduced decode is only used if it leaves at least this many pixels per model input pixel
+# along each side; at lower margins the averaged-out pen strokes binarize differently
+REDUCED_DECODE_MARGIN = 3
+
+REDUCED_GRAYSCALE_FLAGS = {
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+}
+
+
+class ImageTooLarge(ValueError):
+    """The image exceeds MAX_IMAGE_BYTES or MAX_IMAGE_PIXELS."""
+
+
+class CheckedImage(bytes):
+    """Encoded image bytes that passed `check_image`, with their (width, height)."""
+    dimensions = None
+
+
+def _open_header(contents, max_bytes, max_pixels, verify=False):
+    """
+    (width, height) from the header of encoded bytes, checked against the limits, or None if
+    Pillow does not recognize the image (or, with `verify`, finds it corrupt).
+    """
+    if len(contents) > max_bytes:
+        raise ImageTooLarge(f"Image is {len(contents)} bytes; the limit is {max_bytes}.")
+    # Pillow only parses the header on open; imported on first use, as the API warms it up
+    from PIL import Image
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+            with Image.open(io.BytesIO(contents)) as img:
+                width, height = img.size
+                if width * height > max_pixels:
+                    raise ImageTooLarge(f"Image is {width}x{height} pixels; the limit is {max_pixels} pixels.")
+                if verify:
+                    img.verify()
+    except ImageTooLarge:
+        raise
+    except Image.DecompressionBombError as e:
+        # Pillow refuses to even open images far beyond its own limit
+        raise ImageTooLarge(str(e))
+    except Exception:
+        return None
+    return width, height
+
+
+def check_image_size(contents, max_bytes=MAX_IMAGE_BYTES, max_pixels=MAX_IMAGE_PIXELS):
+    """
+    Return the (width, height) of encoded image bytes (None if the format is not recognized),
+    raising ImageTooLarge if the image is too large to decode.
+    """
+    return _open_header(contents, max_bytes, max_pixels)
+
+
+def check_image(contents, max_bytes=MAX_IMAGE_BYTES, max_pixels=MAX_IMAGE_PIXELS):
+    """
+    Validate an upload with a single header parse: size limits and Pillow's integrity check.
+    Returns a CheckedImage, or None if the bytes are not a valid image; raises ImageTooLarge.
+    """
+    dimensions = _open_header(contents, max_bytes, max_pixels, verify=True)
+    if dimensions is None:
+        return None
+    checked = contents if isinstance(contents, CheckedImage) else CheckedImage(contents)
+    checked.dimensions = dimensions
+    return checked
+
+
+def reduction_factor(dimensions, image_size, margin=REDUCED_DECODE_MARGIN):
+    """Largest reduced-decode scale (8, 4, 2) that keeps `margin` times `image_size` on each side, else 1."""
+    if dimensions is None or image_size is None:
+        return 1
+    for factor in REDUCED_GRAYSCALE_FLAGS:
+        if all(side // factor >= margin * target for side, target in zip(dimensions, image_size)):
+            return factor
+    return 1
+
+
+def largest_input_size(image_sizes):
+    """Per-side maximum of several (width, height) input sizes; a decode reduced for it suits all of them."""
+    return tuple(max(sides) for sides in zip(*image_sizes))
+
+
+def decode_image(source, image_size=None, reduced=REDUCED_DECODE):
+    """
+    Decode an image file path or encoded bytes.
+
+    Returns a BGR array, or, for bytes, when `image_size` (width, height) is given and the
+    image is large enough, a grayscale array decoded at a reduced scale. Returns None if the
+    image cannot be decoded. Raises ImageTooLarge for bytes over the size limits.
+    """
+    if isinstance(source, str):
+        # Dataset files are trusted and small; decoding them needs no header parse
+        return cv2.imread(source, cv2.IMREAD_COLOR)
+    buffer = np.frombuffer(source, dtype=np.uint8)
+    if buffer.size == 0:
+        return None
+    dimensions = source.dimensions if isinstance(source, CheckedImage) else check_image_size(source)
+    factor = reduction_factor(dimensions, image_size) if reduced else 1
+    return cv2.imdecode(buffer, REDUCED_GRAYSCALE_FLAGS[factor] if factor > 1 else cv2.IMREAD_COLOR)
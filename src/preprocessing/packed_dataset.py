@@ -0,0 +1,182 @@
+"""
+Packed, memory-mappable copy of an image dataset.
+
+A dataset directory (e.g. data/processed/dataset_1/sw, laid out as
+<split>/<label>/*.png) holds thousands of small files that have to be listed,
+opened and decoded one by one. `build_packed_dataset` runs every image through
+`HogFilter.preprocess_image` once and stores the resulting binarized images in a
+single `images.npy` (N x height x width, uint8), sorted by split and label, with
+an `index.json` giving each split's row range, the labels and the source paths.
+
+`PackedDataset` memory-maps the array, so a split is a zero-copy slice and
+`TestTrainSplit` goes straight to HOG without any file I/O or decoding. The
+index records the mtime and size of every source image; a pack is reported
+stale once images are added, removed or overwritten (as incremental
+augmentation does when a raw image changes).
+
+    python -m src.preprocessing.packed_dataset data/processed/dataset_1/sw
+"""
+import os
+import sys
+import json
+import argparse
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from imutils import paths
+from src.preprocessing.hog_filter import HogFilter
+
+# Packs live under data/packed/<dataset>_<height>x<width>/
+PACKED_DATASET_DIR = os.getenv("PACKED_DATASET_DIR", os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'packed')))
+PACKED_FORMAT_VERSION = 2
+
+
+def packed_path(dataset_root, image_size, packed_dir=PACKED_DATASET_DIR):
+    """Directory of the pack for `dataset_root` preprocessed to `image_size`."""
+    name = os.path.normpath(os.path.relpath(dataset_root)).replace(os.sep, "_").strip("._")
+    return os.path.join(packed_dir, f"{name}_{image_size[0]}x{image_size[1]}")
+
+
+def _source_identity(dataset_root):
+    # [mtime, size] per image, keyed by relative path: changes when an image is added, removed or overwritten
+    identity = {}
+    for image_path in sorted(paths.list_images(dataset_root)):
+        stat = os.stat(image_path)
+        identity[os.path.relpath(image_path, dataset_root)] = [stat.st_mtime_ns, stat.st_size]
+    return identity
+
+
+def _preprocess_chunk(params, image_paths):
+    """Decode and preprocess a chunk of images in a worker process."""
+    hog_filter = HogFilter(**params)
+    height, width = hog_filter.params["image_size"][1], hog_filter.params["image_size"][0]
+    chunk = np.empty((len(image_paths), height, width), dtype=np.uint8)
+    for i, imagePath in enumerate(image_paths):
+        image = hog_filter.load_image(imagePath)
+        if image is None:
+            raise ValueError(f"Could not read image: {imagePath}")
+        chunk[i] = hog_filter.preprocess_image(image)
+    return chunk
+
+
+def build_packed_dataset(dataset_root, output_dir=None, hog_filter=None, n_jobs=-1, chunksize=64):
+    """
+    Preprocess every image under `dataset_root` into a packed dataset and return its directory.
+
+    Rows are grouped by split, then label, so each split is one contiguous range.
+    index.json is written last and atomically; a pack without it is never loaded.
+    """
+    hog_filter = hog_filter or HogFilter()
+    image_size = tuple(hog_filter.params["image_size"])
+    output_dir = output_dir or packed_path(dataset_root, image_size)
+    identity = _source_identity(dataset_root)
+    # (split, label, relative path) for every image, in a stable order
+    entries = sorted((rel_path.split(os.sep)[0], rel_path.split(os.sep)[-2], rel_path) for rel_path in identity)
+    image_paths = [os.path.join(dataset_root, rel_path) for _, _, rel_path in entries]
+
+    os.makedirs(output_dir, exist_ok=True)
+    tmp_images = os.path.join(output_dir, "images.tmp.npy")
+    images = np.lib.format.open_memmap(tmp_images, mode="w+", dtype=np.uint8,
+                                       shape=(len(entries), image_size[1], image_size[0]))
+    chunks = [(start, image_paths[start:start + chunksize]) for start in range(0, len(image_paths), chunksize)]
+    n_jobs = (os.cpu_count() or 1) if n_jobs == -1 else max(1, n_jobs)
+    if n_jobs > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=min(n_jobs, len(chunks))) as executor:
+            futures = {start: executor.submit(_preprocess_chunk, hog_filter.params, chunk) for start, chunk in chunks}
+            for start, future in futures.items():
+                chunk = future.result()
+                images[start:start + len(chunk)] = chunk
+    else:
+        for start, chunk in chunks:
+            images[start:start + len(chunk)] = _preprocess_chunk(hog_filter.params, chunk)
+    images.flush()
+    del images
+    os.replace(tmp_images, os.path.join(output_dir, "images.npy"))
+
+    splits = {}
+    for row, (split, _, _) in enumerate(entries):
+        start, _ = splits.get(split, (row, row))
+        splits[split] = (start, row + 1)
+    index = {
+        "format_version": PACKED_FORMAT_VERSION,
+        "dataset_root": os.path.normpath(dataset_root),
+        "image_size": list(image_size),
+        "splits": {split: list(bounds) for split, bounds in splits.items()},
+        "labels": [label for _, label, _ in entries],
+        "paths": [rel_path for _, _, rel_path in entries],
+        "source": identity,
+    }
+    tmp_index = os.path.join(output_dir, "index.json.tmp")
+    with open(tmp_index, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp_index, os.path.join(output_dir, "index.json"))
+    print(f"[INFO] Packed {len(entries)} images from {dataset_root} into {output_dir}")
+    return output_dir
+
+
+class PackedDataset:
+    """Read-only view of a packed dataset; `split(name)` slices the memory-mapped images without copying."""
+    def __init__(self, directory, mmap_mode="r"):
+        self.directory = directory
+        self.images_path = os.path.join(directory, "images.npy")
+        with open(os.path.join(directory, "index.json")) as f:
+            self.index = json.load(f)
+        if self.index.get("format_version") != PACKED_FORMAT_VERSION:
+            raise ValueError(f"Unsupported packed dataset format in {directory}")
+        self.images = np.load(self.images_path, mmap_mode=mmap_mode, allow_pickle=False)
+        self.labels = np.asarray(self.index["labels"])
+        self.image_size = tuple(self.index["image_size"])
+
+    @classmethod
+    def open(cls, dataset_root, image_size, packed_dir=PACKED_DATASET_DIR):
+        """The up-to-date pack for `dataset_root`, or None if there is none or it is stale."""
+        directory = packed_path(dataset_root, image_size, packed_dir)
+        try:
+            packed = cls(directory)
+        except (OSError, ValueError):
+            return None
+        if packed.is_stale(dataset_root):
+            print(f"[WARN] {directory} is out of date with {dataset_root}; rebuild it with "
+                  f"`python -m src.preprocessing.packed_dataset {dataset_root}`")
+            return None
+        return packed
+
+    def is_stale(self, dataset_root=None):
+        dataset_root = dataset_root or self.index["dataset_root"]
+        if not os.path.isdir(dataset_root):
+            # The images themselves are not available (e.g. only the pack was copied); trust the pack
+            return False
+        try:
+            return _source_identity(dataset_root) != self.index["source"]
+        except OSError:
+            # An image was removed while the dataset was being listed
+            return True
+
+    def rows(self, split):
+        if split not in self.index["splits"]:
+            raise ValueError(f"Unknown split '{split}'. Choose from: {list(self.index['splits'].keys())}")
+        return tuple(self.index["splits"][split])
+
+    def split(self, split):
+        """(images, labels) of one split; `images` is a view into the memory map."""
+        start, stop = self.rows(split)
+        return self.images[start:stop], self.labels[start:stop]
+
+    def __len__(self):
+        return len(self.labels)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack a preprocessed image dataset into one memory-mappable array.")
+    parser.add_argument("dataset_roots", nargs="+", help="Dataset directories laid out as <split>/<label>/*.png, "
+                        "e.g. data/processed/dataset_1/sw")
+    parser.add_argument("--output-dir", default=PACKED_DATASET_DIR, help="Directory the packs are written under.")
+    parser.add_argument("--jobs", type=int, default=-1, help="Worker processes (-1 = all cores).")
+    args = parser.parse_args()
+    hog_filter = HogFilter()
+    for dataset_root in args.dataset_roots:
+        build_packed_dataset(dataset_root, packed_path(dataset_root, hog_filter.params["image_size"], args.output_dir),
+                             hog_filter, n_jobs=args.jobs)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
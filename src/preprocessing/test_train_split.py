@@ -1,17 +1,171 @@
 import os
 import numpy as np
-from src.preprocessing.hog_filter import HogFilter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import cv2
+from src.preprocessing.hog_filter import HogFilter, FEATURE_DTYPE
+from src.preprocessing.feature_store import file_hash
+from src.utils.augmentation import available_transformations, augmented_variants, AUGMENTATION_SEED
 from imutils import paths
 
+# Train on in-memory augmented variants of the raw images instead of the PNGs written to data/processed
+STREAM_AUGMENTATION = os.getenv("STREAM_AUGMENTATION", "false").lower() in ("1", "true", "yes")
+
+def _quantify_chunk(backend, params, image_paths):
+    """Featurize a chunk of images in a worker process."""
+    hog_filter = HogFilter(backend=backend, **params)
+    chunk = np.empty((len(image_paths), hog_filter.feature_length()), dtype=FEATURE_DTYPE)
+    for i, imagePath in enumerate(image_paths):
+        features = hog_filter.quantify_image(imagePath)
+        if features is None:
+            raise ValueError(f"Could not read image: {imagePath}")
+        chunk[i] = features
+    return chunk
+
+def iter_augmented_features(hog_filter, image_path, transformation_names, seed=AUGMENTATION_SEED):
+    """
+    Yield the features of `image_path` followed by those of each of its augmented variants.
+
+    The variants are generated in memory with the same seeds `augment_and_save`
+    uses, so they match the AUG_*.png files it would write, without touching disk.
+    """
+    image = cv2.imread(image_path, cv2.IMREAD_UNCHANGED)
+    if image is None:
+        raise ValueError(f"Could not read image: {image_path}")
+    content_hash = file_hash(image_path)
+    yield hog_filter.quantify_image(_as_bgr(image))
+    for _, variant in augmented_variants(image, content_hash, transformation_names, seed):
+        yield hog_filter.quantify_image(_as_bgr(variant))
+
+def _as_bgr(image):
+    # What cv2.imread would return for the image once written to disk, as HogFilter expects
+    if image.ndim == 3 and image.shape[2] == 4:
+        return cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
+    return image
+
+def _quantify_augmented_chunk(backend, params, image_paths, transformation_names, seed):
+    """Featurize a chunk of images and their in-memory augmented variants in a worker process."""
+    hog_filter = HogFilter(backend=backend, **params)
+    n_variants = 1 + len(transformation_names)
+    chunk = np.empty((len(image_paths) * n_variants, hog_filter.feature_length()), dtype=FEATURE_DTYPE)
+    for i, imagePath in enumerate(image_paths):
+        for j, features in enumerate(iter_augmented_features(hog_filter, imagePath, transformation_names, seed)):
+            chunk[i * n_variants + j] = features
+    return chunk
+
+def _hog_packed_chunk(backend, params, rows, images_path):
+    """HOG of a contiguous range of already preprocessed images from a packed dataset, in a worker process."""
+    hog_filter = HogFilter(backend=backend, **params)
+    images = np.load(images_path, mmap_mode="r")
+    chunk = np.empty((len(rows), hog_filter.feature_length()), dtype=FEATURE_DTYPE)
+    for i, image in enumerate(images[rows[0]:rows[-1] + 1]):
+        chunk[i] = hog_filter.compute_hog(image)
+    return chunk
+
 class TestTrainSplit:
-    def __init__(self):
-        pass
+    # Not a test case, despite the name
+    __test__ = False
+
+    def __init__(self, feature_store=None, n_jobs=1, chunksize=32, transformations=None, augmentation_seed=AUGMENTATION_SEED,
+                 packed_dataset=None):
+        # Optional FeatureStore; when given, unchanged images are never re-featurized
+        self.feature_store = feature_store
+        # Optional PackedDataset; splits of its dataset are read from it instead of the image files
+        self.packed_dataset = packed_dataset
+        self.hog_filter = feature_store.hog_filter if feature_store is not None else HogFilter()
+        # n_jobs > 1 featurizes in a process pool; -1 uses every core
+        self.n_jobs = os.cpu_count() if n_jobs == -1 else max(1, n_jobs)
+        self.chunksize = max(1, chunksize)
+        # Transforms applied by load_split_data(..., augment=True)
+        self.transformations = list(transformations or available_transformations)
+        unknown = set(self.transformations) - set(available_transformations)
+        if unknown:
+            raise ValueError(f"Unknown transformations: {sorted(unknown)}. Choose from: {list(available_transformations.keys())}")
+        self.augmentation_seed = augmentation_seed
+
+    def iter_chunks(self, image_paths, worker, *args, rows_per_image=1):
+        """
+        Generator of (first row, feature block) for `image_paths`, split into chunks
+        that `worker(backend, params, paths, *args)` featurizes, in worker processes
+        when n_jobs > 1. Blocks arrive in completion order.
+        """
+        chunks = [(start, image_paths[start:start + self.chunksize])
+                  for start in range(0, len(image_paths), self.chunksize)]
+        backend, params = self.hog_filter.backend, self.hog_filter.params
+        if self.n_jobs > 1 and len(chunks) > 1:
+            with ProcessPoolExecutor(max_workers=min(self.n_jobs, len(chunks))) as executor:
+                futures = {executor.submit(worker, backend, params, chunk, *args): start for start, chunk in chunks}
+                for future in as_completed(futures):
+                    yield futures[future] * rows_per_image, future.result()
+        else:
+            for start, chunk in chunks:
+                yield start * rows_per_image, worker(backend, params, chunk, *args)
+
+    def _fill(self, blocks, n_rows, unit):
+        # Each block is written straight into its rows, so the result does not depend on completion order
+        data = np.empty((n_rows, self.hog_filter.feature_length()), dtype=FEATURE_DTYPE)
+        done = 0
+        for start, block in blocks:
+            data[start:start + len(block)] = block
+            done += len(block)
+            print(f"[INFO] featurized {done}/{n_rows} {unit}")
+        return data
+
+    def extract_features(self, image_paths):
+        """
+        Featurize `image_paths` into a preallocated float32 matrix, one row per image in order.
+
+        With n_jobs > 1 the paths are split into chunks that worker processes featurize
+        independently, so the result is identical to the serial path.
+        """
+        return self._fill(self.iter_chunks(image_paths, _quantify_chunk), len(image_paths), "images")
+
+    def extract_augmented_features(self, image_paths):
+        """
+        Featurize `image_paths` and their augmented variants, streamed from memory.
+
+        Returns a matrix with 1 + len(self.transformations) consecutive rows per
+        image: the original, then one row per transform in order. No augmented
+        image is ever written to disk.
+        """
+        rows_per_image = 1 + len(self.transformations)
+        blocks = self.iter_chunks(image_paths, _quantify_augmented_chunk, self.transformations,
+                                  self.augmentation_seed, rows_per_image=rows_per_image)
+        return self._fill(blocks, len(image_paths) * rows_per_image, "images (with augmented variants)")
+
+    def load_packed_split(self, split):
+        """
+        Featurize one split of the packed dataset; returns (data, labels) like load_split_data.
+
+        The images are already decoded and preprocessed, so only HOG is computed,
+        straight from zero-copy slices of the memory map.
+        """
+        packed = self.packed_dataset
+        if tuple(packed.image_size) != tuple(self.hog_filter.params["image_size"]):
+            raise ValueError(f"{packed.directory} was packed at {packed.image_size}, "
+                             f"the HOG filter expects {self.hog_filter.params['image_size']}")
+        start, stop = packed.rows(split)
+        blocks = self.iter_chunks(list(range(start, stop)), _hog_packed_chunk, packed.images_path)
+        data = self._fill(blocks, stop - start, "packed images")
+        return data, packed.split(split)[1]
+
+    def _packed_split_name(self, path):
+        # The split name if `path` is a split directory of the packed dataset, else None
+        if self.packed_dataset is None:
+            return None
+        root, split = os.path.split(os.path.normpath(path))
+        if os.path.abspath(root) == os.path.abspath(self.packed_dataset.index["dataset_root"]) \
+                and split in self.packed_dataset.index["splits"]:
+            return split
+        return None
+
+    def load_split_data(self, path, augment=False):
+        packed_split = None if augment else self._packed_split_name(path)
+        if packed_split is not None:
+            return self.load_packed_split(packed_split)
 
-    def load_split_data(self, path):
         # grab the list of images in the input directory, then initialize
-        # the list of data (i.e., images) and class labels
+        # the list of class labels
         imagePaths = list(paths.list_images(path))
-        data = []
         labels = []
 
         # loop over the image paths
@@ -23,13 +177,17 @@ class TestTrainSplit:
             # ['..', 'data', 'processed', 'dataset_1', 'spiral', 'testing', 'healthy', 'V01HE01.png']
             # The -2 index picks 'healthy', which is the class label.
             label = imagePath.split(os.path.sep)[-2]
-
-            # quantify the image
-            features = HogFilter().quantify_image(imagePath)
-
-            # update the data and labels lists, respectively
-            data.append(features)
             labels.append(label)
 
+        # quantify the images, reusing cached features where possible
+        if augment:
+            # Augmented variants are generated on the fly; the feature store only caches files on disk
+            data = self.extract_augmented_features(imagePaths)
+            labels = np.repeat(labels, 1 + len(self.transformations)).tolist()
+        elif self.feature_store is not None:
+            data = self.feature_store.get_or_compute(imagePaths, self.extract_features)
+        else:
+            data = self.extract_features(imagePaths)
+
         # return the data and labels
-        return (np.array(data), np.array(labels))
\ No newline at end of file
+        return (data, np.array(labels))
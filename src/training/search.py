@@ -0,0 +1,298 @@
+"""
+Hyperparameter search over the model types of `src.training.train_all`.
+
+The training split is featurized once and every candidate is scored with
+stratified k-fold cross-validation; all (candidate, fold) fits of a batch run in
+parallel on a shared joblib worker pool, which memory-maps the feature matrix
+into the workers. Three strategies are available:
+
+- grid: every combination in SEARCH_SPACES;
+- random: `n_iter` combinations sampled from it;
+- halving: successive halving over the grid, starting every candidate on a
+  small stratified subsample and keeping the best 1/`factor` of them for each
+  round on `factor` times more samples, up to the full split.
+
+Grid and random search stop early once `patience` candidates in a row have not
+improved on the best accuracy. Every scored (candidate, sample size) pair is
+written to a checkpoint next to metrics.json, so an interrupted search resumes
+where it stopped and strategies reuse each other's results.
+
+Results go to search_results.json next to metrics.json: per model, every
+candidate's cross-validated accuracy, mean fit time and predict latency per
+sample, whether it is on the latency-vs-accuracy Pareto frontier, and the best
+candidate, which `python -m src.training.train_all --from-search` trains.
+
+    python -m src.training.search --dataset sw --models KNN RandomForest --strategy halving
+"""
+import os
+import sys
+import math
+import json
+import time
+import argparse
+import numpy as np
+import joblib
+from sklearn.model_selection import ParameterGrid, ParameterSampler, StratifiedKFold, train_test_split
+from sklearn.preprocessing import LabelEncoder
+from src.training.train_all import (MODEL_CONFIGS, DATASETS, DEFAULT_DATASET, dataset_path, load_features,
+                                    print_timings, _phase)
+
+# Hyperparameter values searched for each model type
+SEARCH_SPACES = {
+    "LinearSVM": {"C": [0.001, 0.0025, 0.01, 0.025, 0.1, 0.25, 1.0]},
+    "RandomForest": {"n_estimators": [25, 50, 100, 200], "max_depth": [None, 10, 20], "max_features": ["sqrt", "log2"]},
+    "KNN": {"n_neighbors": [1, 2, 3, 5, 7, 9], "weights": ["uniform", "distance"]},
+}
+
+STRATEGIES = ("grid", "random", "halving")
+SEARCH_RESULTS_FILE = "search_results.json"
+CHECKPOINT_FILE = "search_checkpoint.json"
+
+
+def _candidate_key(params, n_samples):
+    return f"{json.dumps(params, sort_keys=True)}@{n_samples}"
+
+
+def _write_json(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+class Checkpoint:
+    """
+    Scored (candidate, sample size) pairs per model, persisted after every batch.
+
+    Results are only reused for the same dataset, features, folds and seed.
+    """
+    def __init__(self, path, config):
+        self.path = path
+        self.config = config
+        self.results = {}
+        try:
+            with open(path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        if saved.get("config") == config:
+            self.results = saved["results"]
+            n_saved = sum(len(results) for results in self.results.values())
+            print(f"[INFO] Resuming search from {path} ({n_saved} evaluations)")
+        else:
+            print(f"[INFO] Ignoring {path}: it was made with different data or settings")
+
+    def get(self, key, params, n_samples):
+        return self.results.get(key, {}).get(_candidate_key(params, n_samples))
+
+    def add(self, key, result):
+        self.results.setdefault(key, {})[_candidate_key(result["params"], result["n_samples"])] = result
+
+    def save(self):
+        _write_json(self.path, {"config": self.config, "results": self.results})
+
+
+def _score_fold(key, params, X, y, train_idx, val_idx):
+    """Fit one candidate on one fold and time its fit and prediction. Runs in a worker process."""
+    classifier = MODEL_CONFIGS[key][1](**params)
+    start = time.perf_counter()
+    classifier.fit(X[train_idx], y[train_idx])
+    fitted = time.perf_counter()
+    predictions = classifier.predict(X[val_idx])
+    predicted = time.perf_counter()
+    return {"accuracy": float(np.mean(predictions == y[val_idx])), "fit_seconds": fitted - start,
+            "predict_seconds": predicted - fitted, "n_predicted": len(val_idx)}
+
+
+def _subsample(y, n_samples, seed):
+    """Indices of a stratified subsample of `n_samples` rows (all rows when n_samples == len(y))."""
+    indices = np.arange(len(y))
+    if n_samples >= len(y):
+        return indices
+    return np.sort(train_test_split(indices, train_size=n_samples, stratify=y, random_state=seed)[0])
+
+
+class Search:
+    """Cross-validated scoring of candidates for one dataset, sharing a worker pool and a checkpoint."""
+    def __init__(self, X, y, parallel, checkpoint, folds=5, seed=42, batch_size=None):
+        self.X = X
+        self.y = y
+        self.parallel = parallel
+        self.checkpoint = checkpoint
+        self.folds = folds
+        self.seed = seed
+        n_workers = parallel.n_jobs if parallel.n_jobs > 0 else (os.cpu_count() or 1)
+        # Enough candidates per batch to keep every worker busy with one fold each
+        self.batch_size = batch_size or max(1, math.ceil(n_workers / folds))
+
+    def evaluate(self, key, candidates, n_samples=None):
+        """Cross-validated results for `candidates`, in order; only pairs missing from the checkpoint are fitted."""
+        n_samples = min(n_samples or len(self.y), len(self.y))
+        todo = [params for params in candidates if self.checkpoint.get(key, params, n_samples) is None]
+        if todo:
+            rows = _subsample(self.y, n_samples, self.seed)
+            splits = [(rows[train], rows[val]) for train, val in
+                      StratifiedKFold(self.folds, shuffle=True, random_state=self.seed).split(rows, self.y[rows])]
+            folds = self.parallel(joblib.delayed(_score_fold)(key, params, self.X, self.y, train_idx, val_idx)
+                                  for params in todo for train_idx, val_idx in splits)
+            for i, params in enumerate(todo):
+                scores = folds[i * len(splits):(i + 1) * len(splits)]
+                accuracies = [score["accuracy"] for score in scores]
+                self.checkpoint.add(key, {
+                    "params": params,
+                    "n_samples": n_samples,
+                    "accuracy": float(np.mean(accuracies)),
+                    "accuracy_std": float(np.std(accuracies)),
+                    "fit_seconds": float(np.mean([score["fit_seconds"] for score in scores])),
+                    "predict_ms_per_sample": 1000 * sum(score["predict_seconds"] for score in scores)
+                                             / sum(score["n_predicted"] for score in scores),
+                })
+            self.checkpoint.save()
+        return [self.checkpoint.get(key, params, n_samples) for params in candidates]
+
+    def sequential(self, key, candidates, patience=None):
+        """Grid or random search in batches, stopping after `patience` candidates without improvement."""
+        best, since_best = -1.0, 0
+        for start in range(0, len(candidates), self.batch_size):
+            for result in self.evaluate(key, candidates[start:start + self.batch_size]):
+                if result["accuracy"] > best:
+                    best, since_best = result["accuracy"], 0
+                else:
+                    since_best += 1
+            if patience is not None and since_best >= patience:
+                print(f"[INFO] {key}: no improvement in {since_best} candidates, stopping early")
+                break
+
+    def halving(self, key, candidates, factor=3, min_samples=None):
+        """Successive halving: evaluate on growing subsamples, keeping the best 1/factor each round."""
+        n_total = len(self.y)
+        n_rounds = max(1, math.ceil(math.log(len(candidates), factor))) if len(candidates) > 1 else 1
+        # Each fold needs a few samples of every class
+        min_samples = min_samples or 4 * self.folds * len(np.unique(self.y))
+        n_samples = min(n_total, max(min_samples, n_total // factor ** (n_rounds - 1)))
+        remaining = list(candidates)
+        while True:
+            results = self.evaluate(key, remaining, n_samples)
+            print(f"[INFO] {key}: {len(remaining)} candidates on {n_samples} samples, "
+                  f"best accuracy {max(r['accuracy'] for r in results):.3f}")
+            if n_samples >= n_total:
+                break
+            order = sorted(range(len(remaining)), key=lambda i: -results[i]["accuracy"])
+            remaining = [remaining[i] for i in order[:max(1, math.ceil(len(remaining) / factor))]]
+            n_samples = min(n_total, n_samples * factor)
+
+
+def _candidates(key, strategy, n_iter, seed):
+    space = SEARCH_SPACES[key]
+    grid = list(ParameterGrid(space))
+    if strategy == "random" and n_iter < len(grid):
+        return [dict(params) for params in ParameterSampler(space, n_iter=n_iter, random_state=seed)]
+    return grid
+
+
+def summarize(results):
+    """Best result (accuracy, then predict latency) and Pareto flags among full-size results."""
+    full = max(result["n_samples"] for result in results)
+    final = sorted((dict(result) for result in results if result["n_samples"] == full),
+                   key=lambda r: (r["predict_ms_per_sample"], -r["accuracy"]))
+    best_accuracy = -1.0
+    for result in final:
+        # On the frontier if no faster candidate is at least as accurate
+        result["pareto"] = result["accuracy"] > best_accuracy
+        best_accuracy = max(best_accuracy, result["accuracy"])
+    best = max(final, key=lambda r: (r["accuracy"], -r["predict_ms_per_sample"]))
+    return best, final
+
+
+def run_search(model_keys=None, dataset_dir=None, models_dir="models", strategy="grid", n_iter=10, folds=5,
+               factor=3, patience=None, seed=42, n_jobs=-1, restart=False, feature_store=None):
+    """
+    Search hyperparameters of `model_keys` on the training split of `dataset_dir`.
+
+    Returns the per-model summaries also written to search_results.json in `models_dir`.
+    """
+    model_keys = list(model_keys or MODEL_CONFIGS)
+    unknown = set(model_keys) - set(SEARCH_SPACES)
+    if unknown:
+        raise ValueError(f"Unknown models: {sorted(unknown)}. Choose from: {list(SEARCH_SPACES.keys())}")
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown search strategy '{strategy}'. Choose from: {list(STRATEGIES)}")
+    dataset_dir = dataset_dir or dataset_path()
+    timings = {}
+    with _phase(timings, "features"):
+        # Only the training split is searched over; the testing split stays held out for train_all
+        X, y, _, _, hog_filter = load_features(dataset_dir, n_jobs, feature_store=feature_store)
+    y = LabelEncoder().fit_transform(y)
+
+    os.makedirs(models_dir, exist_ok=True)
+    checkpoint_path = os.path.join(models_dir, CHECKPOINT_FILE)
+    if restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    config = {"dataset": os.path.normpath(dataset_dir), "feature_key": hog_filter.feature_key(),
+              "n_samples": len(y), "folds": folds, "seed": seed}
+    checkpoint = Checkpoint(checkpoint_path, config)
+
+    summaries = {}
+    with joblib.Parallel(n_jobs=n_jobs) as parallel:
+        search = Search(X, y, parallel, checkpoint, folds=folds, seed=seed)
+        for key in model_keys:
+            candidates = _candidates(key, strategy, n_iter, seed)
+            with _phase(timings, f"search[{key}]"):
+                if strategy == "halving":
+                    search.halving(key, candidates, factor=factor)
+                else:
+                    search.sequential(key, candidates, patience=patience)
+            # Everything scored for these candidates so far, including earlier runs and other strategies
+            keys = {json.dumps(params, sort_keys=True) for params in candidates}
+            results = [r for r in checkpoint.results[key].values() if json.dumps(r["params"], sort_keys=True) in keys]
+            best, final = summarize(results)
+            summaries[key] = {"display_name": MODEL_CONFIGS[key][0], "best": best, "results": final}
+            print(f"[INFO] {key}: best {best['params']} accuracy {best['accuracy']:.3f} "
+                  f"({best['predict_ms_per_sample']:.3f} ms/sample)")
+
+    results_path = os.path.join(models_dir, SEARCH_RESULTS_FILE)
+    try:
+        with open(results_path) as f:
+            all_results = json.load(f)
+    except (OSError, ValueError):
+        all_results = {}
+    for key, summary in summaries.items():
+        all_results[key] = {**summary, **config, "strategy": strategy}
+    _write_json(results_path, all_results)
+    print(f"[INFO] Search results saved to {results_path}")
+    print_timings(timings)
+    return summaries
+
+
+def best_params(models_dir="models"):
+    """{model key: best hyperparameters} from search_results.json, or {} if no search was run."""
+    try:
+        with open(os.path.join(models_dir, SEARCH_RESULTS_FILE)) as f:
+            return {key: result["best"]["params"] for key, result in json.load(f).items()}
+    except (OSError, ValueError):
+        return {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cross-validated hyperparameter search on a shared feature matrix.")
+    parser.add_argument("--dataset", default=DEFAULT_DATASET, choices=DATASETS, help="Drawing type to search on.")
+    parser.add_argument("--models", nargs="+", default=list(SEARCH_SPACES), choices=list(SEARCH_SPACES),
+                        help="Models to tune.")
+    parser.add_argument("--strategy", default="grid", choices=STRATEGIES, help="Search strategy.")
+    parser.add_argument("--n-iter", type=int, default=10, help="Candidates sampled per model by random search.")
+    parser.add_argument("--folds", type=int, default=5, help="Cross-validation folds.")
+    parser.add_argument("--factor", type=int, default=3, help="Halving: keep 1/factor of the candidates per round.")
+    parser.add_argument("--patience", type=int, default=None,
+                        help="Grid/random: stop after this many candidates without improvement.")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for folds, subsamples and random search.")
+    parser.add_argument("--models-dir", default="models", help="Where metrics.json and the search results live.")
+    parser.add_argument("--jobs", type=int, default=-1, help="Worker processes (-1 = all cores).")
+    parser.add_argument("--restart", action="store_true", help="Discard the checkpoint of a previous search.")
+    args = parser.parse_args()
+    run_search(args.models, dataset_path(args.dataset), args.models_dir, strategy=args.strategy, n_iter=args.n_iter,
+               folds=args.folds, factor=args.factor, patience=args.patience, seed=args.seed, n_jobs=args.jobs,
+               restart=args.restart)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
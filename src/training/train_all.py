@@ -0,0 +1,268 @@
+"""
+Train several models on one dataset from a single shared feature matrix.
+
+The training and testing splits are featurized once (through the feature store,
+or a packed copy of the dataset when there is one) and every requested model is
+fitted and evaluated on the same matrices, in parallel worker processes. The
+models are saved and exported as before, and their metrics.json entries are
+written in one atomic update. Wall time is reported per phase.
+
+An optional reduction stage (PCA, truncated SVD or univariate feature
+selection) can be fitted on the training features and stored in every bundle
+as a float32 NumPy reducer that Predict applies before the classifier. With
+`--compare-components`, the accuracy, single-image latency and size of each
+model is also reported for several target dimensionalities.
+
+    python -m src.training.train_all --dataset sw --models LinearSVM RandomForest KNN
+    python -m src.training.train_all --reduce pca --n-components 128 --compare-components 32 64 256
+"""
+import os
+import sys
+import time
+import json
+import pickle
+import argparse
+from contextlib import contextmanager
+import numpy as np
+import joblib
+from sklearn.decomposition import PCA, TruncatedSVD
+from sklearn.feature_selection import SelectKBest, f_classif
+from sklearn.svm import SVC
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.preprocessing import LabelEncoder
+from sklearn.metrics import classification_report
+from src.preprocessing.test_train_split import TestTrainSplit, STREAM_AUGMENTATION
+from src.preprocessing.feature_store import FeatureStore
+from src.preprocessing.packed_dataset import PackedDataset
+from src.utils.metrics_saver import model_entry, update_metrics_file
+from src.predictions.compact_models import export_model, compile_bundle, compact_reducer, CompactLabelEncoder
+
+DATASETS = ("spiral", "sw", "wave")
+DEFAULT_DATASET = "sw"
+
+# Model key (pickle model_<key>.pkl) -> display name in metrics.json and estimator factory;
+# keyword arguments to the factory override the default hyperparameters
+MODEL_CONFIGS = {
+    "LinearSVM": ("Linear SVM", lambda **params: SVC(**{"kernel": "linear", "C": 0.025, "random_state": 42, **params})),
+    "RandomForest": ("Random Forest", lambda **params: RandomForestClassifier(**{"n_estimators": 100, "random_state": 42, **params})),
+    "KNN": ("K-Nearest Neighbors", lambda **params: KNeighborsClassifier(**{"n_neighbors": 2, **params})),
+}
+
+# Optional dimensionality reduction between HOG and the classifiers: method -> estimator for n components
+REDUCERS = {
+    "pca": lambda n: PCA(n_components=n, svd_solver="randomized", random_state=42),
+    "svd": lambda n: TruncatedSVD(n_components=n, random_state=42),
+    "select": lambda n: SelectKBest(f_classif, k=n),
+}
+# Single-image predictions timed per model in the reduction trade-off report
+LATENCY_SAMPLES = 50
+
+
+def dataset_path(dataset=DEFAULT_DATASET):
+    if dataset not in DATASETS:
+        raise ValueError(f"Unknown dataset '{dataset}'. Choose from: {list(DATASETS)}")
+    # Streaming augmentation reads the raw images; otherwise the augmented copies in data/processed
+    root = "data/raw/dataset_1/" if STREAM_AUGMENTATION else "data/processed/dataset_1/"
+    return root + dataset
+
+
+@contextmanager
+def _phase(timings, name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+
+
+def load_features(dataset_dir, n_jobs=-1, augment=STREAM_AUGMENTATION, feature_store=None):
+    """Featurize both splits of `dataset_dir` once; returns (trainX, trainY, testX, testY, hog_filter)."""
+    feature_store = feature_store or FeatureStore()
+    # A packed copy of the dataset (python -m src.preprocessing.packed_dataset), when up to date, skips all image I/O
+    packed = PackedDataset.open(dataset_dir, feature_store.hog_filter.params["image_size"])
+    splitter = TestTrainSplit(feature_store=feature_store, n_jobs=n_jobs, packed_dataset=packed)
+    (trainX, trainY) = splitter.load_split_data(os.path.join(dataset_dir, "training"), augment=augment)
+    (testX, testY) = splitter.load_split_data(os.path.join(dataset_dir, "testing"))
+    return trainX, trainY, testX, testY, splitter.hog_filter
+
+
+def fit_reducer(method, n_components, X, y):
+    """Fit a reduction stage on the training features and return its compact, NumPy-only form."""
+    if method not in REDUCERS:
+        raise ValueError(f"Unknown reduction method '{method}'. Choose from: {list(REDUCERS.keys())}")
+    if method in ("pca", "svd"):
+        # Projections cannot have more components than samples or features
+        n_components = min(n_components, X.shape[0], X.shape[1] - 1)
+    return compact_reducer(REDUCERS[method](min(n_components, X.shape[1])).fit(X, y))
+
+
+def _fit_and_evaluate(key, trainX, trainY, testX, testY, target_names, params=None):
+    """Fit one model and score it on the test split. Runs in a worker process."""
+    start = time.perf_counter()
+    classifier = MODEL_CONFIGS[key][1](**(params or {}))
+    classifier.fit(trainX, trainY)
+    fitted = time.perf_counter()
+    report = classification_report(testY, classifier.predict(testX), target_names=target_names,
+                                   output_dict=True, zero_division=0)
+    return classifier, report, {"fit": fitted - start, "evaluate": time.perf_counter() - fitted}
+
+
+def _tradeoff_row(key, params, trainX, trainY, testX, testY, reducer):
+    """Accuracy, single-image latency and size of one model at one dimensionality. Runs in a worker process."""
+    reduce = (lambda X: X) if reducer is None else reducer.transform
+    classifier = MODEL_CONFIGS[key][1](**(params or {})).fit(reduce(trainX), trainY)
+    bundle = {"classifier": classifier, "label_encoder": CompactLabelEncoder(classifier.classes_), "reducer": reducer}
+    # Latency as served: the compact engine on one HOG vector at a time, reduction included
+    served = compile_bundle(bundle)["classifier"]
+    samples = testX[:LATENCY_SAMPLES]
+    start = time.perf_counter()
+    for row in samples:
+        served.predict(reduce(row[None, :]))
+    latency = (time.perf_counter() - start) / max(1, len(samples))
+    return {"accuracy": float(np.mean(classifier.predict(reduce(testX)) == testY)), "predict_ms": 1000 * latency,
+            "size_bytes": len(pickle.dumps(bundle))}
+
+
+def reduction_tradeoff(model_keys, trainX, trainY, testX, testY, method, dimensions, n_jobs=-1, params=None):
+    """
+    Accuracy, single-image predict latency (reduction included) and pickled model
+    size of each model at each dimensionality; None stands for the full HOG width.
+    """
+    params = params or {}
+    tasks = []
+    for n_components in dimensions:
+        reducer = None if n_components is None else fit_reducer(method, n_components, trainX, trainY)
+        tasks.extend((key, n_components, reducer) for key in model_keys)
+    rows = joblib.Parallel(n_jobs=n_jobs)(
+        joblib.delayed(_tradeoff_row)(key, params.get(key), trainX, trainY, testX, testY, reducer)
+        for key, _, reducer in tasks)
+    return [{"model": key, "n_components": reducer.n_components_ if reducer is not None else trainX.shape[1],
+             **row} for (key, _, reducer), row in zip(tasks, rows)]
+
+
+def print_tradeoff(report):
+    print("[INFO] dimensionality trade-off (accuracy / ms per image / model size):")
+    for row in report:
+        print(f"  {row['model']:<14} {row['n_components']:>7} dims  {row['accuracy']:6.3f}  "
+              f"{row['predict_ms']:8.3f} ms  {row['size_bytes'] / 1024:10.1f} KiB")
+
+
+def train_models(model_keys=None, dataset_dir=None, models_dir="models", n_jobs=-1, augment=STREAM_AUGMENTATION,
+                 feature_store=None, params=None, reduce=None, compare_components=None):
+    """
+    Train `model_keys` (default: all of MODEL_CONFIGS) on `dataset_dir` and save them to `models_dir`.
+
+    `params` optionally maps model keys to hyperparameters overriding the defaults,
+    e.g. the best ones found by `src.training.search`. `reduce` is an optional
+    (method, n_components) reduction stage fitted on the training features and
+    saved in each bundle; `compare_components` adds a trade-off report over those
+    dimensionalities (and the full width) to the result under "reduction".
+
+    Returns {"models": {display_name: metrics}, "timings": {phase: seconds}}, where
+    per-model fit and evaluate times are reported as "<phase>[<key>]".
+    """
+    model_keys = list(model_keys or MODEL_CONFIGS)
+    unknown = set(model_keys) - set(MODEL_CONFIGS)
+    if unknown:
+        raise ValueError(f"Unknown models: {sorted(unknown)}. Choose from: {list(MODEL_CONFIGS.keys())}")
+    dataset_dir = dataset_dir or dataset_path()
+    params = params or {}
+    timings = {}
+
+    with _phase(timings, "features"):
+        trainX, trainY, testX, testY, hog_filter = load_features(dataset_dir, n_jobs, augment, feature_store)
+    le = LabelEncoder()
+    trainY = le.fit_transform(trainY)
+    testY = le.transform(testY)
+
+    reducer = None
+    tradeoff = None
+    if compare_components:
+        with _phase(timings, "reduction_tradeoff"):
+            dimensions = [None] + sorted(set(compare_components) | ({reduce[1]} if reduce else set()))
+            tradeoff = reduction_tradeoff(model_keys, trainX, trainY, testX, testY, reduce[0] if reduce else "pca",
+                                        dimensions, n_jobs, params)
+    if reduce:
+        with _phase(timings, "reduce"):
+            reducer = fit_reducer(reduce[0], reduce[1], trainX, trainY)
+            trainX, testX = reducer.transform(trainX), reducer.transform(testX)
+
+    # Each model is fitted in its own process; joblib memory-maps the shared feature matrices into them
+    n_workers = min(len(model_keys), os.cpu_count() or 1) if n_jobs == -1 else max(1, min(n_jobs, len(model_keys)))
+    with _phase(timings, "fit_and_evaluate"):
+        results = joblib.Parallel(n_jobs=n_workers)(
+            joblib.delayed(_fit_and_evaluate)(key, trainX, trainY, testX, testY, le.classes_, params.get(key))
+            for key in model_keys)
+
+    entries = {}
+    summary = {}
+    with _phase(timings, "save"):
+        os.makedirs(models_dir, exist_ok=True)
+        for key, (classifier, report, model_timings) in zip(model_keys, results):
+            for phase, seconds in model_timings.items():
+                timings[f"{phase}[{key}]"] = seconds
+            display_name = MODEL_CONFIGS[key][0]
+            model_path = os.path.join(models_dir, f"model_{key}.pkl")
+            to_save = {"classifier": classifier, "label_encoder": le}
+            if reducer is not None:
+                to_save["reducer"] = reducer
+            joblib.dump(to_save, model_path)
+            # Compact artifact the API loads without scikit-learn (skipped for models without one)
+            export_model(to_save, model_path)
+            metrics = {
+                "accuracy": report["accuracy"],
+                "precision": report["weighted avg"]["precision"],
+                "recall": report["weighted avg"]["recall"],
+                "f1-score": report["weighted avg"]["f1-score"]
+            }
+            # Lets the API serve the model with the same preprocessing it was trained with
+            model_info = {"backend": "sklearn", "features": hog_filter.describe()}
+            if params.get(key):
+                model_info["params"] = params[key]
+            if reducer is not None:
+                model_info["reducer"] = {"method": reduce[0], "n_components": reducer.n_components_}
+            entries[display_name] = model_entry(metrics, model_path, model_info)
+            summary[display_name] = metrics
+        update_metrics_file(entries, os.path.join(models_dir, "metrics.json"))
+    result = {"models": summary, "timings": timings}
+    if tradeoff is not None:
+        result["reduction"] = tradeoff
+    return result
+
+
+def print_timings(timings):
+    print("[INFO] training time per phase:")
+    for phase, seconds in timings.items():
+        print(f"  {phase:<28} {seconds:8.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train models on one dataset from a shared feature matrix.")
+    parser.add_argument("--dataset", default=DEFAULT_DATASET, choices=DATASETS, help="Drawing type to train on.")
+    parser.add_argument("--models", nargs="+", default=list(MODEL_CONFIGS), choices=list(MODEL_CONFIGS),
+                        help="Models to train.")
+    parser.add_argument("--models-dir", default="models", help="Where the pickles and metrics.json are written.")
+    parser.add_argument("--jobs", type=int, default=-1, help="Worker processes for featurization and fitting (-1 = all cores).")
+    parser.add_argument("--from-search", action="store_true",
+                        help="Use the best hyperparameters from search_results.json in --models-dir.")
+    parser.add_argument("--reduce", choices=list(REDUCERS), help="Reduce the HOG features before the classifiers.")
+    parser.add_argument("--n-components", type=int, default=128, help="Target dimensionality of --reduce.")
+    parser.add_argument("--compare-components", type=int, nargs="+",
+                        help="Also report accuracy, latency and size at these dimensionalities.")
+    args = parser.parse_args()
+    params = None
+    if args.from_search:
+        from src.training.search import best_params
+        params = best_params(args.models_dir)
+    reduce = (args.reduce, args.n_components) if args.reduce else None
+    result = train_models(args.models, dataset_path(args.dataset), args.models_dir, n_jobs=args.jobs, params=params,
+                          reduce=reduce, compare_components=args.compare_components)
+    print(json.dumps(result["models"], indent=2))
+    if "reduction" in result:
+        print_tradeoff(result["reduction"])
+    print_timings(result["timings"])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
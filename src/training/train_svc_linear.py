@@ -1,54 +1,17 @@
-import os
-import joblib
-import json
-from sklearn.svm import SVC
-from sklearn.preprocessing import LabelEncoder
-from sklearn.metrics import classification_report
-from src.preprocessing.test_train_split import TestTrainSplit
-from src.utils.metrics_saver import save_model_metrics
+from src.training.train_all import train_models, print_timings, dataset_path, DEFAULT_DATASET
 
 class TrainSVCLinear:
-    def __init__(self):
-        self.le = LabelEncoder()
+    def __init__(self, dataset=DEFAULT_DATASET):
+        self.dataset = dataset
 
     def select_dataset(self):
-        data1 = ["spiral", "sw", "wave"]
-        dataset = "data/processed/dataset_1/" + data1[1]
-        return dataset
+        return dataset_path(self.dataset)
 
     def train(self):
-        dataset = self.select_dataset()
-        trainingPath = os.path.sep.join([dataset, "training"])
-        testingPath = os.path.sep.join([dataset, "testing"])
-
-        (trainX, trainY) = TestTrainSplit().load_split_data(trainingPath)
-        (testX, testY) = TestTrainSplit().load_split_data(testingPath)
-        trainY = self.le.fit_transform(trainY)
-        testY = self.le.transform(testY)
-
-        classifier = SVC(kernel="linear", C=0.025, random_state=42)
-        classifier.fit(trainX, trainY)
-
-        # Save the trained model and label encoder
-        model_path = os.path.join("models", "model_LinearSVM.pkl")
-        to_save = {
-            "classifier": classifier,
-            "label_encoder": self.le
-        }
-        joblib.dump(to_save, model_path)
-
-        print("[INFO] evaluating model...")
-        predictions = classifier.predict(testX)
-        report = classification_report(testY, predictions, target_names=self.le.classes_, output_dict=True)
-        print(json.dumps(report, indent=2))
-        display_name = "Linear SVM"
-        metrics = {
-            "accuracy": report["accuracy"],
-            "precision": report["weighted avg"]["precision"],
-            "recall": report["weighted avg"]["recall"],
-            "f1-score": report["weighted avg"]["f1-score"]
-        }
-        save_model_metrics(display_name, metrics, model_path)
+        # Same pipeline as `python -m src.training.train_all --models LinearSVM`
+        result = train_models(["LinearSVM"], self.select_dataset())
+        print_timings(result["timings"])
+        return result
 
 if __name__ == "__main__":
     trainer = TrainSVCLinear()
@@ -1,10 +1,14 @@
+import os
+import sys
 import streamlit as st
-import requests
-from PIL import Image
-import io
+
+# Ensure the project root is in sys.path (streamlit only adds this script's directory)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.ui.client import ApiClient
 
 # --- CONFIG ---
-API_URL = "http://localhost:8000"  # Change if deploying elsewhere
+# The API address is read from API_URL (default http://localhost:8000) by ApiClient
 
 st.set_page_config(page_title="Parkinson's Detection", layout="centered")
 
@@ -13,19 +17,23 @@ st.markdown("""
     <h1 style='text-align:center;'>Parkinson's Detection</h1>
 """, unsafe_allow_html=True)
 
+# --- One pooled API client (connection, reduced uploads, prediction cache) per browser session ---
+if "client" not in st.session_state:
+    st.session_state.client = ApiClient()
+client = st.session_state.client
+
 # --- Fetch available models and metrics ---
-@st.cache_data(show_spinner=False)
+@st.cache_data(show_spinner=False, ttl=300)
 def get_models_and_metrics():
     try:
-        resp = requests.get(f"{API_URL}/models")
-        resp.raise_for_status()
-        data = resp.json()
-        return data["models"]
+        return client.get_models()
     except Exception as e:
         st.error(f"Failed to fetch models: {e}")
         return {}
 
 models = get_models_and_metrics()
+# The cached listing may come from another session's client
+client.models = models
 model_names = list(models.keys())
 
 # --- Expander with About and Steps ---
@@ -58,24 +66,31 @@ with col_upload:
     if image_file:
         st.image(image_file, caption="Uploaded Image", width=150)
 
-# --- Predict button and prediction below ---
+# --- Predict buttons and prediction below ---
+def show_prediction(label, prediction):
+    color = "#27ae60" if prediction.lower() == "healthy" else "#e74c3c"
+    st.markdown(f"<div style='margin-top:1em;font-size:1.3rem;font-weight:bold;'>{label}: <span style='color:{color};'>{prediction}</span></div>", unsafe_allow_html=True)
+
 if 'image_file' in locals() and image_file:
-    predict_clicked = st.button("Predict")
-    if predict_clicked:
+    contents = image_file.getvalue()
+    col_predict, col_all = st.columns(2)
+    predict_clicked = col_predict.button("Predict")
+    predict_all_clicked = col_all.button("Predict with all models")
+    # A prediction already made for this image and model is shown on every rerun without a request
+    result = client.cached(contents, selected_display_name)
+    if predict_clicked or predict_all_clicked:
         with st.spinner("Predicting..."):
             try:
-                image_file.seek(0)
-                files = {"file": (image_file.name, image_file, image_file.type)}
-                data = {"model_name": selected_display_name}
-                resp = requests.post(f"{API_URL}/predict", files=files, data=data)
-                try:
-                    resp.raise_for_status()
-                except Exception:
-                    st.error(f"Backend error: {resp.text}")
-                    raise
-                result = resp.json()
-                pred = result['prediction']
-                color = "#27ae60" if pred.lower() == "healthy" else "#e74c3c"
-                st.markdown(f"<div style='margin-top:1em;font-size:1.3rem;font-weight:bold;'>Prediction: <span style='color:{color};'>{pred}</span></div>", unsafe_allow_html=True)
+                if predict_all_clicked:
+                    ensemble = client.predict_all(contents)
+                    show_prediction(f"Majority vote ({len(ensemble['models'])} models)", ensemble["prediction"])
+                    st.table({name: {"Prediction": r["prediction"],
+                                     **{f"P({label})": f"{p:.2%}" for label, p in (r["probabilities"] or {}).items()}}
+                              for name, r in ensemble["models"].items()})
+                    result = None
+                else:
+                    result = client.predict(contents, selected_display_name)
             except Exception as e:
                 st.error(f"Prediction failed: {e}")
+    if result is not None:
+        show_prediction("Prediction", result["prediction"])
@@ -0,0 +1,139 @@
+"""
+HTTP client used by the Streamlit UI.
+
+One client is kept per browser session. It reuses a pooled connection to the
+API and reduces each upload once to what the server would compute from it
+anyway: the grayscale image at the models' input size, encoded as PNG. This
+makes a phone photo of a few MB into a few KB with the same prediction.
+Predictions are remembered per (image hash, model, model version), so reruns
+and switching back to a model do not go over the network. `predict_all` asks
+every model in one /predict/ensemble round trip.
+"""
+import os
+import json
+import hashlib
+from collections import OrderedDict
+import cv2
+import requests
+from src.preprocessing.image_decoding import decode_image, ImageTooLarge
+
+# Config
+API_URL = os.getenv("API_URL", "http://localhost:8000")
+API_TIMEOUT_SECONDS = float(os.getenv("API_TIMEOUT_SECONDS", "30"))
+UI_CACHE_SIZE = int(os.getenv("UI_CACHE_SIZE", "256"))
+# Input size of models whose metrics.json entry predates the "features" description
+DEFAULT_IMAGE_SIZE = (200, 200)
+
+
+def image_hash(contents):
+    return hashlib.sha256(contents).hexdigest()
+
+
+def model_version(entry):
+    """Fingerprint of a model's metrics.json entry, which changes whenever the model is retrained."""
+    return hashlib.sha1(json.dumps(entry, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def input_size(models):
+    """
+    The (width, height) every listed model resizes its input to, or None if they differ.
+    `models` is the mapping served by GET /models.
+    """
+    sizes = {tuple(((entry.get("features") or {}).get("params") or {}).get("image_size", DEFAULT_IMAGE_SIZE))
+             for entry in models.values()}
+    return sizes.pop() if len(sizes) == 1 else None
+
+
+def prepare_image(contents, image_size=None):
+    """
+    Re-encode an uploaded image as the grayscale PNG the server would preprocess it into.
+
+    The image is decoded (at a reduced scale for large photos) and converted to grayscale
+    exactly as HogFilter does and, given the models' `image_size`, resized with the same
+    interpolation. The server's own conversion and resize then leave it unchanged, so
+    predictions are identical to those for the original upload. Returns the original bytes
+    if the image cannot be decoded or is over the size limits, so the API reports the error
+    as before.
+    """
+    try:
+        image = decode_image(contents, image_size)
+    except ImageTooLarge:
+        return contents
+    if image is None:
+        return contents
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    if image_size is not None:
+        image = cv2.resize(image, tuple(image_size))
+    ok, encoded = cv2.imencode(".png", image, [cv2.IMWRITE_PNG_COMPRESSION, 9])
+    return encoded.tobytes() if ok and encoded.nbytes < len(contents) else contents
+
+
+class ApiClient:
+    """Pooled API session with client-side image reduction and a per-session prediction cache."""
+    def __init__(self, api_url=API_URL, timeout=API_TIMEOUT_SECONDS, cache_size=UI_CACHE_SIZE, session=None):
+        self.api_url = api_url.rstrip("/")
+        self.timeout = timeout
+        self.cache_size = max(1, cache_size)
+        self.session = session or requests.Session()
+        self.models = {}
+        self._uploads = OrderedDict()
+        self._predictions = OrderedDict()
+
+    def _remember(self, cache, key, value):
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > self.cache_size:
+            cache.popitem(last=False)
+
+    def _post(self, path, contents, data):
+        resp = self.session.post(f"{self.api_url}{path}", files={"file": ("drawing.png", contents, "image/png")},
+                                 data=data, timeout=self.timeout)
+        if resp.status_code != 200:
+            raise RuntimeError(f"Backend error: {resp.text}")
+        return resp.json()
+
+    def get_models(self):
+        """Fetch the models and their metrics from GET /models."""
+        resp = self.session.get(f"{self.api_url}/models", timeout=self.timeout)
+        resp.raise_for_status()
+        self.models = resp.json()["models"]
+        return self.models
+
+    def upload(self, contents):
+        """(hash of the original image, reduced bytes to send), reducing each image only once."""
+        digest = image_hash(contents)
+        image_size = input_size(self.models) if self.models else None
+        prepared = self._uploads.get((digest, image_size))
+        if prepared is None:
+            prepared = prepare_image(contents, image_size)
+        self._remember(self._uploads, (digest, image_size), prepared)
+        return digest, prepared
+
+    def cached(self, contents, model_name):
+        """The cached prediction of `model_name` for this image, or None."""
+        return self._predictions.get((image_hash(contents), model_name, model_version(self.models.get(model_name))))
+
+    def predict(self, contents, model_name):
+        """Label predicted by one model, from the cache when this image was already sent."""
+        digest, prepared = self.upload(contents)
+        key = (digest, model_name, model_version(self.models.get(model_name)))
+        if key not in self._predictions:
+            result = self._post("/predict", prepared, {"model_name": model_name})
+            self._remember(self._predictions, key, {"prediction": result["prediction"], "probabilities": None})
+        return self._predictions[key]
+
+    def predict_all(self, contents, model_names=None):
+        """
+        Every model's prediction and their majority vote, in one /predict/ensemble round trip.
+        The per-model results also fill the cache used by `predict`.
+        """
+        digest, prepared = self.upload(contents)
+        model_names = list(model_names or self.models)
+        key = (digest, tuple(model_names), tuple(model_version(self.models.get(name)) for name in model_names))
+        if key not in self._predictions:
+            result = self._post("/predict/ensemble", prepared, {"model_names": model_names})
+            for name, model_result in result["models"].items():
+                self._remember(self._predictions, (digest, name, model_version(self.models.get(name))), model_result)
+            self._remember(self._predictions, key, result)
+        return self._predictions[key]
@@ -1,24 +1,30 @@
-import random
 import os
+import sys
+import json
 import shutil
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 from numpy import ndarray
+import cv2
 import skimage as sk
-from skimage import io
 from skimage import transform
 from skimage import util
 from skimage import img_as_ubyte, img_as_uint
 import warnings
+from src.preprocessing.feature_store import file_hash
 
-warnings.filterwarnings("ignore")
-
-def random_rotation(image_array: ndarray):
-    random_degree = random.uniform(-25, 25)
+# Transforms take an optional NumPy Generator so a run can be reproduced exactly
+def random_rotation(image_array: ndarray, rng=None):
+    rng = rng if rng is not None else np.random.default_rng()
+    random_degree = rng.uniform(-25, 25)
     return sk.transform.rotate(image_array, random_degree)
 
-def random_noise(image_array: ndarray):
-    return sk.util.random_noise(image_array)
+def random_noise(image_array: ndarray, rng=None):
+    return sk.util.random_noise(image_array, rng=rng)
 
-def horizontal_flip(image_array: ndarray):
+def horizontal_flip(image_array: ndarray, rng=None):
     return image_array[:, ::-1]
 
 # Set the base directories
@@ -28,6 +34,11 @@ PROCESSED_BASE = os.path.join(os.path.dirname(__file__), '../../data/processed')
 # Supported image extensions
 IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.Jpeg', '.JPG', '.PNG')
 
+# Base seed; each image and transform gets its own seed derived from it and the image contents
+AUGMENTATION_SEED = int(os.getenv("AUGMENTATION_SEED", "42"))
+# Records which raw images (by content hash) have been copied and augmented, and with what settings
+MANIFEST_FILE = ".augmentation_manifest.json"
+
 # Dictionary of transformation functions
 available_transformations = {
     'rotate': random_rotation,
@@ -43,12 +54,21 @@ def get_all_image_files(base_folder):
                 image_files.append(os.path.join(dirpath, file))
     return image_files
 
-def get_processed_path(raw_path):
+def get_processed_path(raw_path, raw_base=RAW_BASE, processed_base=PROCESSED_BASE):
     # Replace 'raw' with 'processed' in the path
-    rel_path = os.path.relpath(raw_path, RAW_BASE)
-    processed_path = os.path.join(PROCESSED_BASE, rel_path)
+    rel_path = os.path.relpath(raw_path, raw_base)
+    processed_path = os.path.join(processed_base, rel_path)
     return processed_path
 
+def augmented_file_name(raw_path, transformation_name):
+    orig_filename = os.path.splitext(os.path.basename(raw_path))[0]
+    return f"AUG_{transformation_name}_{orig_filename}.png"
+
+def transform_seed(content_hash, transformation_name, seed=AUGMENTATION_SEED):
+    """Seed for one transform of one image: the same image, transform and base seed always give the same output."""
+    digest = hashlib.sha1(f"{seed}:{transformation_name}:{content_hash}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "little")
+
 def copy_raw_to_processed():
     """
     Copy the entire raw data folder structure and files to processed, preserving structure.
@@ -69,38 +89,171 @@ def clear_processed_folder():
         shutil.rmtree(PROCESSED_BASE)
     os.makedirs(PROCESSED_BASE, exist_ok=True)
 
-def augment_and_save():
-    images = get_all_image_files(RAW_BASE)
-    print(f"Found {len(images)} images to augment.")
-    folder_counts = {}
-    for image_path in images:
-        try:
-            image_to_transform = io.imread(image_path)
-        except Exception as e:
-            continue
-        orig_filename = os.path.splitext(os.path.basename(image_path))[0]
-        processed_file_path = get_processed_path(image_path)
-        processed_dir = os.path.dirname(processed_file_path)
-        os.makedirs(processed_dir, exist_ok=True)
-        for transformation_name, transformation_func in available_transformations.items():
-            transformed_image = transformation_func(image_to_transform)
-            new_file = f"AUG_{transformation_name}_{orig_filename}.png"
-            new_file_path = os.path.join(processed_dir, new_file)
-            try:
-                io.imsave(new_file_path, img_as_ubyte(transformed_image))
-                # Count per folder
-                folder_key = os.path.relpath(processed_dir, PROCESSED_BASE)
-                folder_counts[folder_key] = folder_counts.get(folder_key, 0) + 1
-            except Exception as e:
-                pass
+def augmented_variants(image, content_hash, transformation_names=None, seed=AUGMENTATION_SEED):
+    """
+    Yield (name, uint8 image) for each transform applied to `image` in memory.
+
+    Seeds come from `transform_seed`, so the variants are exactly the images
+    `augment_and_save` writes to disk for the same raw file.
+    """
+    for name in transformation_names or available_transformations:
+        rng = np.random.default_rng(transform_seed(content_hash, name, seed))
+        # Silence skimage's float/precision-loss warnings for this conversion only, not the caller's warnings
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            variant = img_as_ubyte(available_transformations[name](image, rng=rng))
+        yield name, variant
+
+def _augment_image(raw_path, processed_dir, content_hash, transformation_names, seed):
+    """Copy one raw image and write its augmented variants. Runs in a worker process."""
+    os.makedirs(processed_dir, exist_ok=True)
+    shutil.copy2(raw_path, os.path.join(processed_dir, os.path.basename(raw_path)))
+    image = cv2.imread(raw_path, cv2.IMREAD_UNCHANGED)
+    if image is None:
+        return raw_path, None
+    outputs = []
+    for name, transformed in augmented_variants(image, content_hash, transformation_names, seed):
+        out_path = os.path.join(processed_dir, augmented_file_name(raw_path, name))
+        if cv2.imwrite(out_path, transformed):
+            outputs.append(os.path.basename(out_path))
+    return raw_path, outputs
+
+def load_manifest(processed_base=PROCESSED_BASE):
+    try:
+        with open(os.path.join(processed_base, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(manifest, processed_base=PROCESSED_BASE):
+    path = os.path.join(processed_base, MANIFEST_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+def plan_augmentation(raw_base=RAW_BASE, processed_base=PROCESSED_BASE, transformation_names=None,
+                      seed=AUGMENTATION_SEED, manifest=None):
+    """
+    Compare the raw images against the manifest.
+
+    Returns (todo, removed, unchanged, hashes): raw paths that are new, changed or
+    were augmented with other settings; manifest entries whose raw image is gone;
+    the number of images already up to date; and the content hash of every raw image.
+    """
+    transformation_names = list(transformation_names or available_transformations)
+    manifest = load_manifest(processed_base) if manifest is None else manifest
+    hashes = {}
+    todo = []
+    unchanged = 0
+    for raw_path in sorted(get_all_image_files(raw_base)):
+        rel_path = os.path.relpath(raw_path, raw_base)
+        hashes[rel_path] = file_hash(raw_path)
+        entry = manifest.get(rel_path)
+        processed_dir = os.path.dirname(get_processed_path(raw_path, raw_base, processed_base))
+        up_to_date = (entry is not None and entry["hash"] == hashes[rel_path]
+                      and entry["transforms"] == transformation_names and entry["seed"] == seed
+                      and all(os.path.exists(os.path.join(processed_dir, out)) for out in entry["outputs"]))
+        if up_to_date:
+            unchanged += 1
+        else:
+            todo.append(raw_path)
+    removed = [rel_path for rel_path in manifest if rel_path not in hashes]
+    return todo, removed, unchanged, hashes
+
+def augment_and_save(raw_base=RAW_BASE, processed_base=PROCESSED_BASE, transformation_names=None,
+                     seed=AUGMENTATION_SEED, n_jobs=-1, dry_run=False):
+    """
+    Incrementally copy raw images to processed and write their augmented variants.
+
+    Only raw images that are new or changed since the last run (by content hash),
+    or that were augmented with a different transform list or seed, are processed;
+    outputs of raw images that no longer exist are deleted. Images are processed
+    in parallel on `n_jobs` processes (-1 means all cores) with per-image seeds, so
+    the output does not depend on the number of workers. With `dry_run`, only
+    reports what would be done. Returns a summary dict.
+    """
+    transformation_names = list(transformation_names or available_transformations)
+    unknown = set(transformation_names) - set(available_transformations)
+    if unknown:
+        raise ValueError(f"Unknown transformations: {sorted(unknown)}. Choose from: {list(available_transformations.keys())}")
+    manifest = load_manifest(processed_base)
+    todo, removed, unchanged, hashes = plan_augmentation(raw_base, processed_base, transformation_names, seed, manifest)
+    summary = {"found": len(hashes), "to_process": len(todo), "unchanged": unchanged, "removed": len(removed),
+               "per_folder": {}}
+    for raw_path in todo:
+        folder = os.path.relpath(os.path.dirname(raw_path), raw_base)
+        summary["per_folder"][folder] = summary["per_folder"].get(folder, 0) + len(transformation_names)
+    print(f"Found {len(hashes)} images: {len(todo)} to augment, {unchanged} up to date, {len(removed)} removed.")
+    if dry_run:
+        return summary
+
+    for rel_path in removed:
+        processed_dir = os.path.dirname(os.path.join(processed_base, rel_path))
+        for name in manifest[rel_path]["outputs"] + [os.path.basename(rel_path)]:
+            path = os.path.join(processed_dir, name)
+            if os.path.exists(path):
+                os.remove(path)
+        del manifest[rel_path]
+
+    tasks = []
+    for raw_path in todo:
+        rel_path = os.path.relpath(raw_path, raw_base)
+        processed_dir = os.path.dirname(get_processed_path(raw_path, raw_base, processed_base))
+        # Outputs of a transform that is no longer configured are stale
+        for name in manifest.get(rel_path, {}).get("outputs", []):
+            path = os.path.join(processed_dir, name)
+            if os.path.exists(path):
+                os.remove(path)
+        tasks.append((raw_path, processed_dir, hashes[rel_path], transformation_names, seed))
+
+    n_jobs = (os.cpu_count() or 1) if n_jobs == -1 else max(1, n_jobs)
+    created = 0
+    os.makedirs(processed_base, exist_ok=True)
+    if n_jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(n_jobs, len(tasks))) as executor:
+            results = executor.map(_augment_image, *zip(*tasks), chunksize=8)
+            created = _record_results(results, manifest, hashes, raw_base, transformation_names, seed, len(tasks))
+    else:
+        results = (_augment_image(*task) for task in tasks)
+        created = _record_results(results, manifest, hashes, raw_base, transformation_names, seed, len(tasks))
+    save_manifest(manifest, processed_base)
+    summary["created"] = created
     print("\nSummary of images created (per folder):")
-    for folder, count in folder_counts.items():
+    for folder, count in summary["per_folder"].items():
         print(f"{folder}: {count} images")
+    return summary
 
-if __name__ == "__main__":
-    print("Clearing processed folder...")
-    clear_processed_folder()
-    print("Copying raw data to processed folder...")
-    copy_raw_to_processed()
+def _record_results(results, manifest, hashes, raw_base, transformation_names, seed, total):
+    created = 0
+    for done, (raw_path, outputs) in enumerate(results, 1):
+        rel_path = os.path.relpath(raw_path, raw_base)
+        if outputs is None:
+            print(f"[WARN] Could not read {raw_path}")
+            continue
+        manifest[rel_path] = {"hash": hashes[rel_path], "transforms": transformation_names, "seed": seed,
+                              "outputs": outputs}
+        created += len(outputs)
+        if done % 100 == 0 or done == total:
+            print(f"[INFO] augmented {done}/{total}")
+    return created
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy raw images to data/processed and write augmented variants.")
+    parser.add_argument('--transforms', nargs='+', default=list(available_transformations),
+                        choices=list(available_transformations), help='Transformations to apply.')
+    parser.add_argument('--jobs', type=int, default=-1, help='Worker processes (-1 = all cores).')
+    parser.add_argument('--seed', type=int, default=AUGMENTATION_SEED, help='Base random seed.')
+    parser.add_argument('--dry-run', action='store_true', help='Only report what would be augmented.')
+    parser.add_argument('--full', action='store_true', help='Clear data/processed and regenerate everything.')
+    args = parser.parse_args()
+    if args.full and not args.dry_run:
+        print("Clearing processed folder...")
+        clear_processed_folder()
     print("Starting augmentation...")
-    augment_and_save()
+    augment_and_save(transformation_names=args.transforms, seed=args.seed, n_jobs=args.jobs, dry_run=args.dry_run)
+    if not args.dry_run:
+        # Non-image files (if any) are mirrored as before
+        copy_raw_to_processed()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,17 @@
 import os
 import json
 
-def save_model_metrics(display_name, metrics, model_path, metrics_file=None):
+def model_entry(metrics, model_path, model_info=None):
+    """The metrics.json entry for one model: its metrics, serving metadata and pickle file name."""
+    entry = dict(metrics)
+    entry.update(model_info or {})
+    entry["pickle_file"] = os.path.basename(model_path)
+    return entry
+
+def update_metrics_file(entries, metrics_file=None):
     """
-    Save or update metrics for a model in a consolidated metrics.json file.
-    Args:
-        display_name (str): The display name for the model (used as the key in metrics.json).
-        metrics (dict): Dictionary of metrics to save.
-        model_path (str): Path to the model pickle file (or just the file name).
-        metrics_file (str, optional): Path to the consolidated metrics file. Defaults to 'models/metrics.json'.
+    Merge {display_name: entry} into the consolidated metrics file in a single atomic write,
+    so readers such as the API's model watcher never see a partially updated file.
     """
     if metrics_file is None:
         metrics_file = os.path.join("models", "metrics.json")
@@ -17,9 +20,22 @@ def save_model_metrics(display_name, metrics, model_path, metrics_file=None):
             all_metrics = json.load(f)
     else:
         all_metrics = {}
-    metrics_to_save = dict(metrics)
-    metrics_to_save["pickle_file"] = os.path.basename(model_path)
-    all_metrics[display_name] = metrics_to_save
-    with open(metrics_file, "w") as f:
+    all_metrics.update(entries)
+    tmp_file = metrics_file + ".tmp"
+    with open(tmp_file, "w") as f:
         json.dump(all_metrics, f, indent=2)
+    os.replace(tmp_file, metrics_file)
     print(f"[INFO] Metrics saved/updated in {metrics_file}")
+
+def save_model_metrics(display_name, metrics, model_path, metrics_file=None, model_info=None):
+    """
+    Save or update metrics for a model in a consolidated metrics.json file.
+    Args:
+        display_name (str): The display name for the model (used as the key in metrics.json).
+        metrics (dict): Dictionary of metrics to save.
+        model_path (str): Path to the model pickle file (or just the file name).
+        metrics_file (str, optional): Path to the consolidated metrics file. Defaults to 'models/metrics.json'.
+        model_info (dict, optional): Serving metadata stored with the metrics, e.g. the model
+            "backend" and the "features" description from HogFilter.describe().
+    """
+    update_metrics_file({display_name: model_entry(metrics, model_path, model_info)}, metrics_file)
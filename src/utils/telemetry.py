@@ -0,0 +1,193 @@
+"""
+Lightweight Prometheus-style metrics for the prediction path.
+
+Counters, gauges and histograms are kept in process memory and rendered in the
+Prometheus text exposition format by `render()`. Recording a sample is a dict
+lookup and a few additions under a lock, so the instrumentation is cheap enough
+to leave on; set PROMETHEUS_METRICS=false to turn it into a no-op.
+
+Stage timings are labelled with the model being served, taken from a context
+variable set with `model_context`, so model-agnostic code such as HogFilter
+does not need to know which model it is featurizing for. Samples recorded
+inside a process-based inference pool stay in the worker processes.
+"""
+import os
+import time
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager
+
+METRICS_ENABLED = os.getenv("PROMETHEUS_METRICS", "true").lower() in ("1", "true", "yes")
+
+# Latency buckets in seconds, from sub-millisecond featurization to multi-second model loads
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current_model = contextvars.ContextVar("current_model", default="")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _render_sample(self, key, value):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount=1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # per-bucket (non-cumulative) counts, plus +Inf, sum and count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _render_sample(self, key, state):
+        counts, total, count = state
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.buckets + (float("inf"),), counts):
+            cumulative += n
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            labels = _format_labels(self.labelnames + ("le",), key + (le,))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {total}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+# Metrics for the prediction path
+STAGE_SECONDS = Histogram("pd_stage_duration_seconds",
+    "Time spent in each stage of the prediction path.", ("stage", "model"))
+REQUESTS = Counter("pd_requests_total", "Prediction requests received.", ("endpoint", "model"))
+REQUEST_ERRORS = Counter("pd_request_errors_total", "Prediction requests that failed.", ("endpoint", "model", "status"))
+IN_FLIGHT = Gauge("pd_requests_in_flight", "Prediction requests currently being handled.", ("endpoint",))
+# Gauges refreshed from component stats when /metrics is scraped
+COMPONENT_STATS = Gauge("pd_component_stat", "Model cache, inference pool and batching statistics.", ("component", "stat"))
+
+ALL_METRICS = [STAGE_SECONDS, REQUESTS, REQUEST_ERRORS, IN_FLIGHT, COMPONENT_STATS]
+
+
+@contextmanager
+def model_context(model):
+    """Label stage timings recorded inside this block with `model`."""
+    token = _current_model.set(model)
+    try:
+        yield
+    finally:
+        _current_model.reset(token)
+
+
+@contextmanager
+def timed(stage, model=None):
+    """Record the duration of the enclosed block in the stage histogram."""
+    if not METRICS_ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage,
+                              model=model if model is not None else _current_model.get())
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in ALL_METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def process_memory(pid="self"):
+    """
+    Memory of a process in MiB from /proc/<pid>/smaps_rollup (Linux): "rss", "pss"
+    (RSS with shared pages split between the processes mapping them), "shared"
+    and "private". Returns None where that file is unavailable.
+    """
+    fields = {"Rss": "rss", "Pss": "pss", "Shared_Clean": "shared", "Shared_Dirty": "shared",
+              "Private_Clean": "private", "Private_Dirty": "private"}
+    memory = {"rss": 0.0, "pss": 0.0, "shared": 0.0, "private": 0.0}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                name, _, rest = line.partition(":")
+                if name in fields:
+                    memory[fields[name]] += int(rest.split()[0]) / 1024
+    except (OSError, ValueError):
+        return None
+    return {name: round(value, 1) for name, value in memory.items()}
@@ -0,0 +1,39 @@
+import os
+import sys
+import cv2
+import pytest
+
+# Ensure the project root is in sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from fastapi.testclient import TestClient
+from src.api import endpoints, inference_pool
+from src.api.main import app
+from src.predictions import model_registry, prediction_cache
+from src.predictions.model_registry import ModelRegistry
+from src.predictions.prediction_cache import PredictionCache
+from tests.helpers.synthetic_models import drawing, train
+
+def png(seed):
+    return cv2.imencode(".png", drawing(seed))[1].tobytes()
+
+@pytest.fixture
+def models_dir(tmp_path):
+    train(str(tmp_path))
+    return str(tmp_path)
+
+@pytest.fixture
+def registry(models_dir, monkeypatch):
+    """A fresh process-wide registry, prediction cache and inference pool serving `models_dir`."""
+    registry = ModelRegistry(models_dir=models_dir)
+    registry.load_metrics()
+    monkeypatch.setattr(model_registry, "_registry", registry)
+    monkeypatch.setattr(prediction_cache, "_cache", PredictionCache())
+    monkeypatch.setattr(inference_pool, "_pool", None)
+    monkeypatch.setattr(endpoints, "_readiness", {"ready": False, "startup_seconds": {}})
+    return registry
+
+@pytest.fixture
+def client(registry):
+    with TestClient(app) as client:
+        yield client
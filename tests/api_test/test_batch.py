@@ -0,0 +1,85 @@
+import io
+import asyncio
+import zipfile
+from conftest import png
+from src.api import endpoints
+
+def zipped(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, contents in members.items():
+            archive.writestr(name, contents)
+    return buffer.getvalue()
+
+def post_batch(client, files):
+    return client.post("/predict/batch", files=[("files", f) for f in files], data={"model_name": "Random Forest"})
+
+def test_batch_of_images_and_zip(client):
+    archive = zipped({"a.png": png(600), "b.png": png(601), "notes.txt": b"not an image"})
+    resp = post_batch(client, [("c.png", png(602), "image/png"), ("drawings.zip", archive, "application/zip")])
+    assert resp.status_code == 200
+    results = {r["filename"]: r for r in resp.json()["results"]}
+    assert set(results) == {"c.png", "a.png", "b.png", "notes.txt"}
+    assert all(results[name]["prediction"] in ("Healthy", "Parkinson") for name in ("a.png", "b.png", "c.png"))
+    assert results["notes.txt"]["error"] == "Only PNG and JPG images are supported."
+
+def test_zip_is_unpacked_off_the_event_loop(client, monkeypatch):
+    loops = []
+    original = endpoints._unpack_uploads
+    def unpack(uploads):
+        try:
+            loops.append(asyncio.get_running_loop())
+        except RuntimeError:
+            loops.append(None)
+        return original(uploads)
+    monkeypatch.setattr(endpoints, "_unpack_uploads", unpack)
+    assert post_batch(client, [("drawings.zip", zipped({"a.png": png(603)}), "application/zip")]).status_code == 200
+    assert loops == [None]
+
+def spy_zip_reads(monkeypatch):
+    reads = []
+    original = zipfile.ZipFile.read
+    monkeypatch.setattr(zipfile.ZipFile, "read", lambda self, name, *args: reads.append(getattr(name, "filename", name))
+                        or original(self, name, *args))
+    return reads
+
+def test_zip_with_too_many_members_is_rejected_before_reading(client, monkeypatch):
+    monkeypatch.setattr(endpoints, "MAX_BATCH_SIZE", 3)
+    reads = spy_zip_reads(monkeypatch)
+    archive = zipped({f"{i}.png": png(610) for i in range(3)})
+    resp = post_batch(client, [("c.png", png(611), "image/png"), ("drawings.zip", archive, "application/zip")])
+    assert resp.status_code == 413
+    assert reads == []
+
+def test_oversized_zip_member_gets_an_error_without_being_read(client, monkeypatch):
+    small, large = png(612), png(613) + b"\0" * 10000
+    monkeypatch.setattr(endpoints, "MAX_IMAGE_BYTES", len(small) + 100)
+    reads = spy_zip_reads(monkeypatch)
+    resp = post_batch(client, [("drawings.zip", zipped({"small.png": small, "large.png": large}), "application/zip")])
+    assert resp.status_code == 200
+    results = {r["filename"]: r for r in resp.json()["results"]}
+    assert results["small.png"]["prediction"] in ("Healthy", "Parkinson")
+    assert results["large.png"]["prediction"] is None and "limit" in results["large.png"]["error"]
+    assert reads == ["small.png"]
+
+def test_oversized_zip_upload_is_rejected(client, monkeypatch):
+    archive = zipped({"a.png": png(614), "b.png": png(615)})
+    monkeypatch.setattr(endpoints, "MAX_ARCHIVE_BYTES", len(archive) - 1)
+    reads = spy_zip_reads(monkeypatch)
+    resp = post_batch(client, [("drawings.zip", archive, "application/zip")])
+    assert resp.status_code == 413
+    assert reads == []
+
+def test_zip_decompressing_past_the_total_limit_is_rejected_before_reading(client, monkeypatch):
+    # Each member is within MAX_IMAGE_BYTES, and the compressed archive is small
+    members = {f"{i}.png": png(616) + b"\0" * 100000 for i in range(4)}
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as z:
+        for name, contents in members.items():
+            z.writestr(name, contents)
+    monkeypatch.setattr(endpoints, "MAX_ARCHIVE_UNCOMPRESSED_BYTES", 300000)
+    reads = spy_zip_reads(monkeypatch)
+    resp = post_batch(client, [("drawings.zip", archive.getvalue(), "application/zip")])
+    assert resp.status_code == 413
+    assert "decompress" in resp.json()["detail"]
+    assert reads == []
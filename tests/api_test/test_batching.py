@@ -0,0 +1,49 @@
+import asyncio
+import numpy as np
+from src.api.batching import MicroBatcher
+from src.api.inference_pool import InferencePool
+
+def run_batcher(max_batch_size, max_wait_ms, values, model_keys=None):
+    """Submit one feature vector per value concurrently; return (labels, classify calls, stats)."""
+    calls = []
+    def classify(model_key, X):
+        calls.append((model_key, len(X)))
+        # The "label" is the request's own feature value, so mix-ups are visible
+        return [f"{model_key}:{int(row[0])}" for row in X]
+    pool = InferencePool(max_workers=1, max_queue=8, kind="thread")
+    batcher = MicroBatcher(lambda: pool, classify, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    model_keys = model_keys or ["RandomForest"] * len(values)
+
+    async def main():
+        return await asyncio.gather(*(batcher.predict(key, np.array([[value, 0.0]]))
+                                      for key, value in zip(model_keys, values)))
+    try:
+        labels = asyncio.run(main())
+    finally:
+        pool.shutdown()
+    return labels, calls, batcher.stats()
+
+def test_concurrent_requests_share_one_call_and_get_their_own_result():
+    labels, calls, stats = run_batcher(max_batch_size=16, max_wait_ms=50, values=range(5))
+    assert calls == [("RandomForest", 5)]
+    assert labels == [f"RandomForest:{i}" for i in range(5)]
+    assert stats["batches"] == 1 and stats["items"] == 5
+
+def test_batch_flushes_when_full():
+    # The wait is far longer than the test; only the size limit can flush
+    labels, calls, stats = run_batcher(max_batch_size=4, max_wait_ms=60000, values=range(8))
+    assert calls == [("RandomForest", 4), ("RandomForest", 4)]
+    assert labels == [f"RandomForest:{i}" for i in range(8)]
+    assert stats["batch_size_counts"] == {4: 2}
+
+def test_partial_batch_flushes_after_max_wait():
+    labels, calls, stats = run_batcher(max_batch_size=16, max_wait_ms=20, values=range(3))
+    assert calls == [("RandomForest", 3)]
+    assert labels == [f"RandomForest:{i}" for i in range(3)]
+    assert stats["added_latency_ms"]["max"] >= 15
+
+def test_models_are_batched_separately():
+    labels, calls, _ = run_batcher(max_batch_size=16, max_wait_ms=20, values=range(4),
+                                   model_keys=["KNN", "LinearSVM", "KNN", "LinearSVM"])
+    assert sorted(calls) == [("KNN", 2), ("LinearSVM", 2)]
+    assert labels == ["KNN:0", "LinearSVM:1", "KNN:2", "LinearSVM:3"]
@@ -0,0 +1,19 @@
+from conftest import png
+from src.api.inference_pool import get_inference_pool
+
+def test_ensemble_takes_one_admission_slot(client):
+    pool = get_inference_pool()
+    # Room for exactly one more job: featurizing plus one job per model would be rejected
+    pool._in_flight = pool.capacity - 1
+    try:
+        resp = client.post("/predict/ensemble", files={"file": ("drawing.png", png(500), "image/png")})
+    finally:
+        pool._in_flight = 0
+    assert resp.status_code == 200
+    result = resp.json()
+    assert set(result["models"]) == {"Linear SVM", "Random Forest", "K-Nearest Neighbors"}
+    assert pool.stats()["completed"] == 1 and pool.stats()["rejected"] == 0
+    for name, model_result in result["models"].items():
+        single = client.post("/predict", files={"file": ("drawing.png", png(500), "image/png")}, data={"model_name": name})
+        assert single.json()["prediction"] == model_result["prediction"]
+    assert sum(result["votes"].values()) == 3
@@ -0,0 +1,35 @@
+import re
+from conftest import png
+
+def samples(client):
+    """{metric name with labels: value} from GET /metrics."""
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    return {line.rsplit(" ", 1)[0]: float(line.rsplit(" ", 1)[1])
+            for line in resp.text.splitlines() if line and not line.startswith("#")}
+
+def test_metrics_report_stages_and_requests_per_model_key(client):
+    before = samples(client)
+    requests_key = 'pd_requests_total{endpoint="predict",model="RandomForest"}'
+    errors_key = 'pd_request_errors_total{endpoint="predict",model="RandomForest",status="400"}'
+    resp = client.post("/predict", files={"file": ("drawing.png", png(200), "image/png")}, data={"model_name": "Random Forest"})
+    assert resp.status_code == 200
+    client.post("/predict", files={"file": ("drawing.png", b"not an image", "image/png")}, data={"model_name": "Random Forest"})
+    after = samples(client)
+
+    assert after[requests_key] - before.get(requests_key, 0) == 2
+    assert after[errors_key] - before.get(errors_key, 0) == 1
+    for stage in ("model_load", "upload_read", "validation", "decode", "preprocess", "hog", "inference"):
+        assert after[f'pd_stage_duration_seconds_count{{stage="{stage}",model="RandomForest"}}'] >= 1, stage
+        assert f'pd_stage_duration_seconds_bucket{{stage="{stage}",model="RandomForest",le="+Inf"}}' in after
+    # Every stage of this model is labelled with its key, never the pickle file name
+    assert not any('model="model_RandomForest.pkl"' in name for name in after)
+    assert after['pd_requests_in_flight{endpoint="predict"}'] == 0
+    assert any(re.match(r'pd_component_stat\{component="inference_pool",stat="completed"\}', name) for name in after)
+
+def test_batch_validation_is_labelled_with_the_model(client):
+    resp = client.post("/predict/batch", files=[("files", ("drawing.png", png(201), "image/png"))],
+                       data={"model_name": "Random Forest"})
+    assert resp.status_code == 200
+    assert 'stage="validation",model="RandomForest"' in client.get("/metrics").text
+    assert 'stage="validation",model=""' not in client.get("/metrics").text
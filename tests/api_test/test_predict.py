@@ -0,0 +1,59 @@
+import struct
+import zlib
+from conftest import png
+from src.api.inference_pool import get_inference_pool
+
+def test_predict(client):
+    resp = client.post("/predict", files={"file": ("drawing.png", png(100), "image/png")},
+                       data={"model_name": "Random Forest"})
+    assert resp.status_code == 200
+    assert resp.json()["prediction"] in ("Healthy", "Parkinson")
+
+def test_saturated_pool_answers_503_with_retry_after(client):
+    pool = get_inference_pool()
+    pool._in_flight = pool.capacity
+    try:
+        resp = client.post("/predict", files={"file": ("drawing.png", png(101), "image/png")},
+                           data={"model_name": "Random Forest"})
+    finally:
+        pool._in_flight = 0
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == "1"
+    assert pool.stats()["rejected"] == 1
+
+def test_rejected_uploads(client):
+    def post(name, contents, model_name="Random Forest"):
+        return client.post("/predict", files={"file": (name, contents, "image/png")}, data={"model_name": model_name})
+    assert post("drawing.png", png(102), model_name="Unknown").status_code == 400
+    assert post("drawing.gif", png(102)).status_code == 400
+    assert post("drawing.png", b"not an image").status_code == 400
+    # A few bytes declaring a 60000x60000 image are refused before anything is decoded
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    bomb = (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", 60000, 60000, 8, 0, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(b"\x00")) + chunk(b"IEND", b""))
+    resp = post("drawing.png", bomb)
+    assert resp.status_code == 413
+
+def test_repeated_upload_is_served_from_the_prediction_cache(client):
+    from src.predictions.prediction_cache import get_prediction_cache
+    def post():
+        return client.post("/predict", files={"file": ("drawing.png", png(103), "image/png")},
+                           data={"model_name": "Random Forest"}).json()
+    first = post()
+    completed = get_inference_pool().stats()["completed"]
+    assert post() == first
+    assert get_prediction_cache().stats()["hits"] == 1
+    # The cached answer never reached the inference pool
+    assert get_inference_pool().stats()["completed"] == completed
+
+def test_upload_header_is_parsed_once(client, monkeypatch):
+    from PIL import Image
+    opened = []
+    original = Image.open
+    monkeypatch.setattr(Image, "open", lambda *args, **kwargs: opened.append(1) or original(*args, **kwargs))
+    resp = client.post("/predict", files={"file": ("drawing.png", png(104), "image/png")},
+                       data={"model_name": "Random Forest"})
+    assert resp.status_code == 200
+    # Size limits and integrity are checked in one pass; decoding reuses its dimensions
+    assert len(opened) == 1
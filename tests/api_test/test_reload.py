@@ -0,0 +1,70 @@
+import os
+import json
+import time
+from conftest import png, train
+from src.api import endpoints
+from src.predictions.model_registry import ModelRegistry, ModelWatcher
+
+def predict(client, seed=300):
+    resp = client.post("/predict", files={"file": ("drawing.png", png(seed), "image/png")}, data={"model_name": "Random Forest"})
+    assert resp.status_code == 200
+    return resp.json()["prediction"]
+
+def test_reload_is_refused_without_a_configured_token(client, monkeypatch):
+    monkeypatch.setattr(endpoints, "ADMIN_TOKEN", None)
+    assert client.post("/admin/reload").status_code == 403
+    assert client.post("/admin/reload", headers={"X-Admin-Token": ""}).status_code == 403
+    monkeypatch.setattr(endpoints, "ADMIN_TOKEN", "secret")
+    assert client.post("/admin/reload", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    assert client.post("/admin/reload").status_code == 403
+
+def test_reload_swaps_in_a_retrained_pickle(client, models_dir, monkeypatch):
+    monkeypatch.setattr(endpoints, "ADMIN_TOKEN", "secret")
+    before = predict(client)
+    # Retrained with the labels swapped, so every prediction flips
+    train(models_dir, names=["Random Forest"], labels=("parkinson", "healthy"))
+    assert predict(client) == before
+    resp = client.post("/admin/reload", headers={"X-Admin-Token": "secret"})
+    assert resp.status_code == 200
+    assert resp.json()["reloaded"] == ["model_RandomForest.pkl"]
+    assert predict(client) != before
+
+def test_watcher_reloads_changed_pickles(registry, models_dir):
+    registry.preload()
+    watcher = ModelWatcher(registry, interval=0.05)
+    watcher.start()
+    try:
+        train(models_dir, names=["K-Nearest Neighbors"])
+        deadline = time.monotonic() + 5
+        while registry.stats()["reloads"] == 0 and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        watcher.stop()
+    assert registry.stats()["reloads"] == 1
+    assert not watcher._thread.is_alive()
+
+def test_reload_drops_unlisted_and_deleted_models(registry, models_dir):
+    registry.preload()
+    assert len(registry.stats()["cached_models"]) == 3
+    metrics_path = os.path.join(models_dir, "metrics.json")
+    with open(metrics_path) as f:
+        metrics = json.load(f)
+    del metrics["K-Nearest Neighbors"]
+    with open(metrics_path, "w") as f:
+        json.dump(metrics, f)
+    os.remove(os.path.join(models_dir, "model_RandomForest.pkl"))
+    assert registry.reload() == []
+    assert registry.stats()["cached_models"] == ["model_LinearSVM.pkl"]
+    assert "K-Nearest Neighbors" not in registry.metrics
+
+def test_reload_leaves_evicted_models_alone(models_dir):
+    registry = ModelRegistry(models_dir=models_dir, max_size=1)
+    registry.load_metrics()
+    registry.preload()
+    cached = registry.stats()["cached_models"]
+    assert len(cached) == 1
+    # Nothing changed on disk, so the models the LRU evicted are not reloaded over each other
+    for _ in range(3):
+        assert registry.reload() == []
+    assert registry.stats()["cached_models"] == cached
+    assert registry.stats()["reloads"] == 0
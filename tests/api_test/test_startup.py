@@ -0,0 +1,37 @@
+import os
+import subprocess
+import sys
+from fastapi.testclient import TestClient
+from conftest import png
+from src.api import endpoints
+from src.api.main import app
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'))
+
+def test_ready_only_after_warm_up(registry):
+    # Without entering the lifespan, the app is up but not warmed
+    client = TestClient(app)
+    assert client.get("/health").json() == {"status": "ok"}
+    resp = client.get("/ready")
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == "1"
+    endpoints.mark_ready({"total": 0.5})
+    resp = client.get("/ready")
+    assert resp.status_code == 200
+    assert resp.json()["startup_seconds"] == {"total": 0.5}
+
+def test_lifespan_warms_models_and_reports_startup(client, registry):
+    resp = client.get("/ready")
+    assert resp.status_code == 200
+    assert set(resp.json()["startup_seconds"]) == {"imports", "warm_up", "total"}
+    assert set(registry.stats()["cached_models"]) == {"model_LinearSVM.pkl", "model_RandomForest.pkl", "model_KNN.pkl"}
+    # Warm-up does not leave a validation sample without a model label behind
+    assert 'stage="validation",model=""' not in client.get("/metrics").text
+    client.post("/predict", files={"file": ("drawing.png", png(400), "image/png")}, data={"model_name": "Random Forest"})
+    assert registry.stats()["misses"] == 3
+
+def test_api_import_leaves_heavy_libraries_unloaded():
+    code = ("import sys, src.api.main; "
+            "print(sorted(m for m in ('sklearn', 'PIL', 'skimage', 'joblib') if m in sys.modules))")
+    out = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "[]"
@@ -0,0 +1,55 @@
+import os
+import sys
+import numpy as np
+import cv2
+
+# Ensure the project root is in sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.utils.augmentation import augment_and_save, load_manifest
+
+def write_drawings(raw_base, names, seed=0):
+    rng = np.random.default_rng(seed)
+    for name in names:
+        path = os.path.join(raw_base, "spiral", "training", "healthy", name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        image = np.full((40, 40, 3), 255, np.uint8)
+        image[rng.integers(0, 40, 60), rng.integers(0, 40, 60)] = 0
+        cv2.imwrite(path, image)
+
+def read_outputs(processed_base):
+    outputs = {}
+    for dirpath, _, filenames in os.walk(processed_base):
+        for name in filenames:
+            if name.startswith("AUG_"):
+                outputs[name] = cv2.imread(os.path.join(dirpath, name), cv2.IMREAD_UNCHANGED)
+    return outputs
+
+def test_augmentation_is_incremental(tmp_path):
+    raw, processed = str(tmp_path / "raw"), str(tmp_path / "processed")
+    write_drawings(raw, ["a.png", "b.png"])
+    summary = augment_and_save(raw, processed, n_jobs=1)
+    assert summary["created"] == 6
+    assert augment_and_save(raw, processed, n_jobs=1)["to_process"] == 0
+
+    write_drawings(raw, ["c.png"], seed=1)
+    os.remove(os.path.join(raw, "spiral", "training", "healthy", "a.png"))
+    assert augment_and_save(raw, processed, n_jobs=1, dry_run=True)["to_process"] == 1
+    summary = augment_and_save(raw, processed, n_jobs=1)
+    assert (summary["to_process"], summary["removed"]) == (1, 1)
+    assert set(load_manifest(processed)) == {os.path.join("spiral", "training", "healthy", name) for name in ("b.png", "c.png")}
+    assert "AUG_rotate_a.png" not in read_outputs(processed)
+
+    # Changing the transform list redoes every image with only the configured transforms
+    augment_and_save(raw, processed, transformation_names=["horizontal_flip"], n_jobs=1)
+    assert sorted(read_outputs(processed)) == ["AUG_horizontal_flip_b.png", "AUG_horizontal_flip_c.png"]
+
+def test_outputs_do_not_depend_on_worker_count(tmp_path):
+    raw = str(tmp_path / "raw")
+    write_drawings(raw, ["a.png", "b.png", "c.png"])
+    augment_and_save(raw, str(tmp_path / "serial"), n_jobs=1)
+    augment_and_save(raw, str(tmp_path / "parallel"), n_jobs=2)
+    serial, parallel = read_outputs(str(tmp_path / "serial")), read_outputs(str(tmp_path / "parallel"))
+    assert sorted(serial) == sorted(parallel)
+    for name in serial:
+        np.testing.assert_array_equal(serial[name], parallel[name])
@@ -0,0 +1,56 @@
+import os
+import sys
+import numpy as np
+import cv2
+from imutils import paths
+
+# Ensure the project root is in sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.utils.augmentation import augment_and_save, augmented_file_name
+from src.preprocessing.test_train_split import TestTrainSplit
+
+def write_drawings(raw_base, seed=0):
+    rng = np.random.default_rng(seed)
+    paths = []
+    for label in ("healthy", "parkinson"):
+        for i in range(3):
+            path = os.path.join(raw_base, "training", label, f"{label}_{i}.png")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            image = np.full((60, 60), 255, np.uint8)
+            image[rng.integers(0, 60, 120), rng.integers(0, 60, 120)] = 0
+            cv2.imwrite(path, image)
+            paths.append(path)
+    return paths
+
+def test_streamed_variants_match_materialized_augmentation(tmp_path):
+    raw, processed = str(tmp_path / "raw"), str(tmp_path / "processed")
+    write_drawings(raw)
+    augment_and_save(raw, processed, n_jobs=1)
+
+    splitter = TestTrainSplit()
+    data, labels = splitter.load_split_data(os.path.join(raw, "training"), augment=True)
+    assert data.shape[0] == len(labels) == 6 * 4
+    n_variants = 1 + len(splitter.transformations)
+    # Rows follow the order load_split_data lists the images in
+    for i, raw_path in enumerate(paths.list_images(os.path.join(raw, "training"))):
+        processed_dir = os.path.dirname(raw_path.replace(raw, processed))
+        expected = [splitter.hog_filter.quantify_image(raw_path)] + [
+            splitter.hog_filter.quantify_image(os.path.join(processed_dir, augmented_file_name(raw_path, name)))
+            for name in splitter.transformations]
+        np.testing.assert_array_equal(data[i * n_variants:(i + 1) * n_variants], np.stack(expected).astype(data.dtype))
+        assert set(labels[i * n_variants:(i + 1) * n_variants]) == {raw_path.split(os.path.sep)[-2]}
+
+def test_streaming_is_deterministic_across_workers(tmp_path):
+    raw = str(tmp_path / "raw")
+    write_drawings(raw, seed=1)
+    serial = TestTrainSplit(n_jobs=1).load_split_data(os.path.join(raw, "training"), augment=True)[0]
+    parallel = TestTrainSplit(n_jobs=2, chunksize=2).load_split_data(os.path.join(raw, "training"), augment=True)[0]
+    np.testing.assert_array_equal(serial, parallel)
+
+def test_importing_augmentation_keeps_warnings_enabled():
+    import warnings
+    import src.utils.augmentation  # noqa: F401
+    # No catch-all "ignore" filter is installed for every importer (training, search, workers)
+    assert not any(action == "ignore" and message is None and category is Warning and module is None
+                   for action, message, category, module, _ in warnings.filters)
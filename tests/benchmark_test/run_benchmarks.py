@@ -0,0 +1,372 @@
+"""
+Reproducible performance benchmarks for the prediction and training paths.
+
+Runs entirely on synthetic spiral/wave drawings (no Kaggle data needed): it
+generates a small dataset, trains throwaway models on it into a temporary models
+directory, then times preprocessing, HOG featurization, per-model inference,
+dataset loading, API startup and the end-to-end /predict endpoint, in process
+and over HTTP against the multi-worker server (src.api.serve), whose per-worker
+memory is recorded. Results (p50/p95/p99 latency, throughput, peak RSS) are
+written as a JSON baseline that later runs can be compared against.
+
+Usage (from the project root):
+    python tests/benchmark_test/run_benchmarks.py --label my-change
+    python tests/benchmark_test/run_benchmarks.py --compare tests/benchmark_test/baselines/my-change.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import socket
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+import contextlib
+import warnings
+
+import numpy as np
+import cv2
+
+# Ensure the project root is in sys.path
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'))
+sys.path.insert(0, PROJECT_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import make_dataset
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+# A stage counts as a regression when its p50 grows by more than this fraction
+REGRESSION_THRESHOLD = 0.10
+
+# Run in a fresh interpreter to time a cold API start: imports, model loading and warm-up until /ready
+STARTUP_PROBE = """
+import time
+started = time.perf_counter()
+from fastapi.testclient import TestClient
+from src.api.main import app
+with TestClient(app) as client:
+    assert client.get("/ready").status_code == 200
+    print(time.perf_counter() - started)
+"""
+
+warnings.filterwarnings("ignore")
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and KiB on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def time_calls(fn, iterations, warmup=3):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def summarize(samples, items_per_call=1):
+    samples_ms = np.array(samples) * 1000
+    total_seconds = float(np.sum(samples))
+    return {
+        "calls": len(samples),
+        "mean_ms": float(samples_ms.mean()),
+        "p50_ms": float(np.percentile(samples_ms, 50)),
+        "p95_ms": float(np.percentile(samples_ms, 95)),
+        "p99_ms": float(np.percentile(samples_ms, 99)),
+        "throughput_per_s": (len(samples) * items_per_call) / total_seconds if total_seconds else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+def train_models(dataset_dir, models_dir):
+    """Train small KNN, linear SVM and Random Forest models on the synthetic 'sw' dataset."""
+    from src.training.train_all import train_models as train_all
+    from src.preprocessing.feature_store import FeatureStore
+
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        # Same estimators, hyperparameters and artifacts as the production training entry point
+        return train_all(dataset_dir=os.path.join(dataset_dir, "sw"), models_dir=models_dir, augment=False,
+                         feature_store=FeatureStore(cache_dir=os.path.join(os.path.dirname(models_dir), "features")))
+
+def time_startup(iterations, env):
+    samples = []
+    for _ in range(iterations):
+        out = subprocess.run([sys.executable, "-c", STARTUP_PROBE], cwd=PROJECT_ROOT, env=env,
+                             capture_output=True, text=True, check=True).stdout
+        samples.append(float(out.strip().splitlines()[-1]))
+    return samples
+
+def _worker_pids(parent_pid):
+    # uvicorn spawns its workers through multiprocessing.spawn; the resource tracker is skipped
+    try:
+        with open(f"/proc/{parent_pid}/task/{parent_pid}/children") as f:
+            children = [int(pid) for pid in f.read().split()]
+    except OSError:
+        return []
+    pids = []
+    for pid in children:
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                if b"spawn_main" in f.read():
+                    pids.append(pid)
+        except OSError:
+            pass
+    return pids
+
+def measure_serving(workers, sample_bytes, model_name, iterations, env, timeout=60):
+    """
+    Start src.api.serve with `workers` processes, time /predict over HTTP and read
+    each worker's memory. Returns (latency summary, serving memory report).
+    """
+    import requests
+    from src.utils.telemetry import process_memory
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    # The same bytes are posted every time, so the prediction cache is disabled to time the full path
+    server = subprocess.Popen([sys.executable, "-m", "src.api.serve", "--workers", str(workers), "--port", str(port)],
+                              cwd=PROJECT_ROOT, env={**env, "PREDICTION_CACHE_SIZE": "0"},
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        session = requests.Session()
+        deadline = time.monotonic() + timeout
+        while len(_worker_pids(server.pid)) < workers or not _is_ready(session, url):
+            if time.monotonic() > deadline or server.poll() is not None:
+                raise RuntimeError(f"src.api.serve did not become ready with {workers} workers")
+            time.sleep(0.2)
+
+        def post():
+            resp = session.post(f"{url}/predict", files={"file": ("drawing.png", sample_bytes, "image/png")},
+                                data={"model_name": model_name})
+            if resp.status_code != 200:
+                raise RuntimeError(f"/predict returned {resp.status_code}: {resp.text}")
+        latency = summarize(time_calls(post, iterations))
+        per_worker = [{"pid": pid, **(process_memory(pid) or {})} for pid in _worker_pids(server.pid)]
+        memory = {
+            "workers": workers,
+            "per_worker_mb": per_worker,
+            # PSS splits shared pages between the workers, so its sum is their real footprint
+            "total_pss_mb": round(sum(w.get("pss", 0.0) for w in per_worker), 1),
+            "total_rss_mb": round(sum(w.get("rss", 0.0) for w in per_worker), 1),
+        }
+        return latency, memory
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+def _is_ready(session, url):
+    try:
+        return session.get(f"{url}/ready", timeout=1).status_code == 200
+    except Exception:
+        return False
+
+def run_benchmarks(args):
+    workdir = tempfile.mkdtemp(prefix="pd_bench_")
+    dataset_dir = os.path.join(workdir, "dataset")
+    models_dir = os.path.join(workdir, "models")
+    # Point the API and model registry at the synthetic models before they are imported
+    os.environ["MODELS_DIR"] = models_dir
+    results = {}
+    serving = None
+    try:
+        print(f"[BENCH] Generating synthetic dataset in {dataset_dir}")
+        image_paths = make_dataset(dataset_dir, images_per_class=args.images_per_class, size=args.image_size)
+        print(f"[BENCH] Training benchmark models into {models_dir}")
+        train_models(dataset_dir, models_dir)
+
+        from src.preprocessing.hog_filter import HogFilter
+        from src.preprocessing.test_train_split import TestTrainSplit
+        from src.predictions.prediction import Predict
+
+        sample_path = next(p for p in image_paths if os.sep + "spiral" + os.sep in p)
+        with open(sample_path, "rb") as f:
+            sample_bytes = f.read()
+        sample_image = cv2.imread(sample_path)
+        hog_filter = HogFilter()
+        preprocessed = hog_filter.preprocess_image(sample_image)
+
+        print("[BENCH] HogFilter.preprocess_image")
+        results["preprocess_image"] = summarize(time_calls(lambda: hog_filter.preprocess_image(sample_image), args.iterations))
+        print("[BENCH] HogFilter.compute_hog")
+        results["compute_hog"] = summarize(time_calls(lambda: hog_filter.compute_hog(preprocessed), args.iterations))
+        print("[BENCH] HogFilter.quantify_image (from encoded bytes)")
+        results["quantify_image"] = summarize(time_calls(lambda: hog_filter.quantify_image(sample_bytes), args.iterations))
+
+        with open(os.path.join(models_dir, "metrics.json")) as f:
+            metrics = json.load(f)
+        for display_name in metrics:
+            try:
+                predictor = Predict(model_name=display_name)
+            except ValueError as e:
+                print(f"[BENCH] Skipping Predict for {display_name}: {e}")
+                continue
+            print(f"[BENCH] Predict.predict_from_image [{display_name}]")
+            results[f"predict_from_image[{display_name}]"] = summarize(
+                time_calls(lambda: predictor.predict_from_image(sample_bytes), args.iterations))
+
+        training_path = os.path.join(dataset_dir, "sw", "training")
+        n_training = len([p for p in image_paths if training_path + os.sep in p])
+        print(f"[BENCH] TestTrainSplit.load_split_data ({n_training} images)")
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            results["load_split_data"] = summarize(
+                time_calls(lambda: TestTrainSplit().load_split_data(training_path), args.dataset_iterations, warmup=0),
+                items_per_call=n_training)
+
+        try:
+            from fastapi.testclient import TestClient
+        except Exception as e:
+            print(f"[BENCH] Skipping endpoint benchmark (TestClient unavailable: {e})")
+        else:
+            # Cold start from the compact exports, and from the pickles for comparison
+            env = {**os.environ, "PYTHONPATH": PROJECT_ROOT, "PYTHONWARNINGS": "ignore"}
+            for label, compact in (("compact", "true"), ("pickle", "false")):
+                print(f"[BENCH] API startup to /ready [{label}]")
+                results[f"api_startup[{label}]"] = summarize(
+                    time_startup(args.startup_iterations, {**env, "COMPACT_MODELS": compact}))
+
+            from src.api.main import app
+            from src.predictions.prediction_cache import get_prediction_cache
+            prediction_cache = get_prediction_cache()
+            cache_size = prediction_cache.max_size
+            # Request logging is silenced so the benchmark output stays readable
+            logging.getLogger("parkinsons_api").setLevel(logging.WARNING)
+            logging.getLogger("httpx").setLevel(logging.WARNING)
+            with TestClient(app) as client:
+                for display_name in metrics:
+                    def post():
+                        resp = client.post("/predict", files={"file": ("drawing.png", sample_bytes, "image/png")},
+                                           data={"model_name": display_name})
+                        if resp.status_code != 200:
+                            raise RuntimeError(f"/predict returned {resp.status_code}: {resp.text}")
+                    try:
+                        post()
+                    except RuntimeError as e:
+                        print(f"[BENCH] Skipping /predict for {display_name}: {e}")
+                        continue
+                    # The same bytes are posted every time, so the prediction cache is disabled
+                    # to time the full path, then re-enabled to time cache hits separately
+                    print(f"[BENCH] POST /predict [{display_name}]")
+                    prediction_cache.max_size = 0
+                    prediction_cache.clear()
+                    results[f"http_predict[{display_name}]"] = summarize(time_calls(post, args.iterations))
+                    print(f"[BENCH] POST /predict, cached [{display_name}]")
+                    prediction_cache.max_size = cache_size
+                    results[f"http_predict_cached[{display_name}]"] = summarize(time_calls(post, args.iterations))
+                # One upload in one pool job: features extracted once, the models classifying them concurrently
+                def post_ensemble():
+                    resp = client.post("/predict/ensemble", files={"file": ("drawing.png", sample_bytes, "image/png")})
+                    if resp.status_code != 200:
+                        raise RuntimeError(f"/predict/ensemble returned {resp.status_code}: {resp.text}")
+                print("[BENCH] POST /predict/ensemble [all models]")
+                results["http_predict_ensemble"] = summarize(time_calls(post_ensemble, args.iterations))
+
+            if args.serve_workers > 0:
+                print(f"[BENCH] POST /predict over HTTP [src.api.serve, {args.serve_workers} workers]")
+                try:
+                    latency, serving = measure_serving(args.serve_workers, sample_bytes, next(iter(metrics)),
+                                                       args.iterations, env)
+                    results[f"http_predict_workers[{args.serve_workers}]"] = latency
+                except Exception as e:
+                    print(f"[BENCH] Skipping multi-worker serving benchmark: {e}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "label": args.label,
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {
+            "iterations": args.iterations,
+            "dataset_iterations": args.dataset_iterations,
+            "startup_iterations": args.startup_iterations,
+            "images_per_class": args.images_per_class,
+            "image_size": args.image_size,
+            "serve_workers": args.serve_workers,
+        },
+        "peak_rss_mb": peak_rss_mb(),
+        "results": results,
+        "serving": serving,
+    }
+
+def print_report(report):
+    print(f"\n{'stage':45s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'items/s':>10s} {'rss MiB':>8s}")
+    for stage, r in report["results"].items():
+        throughput = f"{r['throughput_per_s']:.1f}" if r["throughput_per_s"] else "-"
+        print(f"{stage:45s} {r['p50_ms']:9.2f} {r['p95_ms']:9.2f} {r['p99_ms']:9.2f} {throughput:>10s} {r['peak_rss_mb']:8.1f}")
+    print(f"Peak RSS: {report['peak_rss_mb']:.1f} MiB")
+    serving = report.get("serving")
+    if serving:
+        print(f"\nServing memory with {serving['workers']} workers (MiB; shared = memory-mapped models and libraries):")
+        print(f"{'pid':>8s} {'rss':>8s} {'pss':>8s} {'shared':>8s} {'private':>8s}")
+        for worker in serving["per_worker_mb"]:
+            print(f"{worker['pid']:>8d} {worker.get('rss', 0):8.1f} {worker.get('pss', 0):8.1f} "
+                  f"{worker.get('shared', 0):8.1f} {worker.get('private', 0):8.1f}")
+        print(f"Total RSS {serving['total_rss_mb']:.1f} MiB, total PSS {serving['total_pss_mb']:.1f} MiB")
+
+def compare(report, baseline):
+    """Print p50 changes against a baseline and return the list of regressed stages."""
+    print(f"\nComparison against baseline '{baseline.get('label')}' ({baseline.get('commit')}):")
+    regressions = []
+    for stage, r in report["results"].items():
+        base = baseline.get("results", {}).get(stage)
+        if base is None:
+            print(f"{stage:45s} (new stage)")
+            continue
+        change = (r["p50_ms"] - base["p50_ms"]) / base["p50_ms"] if base["p50_ms"] else 0.0
+        flag = ""
+        if change > REGRESSION_THRESHOLD:
+            flag = "  <-- REGRESSION"
+            regressions.append(stage)
+        print(f"{stage:45s} {base['p50_ms']:9.2f} -> {r['p50_ms']:9.2f} ms ({change:+.1%}){flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark preprocessing, featurization, inference and the /predict endpoint.")
+    parser.add_argument('--label', type=str, default=None, help='Name of the baseline file to write (defaults to the git commit).')
+    parser.add_argument('--output-dir', type=str, default=BASELINE_DIR, help='Directory for JSON baselines.')
+    parser.add_argument('--compare', type=str, default=None, help='Baseline JSON to compare the results against.')
+    parser.add_argument('--fail-on-regression', action='store_true', help='Exit non-zero if any stage regressed.')
+    parser.add_argument('--iterations', type=int, default=100, help='Timed calls per per-image stage.')
+    parser.add_argument('--dataset-iterations', type=int, default=3, help='Timed calls of load_split_data.')
+    parser.add_argument('--startup-iterations', type=int, default=3, help='Cold API starts timed per configuration.')
+    parser.add_argument('--images-per-class', type=int, default=20, help='Synthetic images per shape, class and split.')
+    parser.add_argument('--image-size', type=int, default=512, help='Side length of the synthetic images in pixels.')
+    parser.add_argument('--serve-workers', type=int, default=2, help='Worker processes for the HTTP serving benchmark (0 skips it).')
+    args = parser.parse_args()
+    args.label = args.label or git_commit() or "local"
+
+    report = run_benchmarks(args)
+    print_report(report)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    output_path = os.path.join(args.output_dir, f"{args.label}.json")
+    with open(output_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"[BENCH] Results saved to {output_path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import os
+import numpy as np
+import cv2
+
+SHAPES = ("spiral", "wave")
+CLASSES = ("healthy", "parkinson")
+
+def draw_shape(shape, label, rng, size=512):
+    """
+    Draw a synthetic spiral or wave as a black stroke on white paper.
+
+    Parkinson's drawings get a larger tremor-like jitter on the stroke, which is
+    enough for the classifiers to have something to learn.
+    """
+    image = np.full((size, size, 3), 255, np.uint8)
+    tremor = 0.012 * size if label == "parkinson" else 0.002 * size
+    n_points = 800
+    if shape == "spiral":
+        t = np.linspace(0, 6 * np.pi, n_points)
+        r = t * (0.42 * size / (6 * np.pi)) + rng.uniform(0, 0.02 * size)
+        points = np.stack([size / 2 + r * np.cos(t), size / 2 + r * np.sin(t)], 1)
+    elif shape == "wave":
+        x = np.linspace(0.05 * size, 0.95 * size, n_points)
+        y = size / 2 + 0.25 * size * np.sin(x / size * 6 * np.pi + rng.uniform(0, np.pi))
+        points = np.stack([x, y], 1)
+    else:
+        raise ValueError(f"Unknown shape '{shape}'. Choose from: {list(SHAPES)}")
+    points = points + rng.normal(0, tremor, points.shape)
+    cv2.polylines(image, [points.astype(np.int32)], False, (20, 20, 20), max(1, size // 150))
+    return image
+
+def make_dataset(root, images_per_class=20, size=512, seed=0):
+    """
+    Write a dataset in the processed layout: <root>/<shape>/{training,testing}/{healthy,parkinson}/*.png,
+    plus an 'sw' folder holding both shapes. Returns the list of written image paths.
+    """
+    rng = np.random.default_rng(seed)
+    written = []
+    for split in ("training", "testing"):
+        for label in CLASSES:
+            for shape in SHAPES:
+                for i in range(images_per_class):
+                    image = draw_shape(shape, label, rng, size)
+                    for folder in (shape, "sw"):
+                        out_dir = os.path.join(root, folder, split, label)
+                        os.makedirs(out_dir, exist_ok=True)
+                        out_path = os.path.join(out_dir, f"{shape}_{label}_{i:03d}.png")
+                        cv2.imwrite(out_path, image)
+                        written.append(out_path)
+    return written
@@ -0,0 +1,40 @@
+"""Synthetic drawings and small trained models shared by the API and inference tests."""
+import os
+import json
+import numpy as np
+import joblib
+from sklearn.svm import SVC
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.preprocessing import LabelEncoder
+
+from src.preprocessing.hog_filter import HogFilter
+
+MODELS = {
+    "Linear SVM": ("model_LinearSVM.pkl", lambda: SVC(kernel="linear", C=0.025)),
+    "Random Forest": ("model_RandomForest.pkl", lambda: RandomForestClassifier(n_estimators=10, random_state=42)),
+    "K-Nearest Neighbors": ("model_KNN.pkl", lambda: KNeighborsClassifier(n_neighbors=2)),
+}
+
+def drawing(seed):
+    """A small grayscale 'drawing' of random dark pixels on white paper."""
+    rng = np.random.default_rng(seed)
+    image = np.full((120, 120), 255, np.uint8)
+    image[rng.integers(0, 120, 400), rng.integers(0, 120, 400)] = 0
+    return image
+
+def train(models_dir, names=tuple(MODELS), labels=("healthy", "parkinson")):
+    """Fit the named models on synthetic drawings and write their pickles and metrics.json entries."""
+    hog_filter = HogFilter()
+    X = np.stack([hog_filter.quantify_image(drawing(seed)) for seed in range(30)])
+    le = LabelEncoder()
+    y = le.fit_transform(list(labels) * 15)
+    metrics_path = os.path.join(models_dir, "metrics.json")
+    metrics = json.load(open(metrics_path)) if os.path.exists(metrics_path) else {}
+    for name in names:
+        pickle_file, make = MODELS[name]
+        joblib.dump({"classifier": make().fit(X, y), "label_encoder": le}, os.path.join(models_dir, pickle_file))
+        metrics[name] = {"accuracy": 1.0, "precision": 1.0, "recall": 1.0, "f1-score": 1.0,
+                         "pickle_file": pickle_file, "features": hog_filter.describe()}
+    with open(metrics_path, "w") as f:
+        json.dump(metrics, f)
@@ -0,0 +1,54 @@
+import os
+import sys
+import numpy as np
+import cv2
+import pytest
+from skimage import feature
+
+# Ensure the project root is in sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.preprocessing.hog_filter import HogFilter, HOG_PARAMS
+from src.preprocessing.hog_backends import numpy_hog, available_backends
+
+def spiral_image(jitter, seed):
+    """Synthetic spiral drawing, similar to the dataset's hand-drawn images."""
+    rng = np.random.default_rng(seed)
+    image = np.full((256, 256, 3), 255, np.uint8)
+    t = np.linspace(0, 6 * np.pi, 600)
+    r = t * 6
+    points = np.stack([128 + r * np.cos(t), 128 + r * np.sin(t)], 1) + rng.normal(0, jitter, (600, 2))
+    cv2.polylines(image, [points.astype(np.int32)], False, (0, 0, 0), 2)
+    return image
+
+def reference_hog(image, block_norm="L1"):
+    """The original HogFilter computation (visualize=True, image discarded)."""
+    features, _ = feature.hog(image, orientations=9, pixels_per_cell=(10, 10), cells_per_block=(2, 2),
+        transform_sqrt=True, block_norm=block_norm, visualize=True)
+    return features
+
+@pytest.mark.parametrize("jitter,seed", [(0.3, 0), (3.0, 1), (6.0, 2)])
+def test_numpy_backend_matches_skimage_on_drawings(jitter, seed):
+    hog_filter = HogFilter(backend="numpy")
+    preprocessed = hog_filter.preprocess_image(spiral_image(jitter, seed))
+    expected = reference_hog(preprocessed)
+    actual = hog_filter.compute_hog(preprocessed)
+    assert actual.shape == expected.shape == (hog_filter.feature_length(),)
+    np.testing.assert_allclose(actual, expected, rtol=0, atol=1e-6)
+
+@pytest.mark.parametrize("block_norm", ["L1", "L1-sqrt", "L2", "L2-Hys"])
+def test_numpy_backend_matches_skimage_on_grayscale_noise(block_norm):
+    image = np.random.default_rng(3).integers(0, 256, (200, 200)).astype(np.uint8)
+    params = dict(HOG_PARAMS, block_norm=block_norm)
+    del params["image_size"]
+    np.testing.assert_allclose(numpy_hog(image, **params), reference_hog(image, block_norm), rtol=0, atol=1e-6)
+
+def test_backends_agree_through_quantify_image():
+    image = spiral_image(3.0, 4)
+    vectors = [HogFilter(backend=name).quantify_image(image) for name in available_backends]
+    for vector in vectors[1:]:
+        np.testing.assert_allclose(vector, vectors[0], rtol=0, atol=1e-6)
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        HogFilter(backend="opencv")
@@ -0,0 +1,81 @@
+import os
+import sys
+import struct
+import zlib
+import numpy as np
+import cv2
+import pytest
+
+# Ensure the project root is in sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.preprocessing.hog_filter import HogFilter
+from src.preprocessing.image_decoding import decode_image, check_image_size, reduction_factor, ImageTooLarge
+
+def phone_photo(seed, size=(4000, 3000), thickness=12):
+    """12 MP JPEG of a hand-drawn spiral on unevenly lit paper, as taken with a phone."""
+    rng = np.random.default_rng(seed)
+    width, height = size
+    rows, cols = np.mgrid[0:height, 0:width]
+    paper = (200 + 40 * cols / width - 20 * rows / height).astype(np.float32)
+    image = np.dstack([paper * 0.95, paper, paper * 1.02]).clip(0, 255).astype(np.uint8)
+    t = np.linspace(0, 6 * np.pi, 2000)
+    r = t / (6 * np.pi) * min(size) * 0.4 * (1 + rng.normal(0, 0.001, t.size).cumsum())
+    points = np.stack([width / 2 + r * np.cos(t), height / 2 + r * np.sin(t)], 1)
+    cv2.polylines(image, [points.astype(np.int32)], False, (50, 40, 30), thickness)
+    image = np.clip(image + rng.normal(0, 5, image.shape), 0, 255).astype(np.uint8)
+    return cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+
+def png_declaring(width, height):
+    """A few-byte PNG whose header claims width x height pixels (a decompression bomb)."""
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    header = struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(b"\x00")) + chunk(b"IEND", b"")
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_reduced_decode_keeps_features_within_tolerance(seed):
+    hog_filter = HogFilter()
+    contents = phone_photo(seed)
+    reduced = decode_image(contents, hog_filter.params["image_size"])
+    full = decode_image(contents, hog_filter.params["image_size"], reduced=False)
+    # Decoded straight to grayscale at a quarter of the resolution
+    assert reduced.shape == (750, 1000) and full.shape == (3000, 4000, 3)
+    fast = hog_filter.quantify_image(contents)
+    reference = hog_filter.compute_hog(hog_filter.preprocess_image(full))
+    cosine = fast @ reference / (np.linalg.norm(fast) * np.linalg.norm(reference))
+    assert cosine > 0.98
+    assert np.linalg.norm(fast - reference) / np.linalg.norm(reference) < 0.2
+
+def test_small_images_are_decoded_as_before():
+    image = np.full((256, 256, 3), 255, np.uint8)
+    cv2.circle(image, (128, 128), 80, (0, 0, 0), 2)
+    contents = cv2.imencode(".png", image)[1].tobytes()
+    assert np.array_equal(decode_image(contents, (200, 200)), cv2.imdecode(np.frombuffer(contents, np.uint8), cv2.IMREAD_COLOR))
+    assert reduction_factor((256, 256), (200, 200)) == 1
+    assert reduction_factor((4032, 3024), (200, 200)) == 4
+
+def test_oversized_images_are_rejected_before_decoding():
+    bomb = png_declaring(60000, 60000)
+    assert len(bomb) < 100
+    with pytest.raises(ImageTooLarge):
+        check_image_size(bomb)
+    with pytest.raises(ImageTooLarge):
+        HogFilter().quantify_image(bomb)
+    # Below Pillow's own bomb threshold, but over MAX_IMAGE_PIXELS
+    with pytest.raises(ImageTooLarge, match="8000x8000 pixels"):
+        check_image_size(png_declaring(8000, 8000))
+    with pytest.raises(ImageTooLarge, match="bytes"):
+        check_image_size(phone_photo(0), max_bytes=1024)
+    assert check_image_size(png_declaring(300, 200)) == (300, 200)
+
+def test_dataset_files_are_decoded_without_a_header_parse(tmp_path, monkeypatch):
+    from PIL import Image
+    image = np.full((256, 256, 3), 255, np.uint8)
+    cv2.circle(image, (128, 128), 80, (0, 0, 0), 2)
+    path = str(tmp_path / "spiral.png")
+    cv2.imwrite(path, image)
+    monkeypatch.setattr(Image, "open", lambda *args, **kwargs: pytest.fail("dataset file opened with Pillow"))
+    assert np.array_equal(decode_image(path, (200, 200)), image)
+    assert HogFilter().quantify_image(path) is not None
+    assert decode_image(str(tmp_path / "missing.png")) is None
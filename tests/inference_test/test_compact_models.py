@@ -0,0 +1,179 @@
+import os
+import sys
+import numpy as np
+import joblib
+import pytest
+from sklearn.svm import SVC
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.preprocessing import LabelEncoder
+
+# Ensure the project root is in sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.predictions.compact_models import compile_bundle, export_model, load_exported, exported_path
+
+# Same estimators and hyperparameters as the training scripts
+CLASSIFIERS = {
+    "linear_svm": lambda: SVC(kernel="linear", C=0.025, random_state=42),
+    "random_forest": lambda: RandomForestClassifier(n_estimators=100, random_state=42),
+    "knn": lambda: KNeighborsClassifier(n_neighbors=2),
+}
+
+def hog_like_split(seed, n_train=240, n_test=400, n_features=600):
+    """Sparse, non-negative float32 features with a learnable but noisy label, like HOG vectors."""
+    rng = np.random.default_rng(seed)
+    X = rng.random((n_train + n_test, n_features)).astype(np.float32)
+    X[X < 0.6] = 0
+    signal = X[:, :20].sum(axis=1) + rng.normal(0, 0.5, len(X))
+    labels = np.where(signal > np.median(signal), "parkinson", "healthy")
+    # Exact duplicates exercise neighbor ties and identical tree paths
+    X[n_train - 10:n_train] = X[:10]
+    return X[:n_train], labels[:n_train], X[n_train:], labels[n_train:]
+
+@pytest.fixture(scope="module", params=[0, 1])
+def split(request):
+    return hog_like_split(request.param)
+
+def fit_bundle(name, trainX, trainY):
+    le = LabelEncoder()
+    classifier = CLASSIFIERS[name]()
+    classifier.fit(trainX, le.fit_transform(trainY))
+    return {"classifier": classifier, "label_encoder": le}
+
+def predict_labels(bundle, X):
+    return bundle["label_encoder"].inverse_transform(bundle["classifier"].predict(X))
+
+@pytest.mark.parametrize("name", list(CLASSIFIERS))
+def test_compiled_bundle_matches_sklearn_on_held_out_set(name, split):
+    trainX, trainY, testX, _ = split
+    bundle = fit_bundle(name, trainX, trainY)
+    compact = compile_bundle(bundle)
+    assert compact["classifier"] is not bundle["classifier"]
+    np.testing.assert_array_equal(predict_labels(compact, testX), predict_labels(bundle, testX))
+    # Single float64 HOG vectors, as Predict passes them
+    for x in testX[:20].astype(np.float64):
+        assert predict_labels(compact, [x])[0] == predict_labels(bundle, [x])[0]
+
+def test_forest_probabilities_match_sklearn(split):
+    trainX, trainY, testX, _ = split
+    bundle = fit_bundle("random_forest", trainX, trainY)
+    compact = compile_bundle(bundle)
+    np.testing.assert_array_equal(compact["classifier"].predict_proba(testX), bundle["classifier"].predict_proba(testX))
+
+def test_knn_neighbors_match_sklearn(split):
+    trainX, trainY, testX, _ = split
+    bundle = fit_bundle("knn", trainX, trainY)
+    compact = compile_bundle(bundle)
+    expected = bundle["classifier"].kneighbors(testX, return_distance=False)
+    actual = compact["classifier"].kneighbors(testX)
+    # Order within the k neighbors does not affect the vote
+    np.testing.assert_array_equal(np.sort(actual, axis=1), np.sort(expected, axis=1))
+    np.testing.assert_array_equal(compact["classifier"].predict_proba(testX), bundle["classifier"].predict_proba(testX))
+
+def test_knn_near_ties_match_sklearn(tmp_path):
+    # Rows 1e-6 apart along one axis: identical in float32, ordered opposite to their index in float64
+    n_near = 12
+    X = np.zeros((n_near + 30, 5))
+    X[:n_near, 0] = 1000 + 1e-6 * np.arange(n_near, 0, -1)
+    X[n_near:] = np.random.default_rng(0).uniform(0, 100, (30, 5))
+    labels = np.array(["healthy"] * (n_near // 2) + ["parkinson"] * (n_near // 2) + ["healthy"] * 30)
+    le = LabelEncoder()
+    classifier = KNeighborsClassifier(n_neighbors=3).fit(X, le.fit_transform(labels))
+    bundle = {"classifier": classifier, "label_encoder": le}
+    queries = np.zeros((4, 5))
+    queries[:, 0] = 1000 + 1e-6 * np.array([0.0, 2.5, 6.5, 11.0])
+    model_path = str(tmp_path / "model_KNN.pkl")
+    joblib.dump(bundle, model_path)
+    export_model(bundle, model_path)
+    for compact in (compile_bundle(bundle), load_exported(model_path)):
+        np.testing.assert_array_equal(np.sort(compact["classifier"].kneighbors(queries), axis=1),
+                                      np.sort(classifier.kneighbors(queries, return_distance=False), axis=1))
+        np.testing.assert_array_equal(compact["classifier"].predict(queries), classifier.predict(queries))
+
+@pytest.mark.parametrize("name", list(CLASSIFIERS))
+def test_export_round_trip(name, split, tmp_path):
+    trainX, trainY, testX, _ = split
+    bundle = fit_bundle(name, trainX, trainY)
+    model_path = str(tmp_path / f"model_{name}.pkl")
+    joblib.dump(bundle, model_path)
+    assert export_model(bundle, model_path) == exported_path(model_path)
+    loaded = load_exported(model_path)
+    assert isinstance(loaded["classifier"].classes_, np.ndarray)
+    np.testing.assert_array_equal(predict_labels(loaded, testX), predict_labels(bundle, testX))
+
+def test_stale_export_is_ignored(split, tmp_path):
+    trainX, trainY, _, _ = split
+    bundle = fit_bundle("linear_svm", trainX, trainY)
+    model_path = str(tmp_path / "model_LinearSVM.pkl")
+    joblib.dump(bundle, model_path)
+    export_model(bundle, model_path)
+    # Retraining rewrites the pickle; the old export must not be served
+    stat = os.stat(model_path)
+    os.utime(model_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert load_exported(model_path) is None
+
+def test_reexport_leaves_mapped_bundle_intact(split, tmp_path):
+    from src.training.train_all import fit_reducer
+    trainX, trainY, testX, _ = split
+    reducer = fit_reducer("pca", 32, trainX, trainY)
+    bundle = {**fit_bundle("knn", reducer.transform(trainX), trainY), "reducer": reducer}
+    model_path = str(tmp_path / "model_KNN.pkl")
+    joblib.dump(bundle, model_path)
+    export_model(bundle, model_path)
+    mapped = load_exported(model_path)
+    expected = predict_labels(mapped, mapped["reducer"].transform(testX))
+
+    # Retrain in place without a reducer, as hot reload or another worker would see it
+    retrained = fit_bundle("knn", trainX[::-1], trainY[::-1])
+    joblib.dump(retrained, model_path)
+    export_model(retrained, model_path)
+    np.testing.assert_array_equal(predict_labels(mapped, mapped["reducer"].transform(testX)), expected)
+    assert not [name for name in os.listdir(exported_path(model_path)) if name.startswith("reducer_")]
+    reloaded = load_exported(model_path)
+    assert "reducer" not in reloaded
+    np.testing.assert_array_equal(predict_labels(reloaded, testX), predict_labels(retrained, testX))
+
+def test_reader_of_a_superseded_meta_never_mixes_exports(split, tmp_path):
+    trainX, trainY, testX, _ = split
+    bundle = fit_bundle("knn", trainX, trainY)
+    model_path = str(tmp_path / "model_KNN.pkl")
+    joblib.dump(bundle, model_path)
+    export_dir = export_model(bundle, model_path)
+    with open(os.path.join(export_dir, "meta.json")) as f:
+        old_meta = f.read()
+    export_model(fit_bundle("knn", trainX[:100], trainY[:100]), model_path)
+    # A reader that got the old meta.json just before the switch finds its arrays gone, not the new ones
+    with open(os.path.join(export_dir, "meta.json"), "w") as f:
+        f.write(old_meta)
+    assert load_exported(model_path) is None
+
+def test_unsupported_classifier_is_left_unchanged(split, tmp_path):
+    trainX, trainY, _, _ = split
+    le = LabelEncoder()
+    classifier = SVC(kernel="rbf").fit(trainX, le.fit_transform(trainY))
+    bundle = {"classifier": classifier, "label_encoder": le}
+    assert compile_bundle(bundle) is bundle
+    assert export_model(bundle, str(tmp_path / "model_rbf.pkl")) is None
+
+@pytest.mark.parametrize("method", ["pca", "select"])
+def test_reducer_is_exported_and_applied(method, split, tmp_path):
+    from src.training.train_all import fit_reducer
+    from src.predictions.model_registry import ModelRegistry
+    from src.predictions.prediction import Predict
+    trainX, trainY, testX, _ = split
+    reducer = fit_reducer(method, 32, trainX, trainY)
+    bundle = fit_bundle("knn", reducer.transform(trainX), trainY)
+    bundle["reducer"] = reducer
+    model_path = str(tmp_path / "model_KNN.pkl")
+    joblib.dump(bundle, model_path)
+    export_model(bundle, model_path)
+    loaded = load_exported(model_path)
+    assert loaded["reducer"].n_components_ == 32 and loaded["reducer"].n_features_in_ == trainX.shape[1]
+    expected = predict_labels(bundle, reducer.transform(testX))
+
+    (tmp_path / "metrics.json").write_text('{"KNN": {"pickle_file": "model_KNN.pkl"}}')
+    registry = ModelRegistry(models_dir=str(tmp_path))
+    registry.load_metrics()
+    # Predict takes raw feature vectors and reduces them itself
+    np.testing.assert_array_equal(Predict("KNN", registry=registry).predict(testX.astype(np.float64)), expected)
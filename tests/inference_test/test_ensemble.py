@@ -0,0 +1,49 @@
+import os
+import sys
+import pytest
+
+# Ensure the project root is in sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.predictions.model_registry import ModelRegistry
+from src.predictions.prediction import Predict, Ensemble, combine_predictions
+from src.preprocessing.hog_filter import HogFilter
+from tests.helpers.synthetic_models import drawing, train
+
+@pytest.fixture(scope="module")
+def registry(tmp_path_factory):
+    models_dir = str(tmp_path_factory.mktemp("models"))
+    train(models_dir)
+    registry = ModelRegistry(models_dir=models_dir)
+    registry.load_metrics()
+    return registry
+
+def test_ensemble_matches_individual_models_and_featurizes_once(registry, monkeypatch):
+    calls = []
+    original = HogFilter.quantify_image
+    monkeypatch.setattr(HogFilter, "quantify_image", lambda self, image: calls.append(1) or original(self, image))
+    image = drawing(100)
+    result = Ensemble(registry=registry).predict_from_image(image)
+    assert len(calls) == 1
+    for name, model_result in result["models"].items():
+        assert model_result["prediction"] == Predict(model_name=name, registry=registry).predict_from_image(image)[0]
+    assert result["models"]["Linear SVM"]["probabilities"] is None
+    assert sum(result["models"]["Random Forest"]["probabilities"].values()) == pytest.approx(1.0)
+    assert sum(result["votes"].values()) == 3
+
+def test_majority_vote():
+    per_model = {
+        "a": {"prediction": "parkinson", "probabilities": None},
+        "b": {"prediction": "healthy", "probabilities": {"healthy": 0.9, "parkinson": 0.1}},
+        "c": {"prediction": "parkinson", "probabilities": {"healthy": 0.4, "parkinson": 0.6}},
+    }
+    result = combine_predictions(per_model)
+    assert result["prediction"] == "parkinson"
+    assert result["votes"] == {"parkinson": 2, "healthy": 1}
+
+def test_tied_vote_goes_to_the_more_probable_label():
+    per_model = {
+        "a": {"prediction": "parkinson", "probabilities": None},
+        "b": {"prediction": "healthy", "probabilities": {"healthy": 0.9, "parkinson": 0.1}},
+    }
+    assert combine_predictions(per_model)["prediction"] == "healthy"
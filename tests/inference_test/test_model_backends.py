@@ -0,0 +1,100 @@
+import os
+import sys
+import json
+import numpy as np
+import joblib
+import pytest
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.preprocessing import LabelEncoder
+
+# Ensure the project root is in sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.predictions.model_registry import ModelRegistry
+from src.predictions.model_backends import MODEL_BACKENDS, register_model_backend, ModelSpec
+from src.predictions.compact_models import CompactLabelEncoder
+from src.predictions.prediction import Predict
+from src.preprocessing.hog_filter import HogFilter
+
+class ConstantClassifier:
+    """Stand-in for a model type the API has no built-in support for."""
+    n_features_in_ = None
+
+    def predict(self, X):
+        return np.ones(len(X), dtype=np.intp)
+
+@pytest.fixture
+def constant_backend():
+    @register_model_backend("constant")
+    def load_constant(model_path):
+        return {"classifier": ConstantClassifier(), "label_encoder": CompactLabelEncoder(["healthy", "parkinson"])}, "test"
+    yield "constant"
+    del MODEL_BACKENDS["constant"]
+
+@pytest.fixture
+def models_dir(tmp_path, constant_backend):
+    hog_filter = HogFilter(image_size=(100, 100))
+    rng = np.random.default_rng(0)
+    X = rng.random((20, hog_filter.feature_length())).astype(np.float32)
+    le = LabelEncoder()
+    y = le.fit_transform(["healthy", "parkinson"] * 10)
+    joblib.dump({"classifier": KNeighborsClassifier(n_neighbors=2).fit(X, y), "label_encoder": le},
+                tmp_path / "model_KNN.pkl")
+    (tmp_path / "model_Constant.bin").write_bytes(b"")
+    metrics = {
+        "K-Nearest Neighbors": {"accuracy": 0.5, "pickle_file": "model_KNN.pkl", "backend": "sklearn",
+                                "features": hog_filter.describe()},
+        "Constant": {"accuracy": 0.5, "pickle_file": "model_Constant.bin", "backend": constant_backend},
+    }
+    (tmp_path / "metrics.json").write_text(json.dumps(metrics))
+    return str(tmp_path)
+
+def test_spec_resolves_display_name_key_and_file(models_dir):
+    registry = ModelRegistry(models_dir=models_dir)
+    registry.load_metrics()
+    spec = registry.spec("K-Nearest Neighbors")
+    assert registry.spec("KNN") == spec == registry.spec("model_KNN.pkl")
+    assert spec.backend == "sklearn"
+    with pytest.raises(ValueError, match="Unknown model_name"):
+        registry.spec("LinearSVM")
+
+def test_predict_uses_per_model_features(models_dir):
+    registry = ModelRegistry(models_dir=models_dir)
+    registry.load_metrics()
+    predictor = Predict(model_name="KNN", registry=registry)
+    assert predictor.hog_filter.params["image_size"] == (100, 100)
+    image = np.full((150, 150), 255, np.uint8)
+    image[40:110, 70:80] = 0
+    assert predictor.predict_from_image(image)[0] in ("healthy", "parkinson")
+
+def test_registered_backend_is_served(models_dir):
+    registry = ModelRegistry(models_dir=models_dir)
+    registry.load_metrics()
+    registry.preload()
+    assert set(registry.stats()["cached_models"]) == {"model_KNN.pkl", "model_Constant.bin"}
+    predictor = Predict(model_name="Constant", registry=registry)
+    assert list(predictor.predict(np.zeros((2, 3)))) == ["parkinson", "parkinson"]
+
+def test_unknown_backend_is_rejected(tmp_path):
+    spec = ModelSpec("Mystery", "model_Mystery.onnx", backend="onnx")
+    registry = ModelRegistry(models_dir=str(tmp_path))
+    with pytest.raises(ValueError, match="Unknown model backend"):
+        registry.get(spec.pickle_file, spec.backend, spec.key)
+
+def test_serve_exports_missing_compact_models_once(models_dir):
+    from src.api.serve import prepare_exports
+    from src.predictions.compact_models import load_exported
+    registry = ModelRegistry(models_dir=models_dir)
+    # Only the scikit-learn bundle has a compact format; the custom backend is left as is
+    assert prepare_exports(registry) == ["model_KNN.pkl"]
+    assert load_exported(os.path.join(models_dir, "model_KNN.pkl")) is not None
+    assert prepare_exports(registry) == []
+
+def test_load_locks_are_released(models_dir):
+    registry = ModelRegistry(models_dir=models_dir, max_size=1)
+    registry.load_metrics()
+    registry.get("model_KNN.pkl")
+    registry.get("model_Constant.bin", "constant")
+    with pytest.raises(FileNotFoundError):
+        registry.get("model_Missing.pkl")
+    assert registry._load_locks == {}
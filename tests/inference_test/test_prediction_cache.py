@@ -0,0 +1,61 @@
+import os
+import sys
+import time
+
+# Ensure the project root is in sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.predictions import prediction_cache
+from src.predictions.prediction_cache import PredictionCache, SQLiteCacheBackend
+
+IMAGE = b"\x89PNG drawing bytes"
+FEATURE_KEY = "8bb75ac0dea25c7c"
+
+def test_repeated_bytes_hit_the_cache():
+    cache = PredictionCache()
+    key = PredictionCache.make_key(IMAGE, "model_KNN.pkl@1-100", FEATURE_KEY)
+    assert cache.get(key, "model_KNN.pkl", "model_KNN.pkl@1-100") is None
+    cache.set(key, "model_KNN.pkl", "healthy")
+    assert PredictionCache.make_key(bytes(IMAGE), "model_KNN.pkl@1-100", FEATURE_KEY) == key
+    assert cache.get(key, "model_KNN.pkl", "model_KNN.pkl@1-100") == "healthy"
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+def test_new_model_identity_invalidates_older_entries():
+    cache = PredictionCache()
+    old = PredictionCache.make_key(IMAGE, "model_KNN.pkl@1-100", FEATURE_KEY)
+    other = PredictionCache.make_key(IMAGE, "model_RandomForest.pkl@1-100", FEATURE_KEY)
+    cache.set(old, "model_KNN.pkl", "healthy")
+    cache.set(other, "model_RandomForest.pkl", "parkinson")
+    cache.get(old, "model_KNN.pkl", "model_KNN.pkl@1-100")
+    # The pickle was retrained: same bytes, new identity, so a new key and the old entry dropped
+    new = PredictionCache.make_key(IMAGE, "model_KNN.pkl@2-120", FEATURE_KEY)
+    assert new != old
+    assert cache.get(new, "model_KNN.pkl", "model_KNN.pkl@2-120") is None
+    assert cache.get(old, "model_KNN.pkl", "model_KNN.pkl@2-120") is None
+    assert cache.stats()["invalidated"] == 1
+    assert cache.get(other, "model_RandomForest.pkl", "model_RandomForest.pkl@1-100") == "parkinson"
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(prediction_cache.time, "time", lambda: now[0])
+    cache = PredictionCache(ttl=60)
+    key = PredictionCache.make_key(IMAGE, "model_KNN.pkl@1-100", FEATURE_KEY)
+    cache.set(key, "model_KNN.pkl", "healthy")
+    now[0] += 59
+    assert cache.get(key, "model_KNN.pkl", "model_KNN.pkl@1-100") == "healthy"
+    now[0] += 2
+    assert cache.get(key, "model_KNN.pkl", "model_KNN.pkl@1-100") is None
+    assert cache.stats()["expired"] == 1
+
+def test_sqlite_backend_is_shared_between_processes(tmp_path):
+    path = str(tmp_path / "predictions.sqlite")
+    # Two caches on one file stand in for two API workers
+    first = PredictionCache(backend=SQLiteCacheBackend(path))
+    second = PredictionCache(backend=SQLiteCacheBackend(path))
+    key = PredictionCache.make_key(IMAGE, "model_KNN.pkl@1-100", FEATURE_KEY)
+    first.set(key, "model_KNN.pkl", "healthy")
+    assert second.get(key, "model_KNN.pkl", "model_KNN.pkl@1-100") == "healthy"
+    assert second.stats()["shared_hits"] == 1
+    # Another worker sees the retrained model and drops the old version from the shared file
+    second.get(PredictionCache.make_key(IMAGE, "model_KNN.pkl@2-120", FEATURE_KEY), "model_KNN.pkl", "model_KNN.pkl@2-120")
+    assert SQLiteCacheBackend(path).get(key, time.time()) is None
@@ -0,0 +1,76 @@
+import os
+import sys
+import numpy as np
+import cv2
+
+# Ensure the project root is in sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.preprocessing.packed_dataset import build_packed_dataset, packed_path, PackedDataset
+from src.preprocessing.test_train_split import TestTrainSplit
+
+def write_dataset(root, per_class=5, seed=0):
+    rng = np.random.default_rng(seed)
+    for split in ("training", "testing"):
+        for label in ("healthy", "parkinson"):
+            os.makedirs(os.path.join(root, split, label), exist_ok=True)
+            for i in range(per_class):
+                image = np.full((90, 120, 3), 255, np.uint8)
+                image[rng.integers(0, 90, 200), rng.integers(0, 120, 200)] = 0
+                cv2.imwrite(os.path.join(root, split, label, f"{label}_{i}.png"), image)
+
+def test_packed_splits_give_the_same_features_as_the_images(tmp_path):
+    root = str(tmp_path / "sw")
+    write_dataset(root)
+    directory = build_packed_dataset(root, str(tmp_path / "packed"), n_jobs=1)
+    packed = PackedDataset(directory)
+    assert len(packed) == 20
+    images, labels = packed.split("training")
+    # A split is a view into the memory map, not a copy
+    assert isinstance(images.base, np.memmap) or isinstance(images, np.memmap)
+
+    from_files = TestTrainSplit()
+    from_pack = TestTrainSplit(packed_dataset=packed, n_jobs=2, chunksize=3)
+    for split in ("training", "testing"):
+        expected, expected_labels = from_files.load_split_data(os.path.join(root, split))
+        data, labels = from_pack.load_split_data(os.path.join(root, split))
+        # Same rows, possibly in a different order
+        order = np.lexsort(expected.T)
+        packed_order = np.lexsort(data.T)
+        np.testing.assert_array_equal(data[packed_order], expected[order])
+        np.testing.assert_array_equal(labels[packed_order], expected_labels[order])
+
+def test_pack_is_stale_once_images_are_added(tmp_path):
+    root = str(tmp_path / "sw")
+    write_dataset(root, per_class=2)
+    packed_dir = str(tmp_path / "packed")
+    hog_size = TestTrainSplit().hog_filter.params["image_size"]
+    assert PackedDataset.open(root, hog_size, packed_dir) is None
+    build_packed_dataset(root, packed_path(root, hog_size, packed_dir), n_jobs=1)
+    assert PackedDataset.open(root, hog_size, packed_dir) is not None
+    new_image = os.path.join(root, "training", "healthy", "new.png")
+    cv2.imwrite(new_image, np.zeros((10, 10), np.uint8))
+    os.utime(os.path.dirname(new_image), ns=(0, os.stat(os.path.dirname(new_image)).st_mtime_ns + 1))
+    assert PackedDataset.open(root, hog_size, packed_dir) is None
+
+def test_pack_is_stale_once_an_image_is_overwritten(tmp_path):
+    root = str(tmp_path / "sw")
+    write_dataset(root, per_class=2)
+    packed_dir = str(tmp_path / "packed")
+    hog_size = TestTrainSplit().hog_filter.params["image_size"]
+    build_packed_dataset(root, packed_path(root, hog_size, packed_dir), n_jobs=1)
+    # Rewritten in place under the same name, as incremental augmentation does; the directory mtime does not change
+    image_path = os.path.join(root, "training", "healthy", "healthy_0.png")
+    label_dir = os.stat(os.path.dirname(image_path))
+    image = os.stat(image_path)
+    cv2.imwrite(image_path, np.zeros((90, 120, 3), np.uint8))
+    os.utime(image_path, ns=(image.st_atime_ns, image.st_mtime_ns + 1))
+    os.utime(os.path.dirname(image_path), ns=(label_dir.st_atime_ns, label_dir.st_mtime_ns))
+    assert PackedDataset.open(root, hog_size, packed_dir) is None
+
+def test_pack_is_trusted_without_its_source_images(tmp_path):
+    root = str(tmp_path / "sw")
+    write_dataset(root, per_class=2)
+    packed = PackedDataset(build_packed_dataset(root, str(tmp_path / "packed"), n_jobs=1))
+    assert not packed.is_stale(root)
+    assert not packed.is_stale(str(tmp_path / "missing"))
@@ -0,0 +1,42 @@
+import os
+import sys
+import json
+import pytest
+
+# Ensure the project root is in sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../benchmark_test')))
+
+from synthetic import make_dataset
+from src.training import search
+from src.preprocessing.feature_store import FeatureStore
+
+@pytest.fixture(scope="module")
+def dataset(tmp_path_factory):
+    root = tmp_path_factory.mktemp("dataset")
+    make_dataset(str(root), images_per_class=10, size=200)
+    return str(root / "sw")
+
+def run(dataset, models_dir, **kwargs):
+    return search.run_search(["KNN"], dataset, str(models_dir), folds=3, n_jobs=1,
+                             feature_store=FeatureStore(cache_dir=str(models_dir / "features")), **kwargs)
+
+def test_halving_search_writes_results_and_resumes(dataset, tmp_path, monkeypatch):
+    summaries = run(dataset, tmp_path, strategy="halving", factor=2)
+    results = json.loads((tmp_path / search.SEARCH_RESULTS_FILE).read_text())
+    assert results["KNN"]["best"] == summaries["KNN"]["best"]
+    assert search.best_params(str(tmp_path)) == {"KNN": summaries["KNN"]["best"]["params"]}
+    # Only the survivors of the last round are scored on the full training split
+    assert 1 <= len(summaries["KNN"]["results"]) < len(search._candidates("KNN", "grid", 0, 0))
+    assert any(r["pareto"] for r in summaries["KNN"]["results"])
+    for result in summaries["KNN"]["results"]:
+        assert result["fit_seconds"] >= 0 and result["predict_ms_per_sample"] > 0
+
+    # A rerun is served entirely from the checkpoint
+    monkeypatch.setattr(search, "_score_fold", lambda *args: pytest.fail("refitted a checkpointed candidate"))
+    assert run(dataset, tmp_path, strategy="halving", factor=2)["KNN"]["best"] == summaries["KNN"]["best"]
+
+def test_grid_search_stops_early(dataset, tmp_path):
+    summaries = run(dataset, tmp_path, strategy="grid", patience=1)
+    n_grid = len(search._candidates("KNN", "grid", 0, 0))
+    assert len(summaries["KNN"]["results"]) < n_grid
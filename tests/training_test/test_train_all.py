@@ -0,0 +1,47 @@
+import os
+import sys
+import json
+import joblib
+import numpy as np
+
+# Ensure the project root is in sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../benchmark_test')))
+
+from synthetic import make_dataset
+from src.training.train_all import train_models, MODEL_CONFIGS
+from src.preprocessing.feature_store import FeatureStore
+from src.preprocessing.test_train_split import TestTrainSplit
+
+def test_train_all_models_from_shared_features(tmp_path, monkeypatch):
+    make_dataset(str(tmp_path / "dataset"), images_per_class=6, size=200)
+    models_dir = str(tmp_path / "models")
+    (tmp_path / "models").mkdir()
+    # Entries for other models must survive the update
+    (tmp_path / "models" / "metrics.json").write_text(json.dumps({"Other": {"pickle_file": "model_Other.pkl"}}))
+    featurized = []
+    original = TestTrainSplit.load_split_data
+    monkeypatch.setattr(TestTrainSplit, "load_split_data",
+                        lambda self, path, augment=False: featurized.append(path) or original(self, path, augment))
+
+    result = train_models(dataset_dir=str(tmp_path / "dataset" / "sw"), models_dir=models_dir, n_jobs=2, augment=False,
+                          feature_store=FeatureStore(cache_dir=str(tmp_path / "features")))
+    assert len(featurized) == 2
+    metrics = json.loads((tmp_path / "models" / "metrics.json").read_text())
+    assert set(metrics) == {"Other"} | {name for name, _ in MODEL_CONFIGS.values()}
+    assert metrics["Random Forest"]["pickle_file"] == "model_RandomForest.pkl"
+    assert "features" in metrics["K-Nearest Neighbors"]
+    assert set(result["timings"]) >= {"features", "fit_and_evaluate", "save", "fit[KNN]"}
+    bundle = joblib.load(os.path.join(models_dir, "model_LinearSVM.pkl"))
+    assert list(bundle["label_encoder"].classes_) == ["healthy", "parkinson"]
+    assert os.path.isdir(os.path.join(models_dir, "model_LinearSVM.compact"))
+
+def test_parallel_extraction_matches_serial(tmp_path):
+    make_dataset(str(tmp_path / "dataset"), images_per_class=6, size=200)
+    path = str(tmp_path / "dataset" / "sw" / "training")
+    # Small chunks, so the parallel run really spreads the images over several chunks and workers
+    serial = TestTrainSplit(n_jobs=1, chunksize=3).load_split_data(path)
+    parallel = TestTrainSplit(n_jobs=2, chunksize=3).load_split_data(path)
+    assert len(serial[0]) > 3
+    assert np.array_equal(serial[0], parallel[0])
+    assert np.array_equal(serial[1], parallel[1])
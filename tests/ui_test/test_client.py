@@ -0,0 +1,69 @@
+import os
+import sys
+import cv2
+import numpy as np
+
+# Ensure the project root is in sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.ui.client import ApiClient, prepare_image, input_size
+from src.preprocessing.hog_filter import HogFilter
+
+def photo(seed, size=(900, 1200)):
+    """A large colour JPEG of a drawing, like a phone photo of the paper."""
+    rng = np.random.default_rng(seed)
+    image = np.full((*size, 3), (235, 240, 245), np.uint8)
+    points = rng.integers(100, min(size) - 100, (40, 2)).astype(np.int32)
+    cv2.polylines(image, [points], False, (40, 30, 20), 6)
+    image = np.clip(image + rng.normal(0, 4, image.shape), 0, 255).astype(np.uint8)
+    return cv2.imencode(".jpg", image)[1].tobytes()
+
+MODELS = {"Linear SVM": {"accuracy": 0.9, "features": HogFilter().describe()},
+          "Random Forest": {"accuracy": 0.8, "features": HogFilter().describe()}}
+
+class RecordingSession:
+    """Answers /predict and /predict/ensemble like the API and records what was sent."""
+    def __init__(self):
+        self.posts = []
+
+    def post(self, url, files, data, timeout):
+        self.posts.append((url, files["file"][1], data))
+        response = type("Response", (), {"status_code": 200})()
+        if url.endswith("/ensemble"):
+            models = {name: {"prediction": "Healthy", "probabilities": None} for name in data["model_names"]}
+            response.json = lambda: {"prediction": "Healthy", "votes": {"Healthy": len(models)}, "models": models}
+        else:
+            response.json = lambda: {"prediction": "Parkinson"}
+        return response
+
+def test_reduced_upload_gives_the_same_features():
+    hog_filter = HogFilter()
+    for seed in range(3):
+        contents = photo(seed)
+        prepared = prepare_image(contents, input_size(MODELS))
+        assert len(prepared) < len(contents) / 10
+        assert np.array_equal(hog_filter.quantify_image(prepared), hog_filter.quantify_image(contents))
+
+def test_undecodable_upload_is_sent_unchanged():
+    assert prepare_image(b"not an image", (200, 200)) == b"not an image"
+    assert input_size({**MODELS, "Other": {"features": HogFilter(image_size=(128, 128)).describe()}}) is None
+
+def test_predictions_are_cached_per_image_and_model():
+    session = RecordingSession()
+    client = ApiClient(api_url="http://api", session=session)
+    client.models = dict(MODELS)
+    contents = photo(0)
+    assert client.predict(contents, "Linear SVM")["prediction"] == "Parkinson"
+    client.predict(contents, "Linear SVM")
+    assert len(session.posts) == 1
+    # One round trip answers every model, and fills the per-model cache
+    result = client.predict_all(contents)
+    assert set(result["models"]) == set(MODELS)
+    assert client.predict(contents, "Random Forest")["prediction"] == "Healthy"
+    assert len(session.posts) == 2
+    assert session.posts[0][1] == session.posts[1][1]
+    # A retrained model (changed metrics entry) is asked again
+    client.models["Linear SVM"] = {**MODELS["Linear SVM"], "accuracy": 0.95}
+    assert client.cached(contents, "Linear SVM") is None
+    client.predict(contents, "Linear SVM")
+    assert len(session.posts) == 3